@@ -609,8 +609,9 @@ class Components:
     @staticmethod
     def load_gaussian_from_iteration_button(display_text="From Iteration", display_icon="menu-line",
                                             tooltip="Load Gaussian From Project Output", primary_color=True,
-                                            uid=None):
-        """加载成功返回Gaussian Manager， 未加载或失败返回None"""
+                                            uid=None, load_sh_degree=None):
+        """加载成功返回Gaussian Manager， 未加载或失败返回None
+        load_sh_degree: 只加载到该阶数的SH, None则全部加载"""
 
         gm = None
         if primary_color:
@@ -645,7 +646,7 @@ class Components:
                     loaded_iteration = int(selected_folder_name.replace('iteration_', ''))
                     ply_path = os.path.join(selected_folder_path, 'point_cloud.ply')
                     args.loaded_iter = loaded_iteration
-                    gm = GaussianManager(args, scene_info=None, custom_ply_path=ply_path)
+                    gm = GaussianManager(args, scene_info=None, custom_ply_path=ply_path, load_sh_degree=load_sh_degree)
 
                 except Exception as e:
                     logging.error(e)
@@ -659,8 +660,9 @@ class Components:
 
     @staticmethod
     def load_gaussian_from_custom_file_button(display_text='From Custom File', display_icon='folder-open-line',
-                                              tooltip='Load Gaussian From Custom File', uid=None):
-        """加载成功返回Gaussian Manager， 未加载或失败返回None"""
+                                              tooltip='Load Gaussian From Custom File', uid=None, load_sh_degree=None):
+        """加载成功返回Gaussian Manager， 未加载或失败返回None
+        load_sh_degree: 只加载到该阶数的SH, None则全部加载"""
         gm = None
         load_file_from_custom_file = Components.icon_text_button(
             display_icon, display_text, width=imgui.get_content_region_available_width() / 2, uid=uid)
@@ -671,7 +673,7 @@ class Components:
                 try:
                     from src.manager.gaussian_manager import GaussianManager
                     args = arg_utils.gen_config_args()
-                    gm = GaussianManager(args, scene_info=None, custom_ply_path=ply_path)
+                    gm = GaussianManager(args, scene_info=None, custom_ply_path=ply_path, load_sh_degree=load_sh_degree)
                 except Exception as e:
                     logging.error(e)
         return gm
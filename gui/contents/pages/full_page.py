@@ -864,9 +864,10 @@ class FullPage(BasePage):
     def _gen_gt_socket(cls):
         cls._is_generating_gt_socket = True
         import torch
+        from utils.general_utils import unpack_image
         def gt_socket(**kwargs):
             viewpoint_cam = kwargs['viewpoint_cam']
-            image = viewpoint_cam.original_image.cuda()
+            image = unpack_image(viewpoint_cam.stored_image.cuda())
             iteration = kwargs['iteration']
             # print(f"iter {iteration}: image shape = {image.shape}, image_type = {type(image)}")
             # 将彩色图像转换为灰度图像
@@ -1267,7 +1268,7 @@ class GaussianMaskWrapper:
         if self.parent_geometry is None:
             return False, "no target geometry as mask"
 
-        self.mask = self.parent_geometry.is_points_inside(self.parent_gaussian_manager.gaussians.get_xyz)
+        self.mask = self.parent_gaussian_manager.geometry_mask(self.parent_geometry)
         if self.mask is None:
             return False, f"target_geometry_as_mask {self.parent_geometry.name} does not support " \
                           f"get points inside function"
@@ -28,7 +28,7 @@ NEGATIVE = 2
 class GL_3DGS_Camera:
     """同时支持Opengl和3dgs渲染的camera"""
 
-    def __init__(self, width, height):
+    def __init__(self, width, height, device="cuda"):
         # 1. values for orbit camera
         # 2 和 3 中的数值由这里的值驱动
         self._radius = 5.0  # radius in base units
@@ -50,12 +50,13 @@ class GL_3DGS_Camera:
         import torch
         from utils.graphics_utils import pa2tr, getWorld2View2, tr2pa, getProjectionMatrix
         self.torch = torch
+        self.device = torch.device(device)  # 3dgs相关矩阵所在的设备
         self.pa2tr, self.tr2pa, self.getWorld2View2, self.getProjectionMatrix = pa2tr, tr2pa, getWorld2View2, getProjectionMatrix
 
         self._image_width = width
         self._image_height = height
 
-        self._GAUSSIAN_WORLD_MATRIX = self.torch.tensor(world_matrix).cuda()
+        self._GAUSSIAN_WORLD_MATRIX = self.torch.tensor(world_matrix, device=self.device)
         self._TRANS = np.array([0.0, 0.0, 0.0])
         self._SCALE = 1.0
 
@@ -166,10 +167,10 @@ class GL_3DGS_Camera:
 
         self._T, self._R = self.pa2tr(self._P, self._A)
 
-        self._world_to_view_matrix = torch.tensor(self.getWorld2View2(self._R, self._T, self._TRANS, self._SCALE), device="cuda")
+        self._world_to_view_matrix = torch.tensor(self.getWorld2View2(self._R, self._T, self._TRANS, self._SCALE), device=self.device)
         self._world_view_transform = self._world_to_view_matrix.transpose(0, 1)
         self._world_view_transform = self._GAUSSIAN_WORLD_MATRIX @ self._world_view_transform
-        self._projection_matrix = self.torch.tensor(self._projection.matrix, device="cuda")
+        self._projection_matrix = self.torch.tensor(self._projection.matrix, device=self.device)
         self._full_proj_transform = self._world_view_transform @ self._projection_matrix
         self._camera_center = self._world_view_transform.inverse()[3, :3]
 
@@ -192,8 +193,8 @@ class GL_3DGS_Camera:
             dtype="f4",
         )
 
-        self._world_view_transform = self.torch.tensor(self.getWorld2View2(self._R, self._T, self._TRANS, self._SCALE), device="cuda").transpose(0, 1)
-        self._projection_matrix = self.getProjectionMatrix(znear=self.projection.near, zfar=self.projection.far, fovX=self.FoVx, fovY=self.FoVy).transpose(0, 1).cuda()
+        self._world_view_transform = self.torch.tensor(self.getWorld2View2(self._R, self._T, self._TRANS, self._SCALE), device=self.device).transpose(0, 1)
+        self._projection_matrix = self.getProjectionMatrix(znear=self.projection.near, zfar=self.projection.far, fovX=self.FoVx, fovY=self.FoVy).transpose(0, 1).to(self.device)
         self._full_proj_transform = self._world_view_transform @ self._projection_matrix
         self._camera_center = self._world_view_transform.inverse()[3, :3]
 
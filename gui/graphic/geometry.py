@@ -180,6 +180,10 @@ class BaseGeometry:
     def is_points_inside(self, points):
         raise NotImplementedError("This method (is_points_inside) should be overwritten by child Classes")
 
+    def world_bounds(self):
+        """世界坐标下包含is_points_inside区域的轴对齐包围盒(min, max), 用于空间索引; None表示未知"""
+        return None
+
     # endregion
 
     # region UI
@@ -265,6 +269,14 @@ class BaseGeometry3D(BaseGeometry):
     def operation_panel(self):
         return self._ui.operation_panel()
 
+    def _world_bounds_of(self, local_points):
+        """局部坐标的点经过model view变换后的轴对齐包围盒"""
+        local_points = np.asarray(local_points, dtype=np.float32).reshape(-1, 3)
+        homogeneous_points = np.hstack((local_points, np.ones((local_points.shape[0], 1), dtype=np.float32)))
+        world_points = homogeneous_points @ np.asarray(self.transform.model_view_with_no_world_matrix)
+        world_points = world_points[:, :3] / world_points[:, 3:4]
+        return world_points.min(axis=0), world_points.max(axis=0)
+
 
 class PointCloud(BaseGeometry3D):
     def __init__(self, name, pos_arr: np.ndarray, color_arr: np.ndarray, material: Union[IMaterial, Material, MaterialInstance, None] = None):
@@ -349,6 +361,11 @@ class WiredBoundingBox(Line3D):
         ), dtype=np.float32)
         return edges
 
+    def world_bounds(self):
+        bound_min, bound_max = np.asarray(self.bound_min), np.asarray(self.bound_max)
+        corners = [[(bound_min, bound_max)[(i >> axis) & 1][axis] for axis in range(3)] for i in range(8)]
+        return self._world_bounds_of(corners)
+
     def set_bound_min(self, bound_min):
         self.__init__(self.name, bound_min, self.bound_max, self._material)
 
@@ -363,17 +380,15 @@ class WiredBoundingBox(Line3D):
         import torch
         if not isinstance(points, torch.Tensor):
             points = torch.tensor(points)
-        if not points.is_cuda:
-            points = points.cuda()
         if len(points.shape) == 1:
             points = points.reshape(1, -1)
         assert len(points.shape) == 2
-        model_view = torch.tensor(self.transform.model_view_with_no_world_matrix).cuda()
+        model_view = torch.tensor(self.transform.model_view_with_no_world_matrix, device=points.device)
         with torch.no_grad():
             inverse_model_view = torch.inverse(model_view)
 
             # 将点云坐标扩展到齐次坐标系
-            homogeneous_points = torch.cat((points, torch.ones((points.shape[0], 1), dtype=torch.float, device="cuda")),
+            homogeneous_points = torch.cat((points, torch.ones((points.shape[0], 1), dtype=torch.float, device=points.device)),
                                            dim=1)
 
             # 使用逆矩阵 inverse_model_view 进行逆变换
@@ -417,17 +432,15 @@ class Polygon(Line3D):
         import torch
         if not isinstance(points, torch.Tensor):
             points = torch.tensor(points)
-        if not points.is_cuda:
-            points = points.cuda()
         if len(points.shape) == 1:
             points = points.reshape(1, -1)
         assert len(points.shape) == 2
-        model_view = torch.tensor(self.transform.model_view_with_no_world_matrix).cuda()
+        model_view = torch.tensor(self.transform.model_view_with_no_world_matrix, device=points.device)
         with torch.no_grad():
             inverse_model_view = torch.inverse(model_view)
 
             # 将点云坐标扩展到齐次坐标系
-            homogeneous_points = torch.cat((points, torch.ones((points.shape[0], 1), dtype=torch.float, device="cuda")),
+            homogeneous_points = torch.cat((points, torch.ones((points.shape[0], 1), dtype=torch.float, device=points.device)),
                                            dim=1)
 
             # 使用逆矩阵 inverse_model_view 进行逆变换
@@ -437,7 +450,7 @@ class Polygon(Line3D):
             restored_points = transformed_points[:, :3] / transformed_points[:, 3].reshape(-1, 1)
             restored_points_2d = restored_points[:, :2]  # (n, 2)
 
-            polyline_points_2d = torch.tensor(self.points[:, :2]).cuda()  # (num_polygon_points, 2)
+            polyline_points_2d = torch.tensor(self.points[:, :2], device=points.device)  # (num_polygon_points, 2)
             conditions = []  # (num_polygon_points, num_points)
             for i in range(len(self.points) - 1):
                 line_vector = polyline_points_2d[i + 1] - polyline_points_2d[i]  # (2, )
@@ -581,21 +594,24 @@ class SimpleCube(BaseGeometry3D):
     def operation_panel(self):
         return super().operation_panel()
 
+    def world_bounds(self):
+        half = np.asarray(self.size, dtype=np.float32) / 2
+        corners = [[half[axis] if (i >> axis) & 1 else -half[axis] for axis in range(3)] for i in range(8)]
+        return self._world_bounds_of(corners)
+
     def is_points_inside(self, points):
         import torch
         if not isinstance(points, torch.Tensor):
             points = torch.tensor(points)
-        if not points.is_cuda:
-            points = points.cuda()
         if len(points.shape) == 1:
             points = points.reshape(1, -1)
         assert len(points.shape) == 2
-        model_view = torch.tensor(self.transform.model_view_with_no_world_matrix).cuda()
+        model_view = torch.tensor(self.transform.model_view_with_no_world_matrix, device=points.device)
         with torch.no_grad():
             inverse_model_view = torch.inverse(model_view)
 
             # 将点云坐标扩展到齐次坐标系
-            homogeneous_points = torch.cat((points, torch.ones((points.shape[0], 1), dtype=torch.float, device="cuda")),
+            homogeneous_points = torch.cat((points, torch.ones((points.shape[0], 1), dtype=torch.float, device=points.device)),
                                            dim=1)
 
             # 使用逆矩阵 inverse_model_view 进行逆变换
@@ -652,21 +668,26 @@ class Polygon3D(BaseGeometry3D):
     def operation_panel(self):
         return super().operation_panel()
 
+    def world_bounds(self):
+        min_points = np.array(self.points, dtype=np.float32)
+        min_points[:, 2] = self.z_min
+        max_points = np.array(self.points, dtype=np.float32)
+        max_points[:, 2] = self.z_max
+        return self._world_bounds_of(np.vstack((min_points, max_points)))
+
     def is_points_inside(self, points):
         import torch
         if not isinstance(points, torch.Tensor):
             points = torch.tensor(points)
-        if not points.is_cuda:
-            points = points.cuda()
         if len(points.shape) == 1:
             points = points.reshape(1, -1)
         assert len(points.shape) == 2
-        model_view = torch.tensor(self.transform.model_view_with_no_world_matrix).cuda()
+        model_view = torch.tensor(self.transform.model_view_with_no_world_matrix, device=points.device)
         with torch.no_grad():
             inverse_model_view = torch.inverse(model_view)
 
             # 将点云坐标扩展到齐次坐标系
-            homogeneous_points = torch.cat((points, torch.ones((points.shape[0], 1), dtype=torch.float, device="cuda")),
+            homogeneous_points = torch.cat((points, torch.ones((points.shape[0], 1), dtype=torch.float, device=points.device)),
                                            dim=1)
 
             # 使用逆矩阵 inverse_model_view 进行逆变换
@@ -676,7 +697,7 @@ class Polygon3D(BaseGeometry3D):
             restored_points = transformed_points[:, :3] / transformed_points[:, 3].reshape(-1, 1)
             restored_points_2d = restored_points[:, :2]  # (n, 2)
 
-            polyline_points_2d = torch.tensor(self.points[:, :2]).cuda()  # (num_polygon_points, 2)
+            polyline_points_2d = torch.tensor(self.points[:, :2], device=points.device)  # (num_polygon_points, 2)
             conditions = []  # (num_polygon_points, num_points)
             for i in range(len(self.points) - 1):
                 line_vector = polyline_points_2d[i + 1] - polyline_points_2d[i]  # (2, )
@@ -264,7 +264,11 @@ class GaussianCollection(IGeometryCollection):
 
         # do not use geometries in GaussianCollection, use self.gaussian_managers instead
         self.gaussian_managers: list["GaussianManager"] = []
+        self.hidden_gaussian_managers: list["GaussianManager"] = []
 
+        # 多个manager合并在一个视图中, 增删/显隐/编辑时只重写变化的部分
+        from src.manager.merged_view import MergedGaussianView
+        self.merged_view = MergedGaussianView()
         self.final_gm: Optional["GaussianManager"] = None
 
         # import ui
@@ -273,6 +277,7 @@ class GaussianCollection(IGeometryCollection):
 
     def set_gaussian_manager(self, gm: "GaussianManager"):
         self.gaussian_managers = []
+        self.hidden_gaussian_managers = []
         if gm is not None:
             self.add_gaussian_manager(gm)
         self.merge_gaussians()
@@ -286,14 +291,36 @@ class GaussianCollection(IGeometryCollection):
         assert gm is not None
         if gm in self.gaussian_managers:
             self.gaussian_managers.remove(gm)
+        if gm in self.hidden_gaussian_managers:
+            self.hidden_gaussian_managers.remove(gm)
+
+    def is_gaussian_manager_visible(self, gm: "GaussianManager"):
+        return gm not in self.hidden_gaussian_managers
+
+    def set_gaussian_manager_visible(self, gm: "GaussianManager", visible: bool):
+        if visible == self.is_gaussian_manager_visible(gm):
+            return
+        if visible:
+            self.hidden_gaussian_managers.remove(gm)
+        else:
+            self.hidden_gaussian_managers.append(gm)
+        self.merge_gaussians()
 
     def merge_gaussians(self):
-        from src.manager.gaussian_manager import GaussianManager
-        self.final_gm = GaussianManager.merge_gaussian_managers(self.gaussian_managers)
+        visible = [gm for gm in self.gaussian_managers if self.is_gaussian_manager_visible(gm)]
+        if len(self.gaussian_managers) == 1 and visible:
+            # 只有一个时直接渲染, 不复制
+            self.merged_view.clear()
+            self.final_gm = visible[0]
+            return
+        self.merged_view.sync(self.gaussian_managers, self.hidden_gaussian_managers)
+        self.final_gm = self.merged_view.gm if visible else None
 
     def render_gaussian(self, opaque_depth: torch.Tensor) -> Optional[torch.Tensor]:
         if self.final_gm is None:
             return None
+        if self.final_gm is self.merged_view.gm:
+            self.merged_view.refresh()  # 重新写入编辑过的manager
         return self.final_gm.render_fork(camera=self.camera, opaque_depth=opaque_depth)
 
     def render(self):
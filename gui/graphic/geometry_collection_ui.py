@@ -21,6 +21,7 @@ class GaussianCollectionUI:
         self.host = host
 
         self._imgui_curr_selected_geo_idx = -1
+        self._imgui_load_sh_degree = 3  # 预览时可以降低SH阶数以减少显存占用
 
         from gui.windows import GaussianInspectorWindow
         self.InspectorWindow = GaussianInspectorWindow
@@ -44,12 +45,17 @@ class GaussianCollectionUI:
 
     def _operation_panel_buttons_region(self):
         # region ADD BUTTON ===============================================================
-        gm = c.load_gaussian_from_custom_file_button(uid="load_gaussian_from_custom_file_button_in_gaussian_collection")
+        imgui.set_next_item_width(imgui.get_content_region_available_width() / 2)
+        _, self._imgui_load_sh_degree = imgui.slider_int('Load SH Degree', self._imgui_load_sh_degree, 0, 3)
+        c.easy_tooltip('Drop SH bands above this degree when loading, lower degrees load faster and use less memory')
+        gm = c.load_gaussian_from_custom_file_button(uid="load_gaussian_from_custom_file_button_in_gaussian_collection",
+                                                     load_sh_degree=self._imgui_load_sh_degree)
         if gm is not None:
             self.host.add_gaussian_manager(gm)
             self.host.merge_gaussians()
         imgui.same_line()
-        gm = c.load_gaussian_from_iteration_button(uid="load_gaussian_from_iteration_button_in_gaussian_collection")
+        gm = c.load_gaussian_from_iteration_button(uid="load_gaussian_from_iteration_button_in_gaussian_collection",
+                                                   load_sh_degree=self._imgui_load_sh_degree)
         if gm is not None:
             self.host.add_gaussian_manager(gm)
             self.host.merge_gaussians()
@@ -68,6 +74,11 @@ class GaussianCollectionUI:
         c.begin_child(f'{self.host.name}_child', 0, 100 * g.global_scale, border=True)
         _only_have_one_gm = len(self.host.gaussian_managers) == 1
         for i, gm in enumerate(self.host.gaussian_managers):
+            _visible = self.host.is_gaussian_manager_visible(gm)
+            clicked, _visible = imgui.checkbox(f'##visible_{i}', _visible)
+            if clicked:
+                self.host.set_gaussian_manager_visible(gm, _visible)
+            imgui.same_line()
             _selected = (i == self._imgui_curr_selected_geo_idx)
             opened, _selected = imgui.selectable(f"[{i}]{gm.source_ply_path}", _selected)
             if opened and _selected:
@@ -87,7 +98,8 @@ class GaussianCollectionUI:
             changed, delete_self = False, False
         # delete
         if delete_self:
-            self.host.remove_geometry(self.host.gaussian_managers[self._imgui_curr_selected_geo_idx])
+            self.host.remove_gaussian_manager(self.host.gaussian_managers[self._imgui_curr_selected_geo_idx])
+            self.host.merge_gaussians()
             self.InspectorWindow.w_close()
         # merge
         if changed:
@@ -14,6 +14,29 @@ def run_command(command):
         print(f"Error executing command: {e}")
         exit()
 
+def link_distorted_model(source_path):
+    """
+    the layout image_undistorter writes (images/, sparse/) with the distorted model and images:
+    the sparse model is copied (small), the images are hard linked, copied only where links fail
+    """
+    os.makedirs(os.path.join(source_path, "sparse"), exist_ok=True)
+    distorted_sparse = os.path.join(source_path, "distorted", "sparse", "0")
+    for file in os.listdir(distorted_sparse):
+        shutil.copy2(os.path.join(distorted_sparse, file), os.path.join(source_path, "sparse", file))
+
+    images_dir = os.path.join(source_path, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    for file in os.listdir(os.path.join(source_path, "input")):
+        source_file = os.path.join(source_path, "input", file)
+        destination_file = os.path.join(images_dir, file)
+        if os.path.exists(destination_file):
+            os.remove(destination_file)
+        try:
+            os.link(source_file, destination_file)
+        except OSError:
+            shutil.copy2(source_file, destination_file)
+
+
 def process_colmap(args: Namespace):
     colmap_command = '"{}"'.format(args.colmap_executable) if len(args.colmap_executable) > 0 else "colmap"
     print(colmap_command)
@@ -60,17 +83,22 @@ def process_colmap(args: Namespace):
             logging.error(f"Mapper failed with code {exit_code}. Exiting.")
             exit(exit_code)
 
-    ### Image undistortion
-    ## We need to undistort our images into ideal pinhole intrinsics.
-    img_undist_cmd = (colmap_command + " image_undistorter \
-            --image_path " + args.source_path + "/input \
-            --input_path " + args.source_path + "/distorted/sparse/0 \
-            --output_path " + args.source_path + "\
-            --output_type COLMAP")
-    exit_code = os.system(img_undist_cmd)
-    if exit_code != 0:
-        logging.error(f"Mapper failed with code {exit_code}. Exiting.")
-        exit(exit_code)
+    if getattr(args, "undistort_in_process", False):
+        ## The loader undistorts OPENCV / RADIAL / SIMPLE_RADIAL cameras itself (utils.undistort_utils):
+        ## keep the distorted model and link the input images instead of writing undistorted copies.
+        link_distorted_model(args.source_path)
+    else:
+        ### Image undistortion
+        ## We need to undistort our images into ideal pinhole intrinsics.
+        img_undist_cmd = (colmap_command + " image_undistorter \
+                --image_path " + args.source_path + "/input \
+                --input_path " + args.source_path + "/distorted/sparse/0 \
+                --output_path " + args.source_path + "\
+                --output_type COLMAP")
+        exit_code = os.system(img_undist_cmd)
+        if exit_code != 0:
+            logging.error(f"Mapper failed with code {exit_code}. Exiting.")
+            exit(exit_code)
 
     files = os.listdir(args.source_path + "/sparse")
     os.makedirs(args.source_path + "/sparse/0", exist_ok=True)
@@ -11,6 +11,7 @@ vid_name = "VID.mp4"
 
 # colmap
 colmap_executable = r'C:\Program Files\COLMAP-3.9.1-windows-cuda\COLMAP.bat'
+undistort_in_process = True  # 训练加载图片时再去畸变，跳过colmap image_undistorter（不再写一份去畸变后的图片）
 colmap_args = None
 _last_colmap_args = None
 
@@ -25,7 +26,8 @@ def update_colmap_args():
         camera="OPENCV",
         colmap_executable=colmap_executable,
         resize=False,
-        magick_executable=""
+        magick_executable="",
+        undistort_in_process=undistort_in_process
     )
 
 
@@ -39,6 +41,11 @@ sh_degree = 3
 densify_from_iter = 500
 densify_until_iter = 15_000
 densify_grad_threshold = 0.0002
+max_gaussians = 0  # 高斯数量上限， 0 表示不限制
+max_gaussian_mb = 0.0  # 高斯训练显存预算(MB)， 0 表示不限制
+image_cache_mb = 0  # 训练图像缓存的显存预算(MB)， 图像在第一次使用时才解码， 0 表示使用默认预算
+image_disk_cache = True  # 在数据集目录的 image_cache 中保存缩放后的图像， 之后的运行直接映射读取
+prefetch_depth = 2  # 后台线程提前加载的训练视角数量， 0 表示在训练循环中同步加载
 loaded_iter = None  # None 表示从COLMAP点云创建， 数字表示从之前的训练结果创建
 first_iter = None  # None 表示从loaded iter的轮次开始训练，否则则从指定的轮次开始， 该参数影响学习率等参数
 args = None
@@ -59,6 +66,8 @@ def update_args():
         white_background=white_background,
         data_device="cuda",
         eval=False,
+        image_cache_mb=image_cache_mb,
+        image_disk_cache=image_disk_cache,
 
         iterations=epochs,
         position_lr_init=0.00016,
@@ -77,6 +86,9 @@ def update_args():
         densify_until_iter=densify_until_iter,
         densify_grad_threshold=densify_grad_threshold,
         random_background=False,
+        max_gaussians=max_gaussians,
+        max_gaussian_mb=max_gaussian_mb,
+        prefetch_depth=prefetch_depth,
 
         convert_SHs_python=False,
         compute_cov3D_python=False,
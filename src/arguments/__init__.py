@@ -54,6 +54,11 @@ class ModelParams(ParamGroup):
         self._white_background = False
         self.data_device = "cuda"
         self.eval = False
+        self.eager_images = False  # decode every image when the cameras are created instead of on first use
+        self.image_cache_mb = 0  # budget of the decoded image cache on data_device, 0: default
+        self.image_disk_cache = True  # keep resized images in <source_path>/cache/images across runs
+        self.image_disk_cache_mb = 0  # budget of the on-disk image cache, 0 for unlimited
+        self.uint8_images = True  # keep ground truth images as uint8, converted to float when drawn
         super().__init__(parser, "Loading Parameters", sentinel)
 
     def extract(self, args):
@@ -87,6 +92,11 @@ class OptimizationParams(ParamGroup):
         self.densify_until_iter = 15_000
         self.densify_grad_threshold = 0.0002
         self.random_background = False
+        self.pooled_densification = False
+        self.max_gaussians = 0  # densification budget, 0 for unlimited
+        self.max_gaussian_mb = 0.0  # training memory budget of the gaussians in MB, 0 for unlimited
+        self.morton_order = False  # Z-order the gaussians after loading and densification, and in saved files
+        self.prefetch_depth = 2  # training views loaded ahead in background threads, 0 loads synchronously
         super().__init__(parser, "Optimization Parameters")
 
 def get_combined_args(parser : ArgumentParser):
@@ -0,0 +1,7 @@
+"""
+Micro benchmarks for the performance critical paths of arch gaussian.
+Run them from the src folder, e.g.
+
+    cd src
+    python -m benchmarks.bench_ply_io
+"""
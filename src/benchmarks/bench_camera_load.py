@@ -0,0 +1,93 @@
+"""
+Camera creation with every image decoded up front (--eager_images) against lazy cameras that
+decode on first access into the byte budgeted image cache. Reports startup time, resident
+memory after startup (process RSS and image bytes held) and one pass over all cameras
+with a cache budget of half the dataset.
+
+    python -m benchmarks.bench_camera_load [--counts 50 500] [--size 1600 1200] [--device cpu]
+"""
+import os
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+
+import numpy as np
+import torch
+from PIL import Image
+
+from benchmarks.bench_utils import print_table
+from scene.dataset_readers import CameraInfo
+from utils.camera_utils import loadCam
+from utils.image_cache import image_cache, clear_image_caches
+
+
+def rss_mb():
+    """resident set size of this process (linux), None elsewhere"""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def synthetic_dataset(root, count, size, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    cam_infos = []
+    for i in range(count):
+        path = os.path.join(root, f'{i:05d}.jpg')
+        Image.fromarray(np.roll(base, i, axis=1)).save(path, quality=90)
+        cam_infos.append(CameraInfo(uid=i, R=np.eye(3), T=np.array([0.0, 0.0, float(i)]), FovY=0.8, FovX=1.0,
+                                    image=None, image_path=path, image_name=f'{i:05d}',
+                                    width=size[0], height=size[1]))
+    return cam_infos
+
+
+def bench_load(cam_infos, device, eager):
+    args = Namespace(resolution=1, data_device=device, eager_images=eager)
+    clear_image_caches()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    cameras = [loadCam(args, i, cam_info, 1.0) for i, cam_info in enumerate(cam_infos)]
+    startup = time.perf_counter() - start
+    rss_after = rss_mb()
+    held = sum(cam.original_image.numel() * 4 for cam in cameras) if eager else image_cache(device).bytes
+
+    cache = image_cache(device)
+    dataset_bytes = sum(cam.image_width * cam.image_height * 3 * 4 for cam in cameras)
+    cache.set_budget(dataset_bytes // 2)
+    start = time.perf_counter()
+    for cam in cameras:
+        cam.original_image.sum()
+    epoch = time.perf_counter() - start
+    return {
+        'startup (s)': f'{startup:.2f}',
+        'rss +MB': '-' if rss_before is None else f'{rss_after - rss_before:.0f}',
+        'images held MB': f'{held / 2 ** 20:.0f}',
+        'first epoch (s)': f'{epoch:.2f}',
+        'cache MB': f'{cache.bytes / 2 ** 20:.0f}',
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--counts', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--size', type=int, nargs=2, default=[1600, 1200])
+    parser.add_argument('--device', type=str, default='cpu')
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    headers = None
+    for count in args.counts:
+        with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+            cam_infos = synthetic_dataset(tmp, count, args.size)
+            for eager in (True, False):
+                results = bench_load(cam_infos, args.device, eager)
+                headers = ['images', 'mode'] + list(results.keys())
+                rows.append([count, 'eager' if eager else 'lazy'] + list(results.values()))
+    print_table(f'camera creation, {args.size[0]}x{args.size[1]} images on {args.device}', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
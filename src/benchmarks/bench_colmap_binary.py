@@ -0,0 +1,188 @@
+"""
+COLMAP binary model readers: the struct.unpack per record / per field readers the loader used
+before against the structured dtype readers of scene.colmap_loader, with and without the
+track / point2D data, on a synthetic sparse model. Outputs are checked to be identical. The
+peak heap (tracemalloc, in a separate run) of the full structured read is reported against the
+size of what it returns.
+
+    python -m benchmarks.bench_colmap_binary [--points 100000 1000000] [--images 500] [--track 8] [--points2D 4000]
+"""
+import os
+import struct
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import numpy as np
+
+from benchmarks.bench_utils import print_table
+from scene.colmap_loader import read_points3D_binary, read_extrinsics_binary, read_intrinsics_binary
+
+
+# region legacy readers
+def read_next_bytes(fid, num_bytes, format_char_sequence, endian_character='<'):
+    data = fid.read(num_bytes)
+    return struct.unpack(endian_character + format_char_sequence, data)
+
+
+def legacy_read_points3D_binary(path):
+    with open(path, 'rb') as fid:
+        num_points = read_next_bytes(fid, 8, 'Q')[0]
+        xyzs = np.empty((num_points, 3))
+        rgbs = np.empty((num_points, 3))
+        errors = np.empty((num_points, 1))
+        for p_id in range(num_points):
+            properties = read_next_bytes(fid, num_bytes=43, format_char_sequence='QdddBBBd')
+            track_length = read_next_bytes(fid, num_bytes=8, format_char_sequence='Q')[0]
+            read_next_bytes(fid, num_bytes=8 * track_length, format_char_sequence='ii' * track_length)
+            xyzs[p_id] = np.array(properties[1:4])
+            rgbs[p_id] = np.array(properties[4:7])
+            errors[p_id] = np.array(properties[7])
+    return xyzs, rgbs, errors
+
+
+def legacy_read_extrinsics_binary(path):
+    images = {}
+    with open(path, 'rb') as fid:
+        num_reg_images = read_next_bytes(fid, 8, 'Q')[0]
+        for _ in range(num_reg_images):
+            properties = read_next_bytes(fid, num_bytes=64, format_char_sequence='idddddddi')
+            image_name = ''
+            current_char = read_next_bytes(fid, 1, 'c')[0]
+            while current_char != b'\x00':
+                image_name += current_char.decode('utf-8')
+                current_char = read_next_bytes(fid, 1, 'c')[0]
+            num_points2D = read_next_bytes(fid, num_bytes=8, format_char_sequence='Q')[0]
+            x_y_id_s = read_next_bytes(fid, num_bytes=24 * num_points2D, format_char_sequence='ddq' * num_points2D)
+            xys = np.column_stack([tuple(map(float, x_y_id_s[0::3])), tuple(map(float, x_y_id_s[1::3]))])
+            point3D_ids = np.array(tuple(map(int, x_y_id_s[2::3])))
+            images[properties[0]] = (np.array(properties[1:5]), np.array(properties[5:8]), properties[8], image_name,
+                                     xys, point3D_ids)
+    return images
+
+
+def legacy_read_intrinsics_binary(path):
+    cameras = {}
+    with open(path, 'rb') as fid:
+        num_cameras = read_next_bytes(fid, 8, 'Q')[0]
+        for _ in range(num_cameras):
+            camera_id, model_id, width, height = read_next_bytes(fid, num_bytes=24, format_char_sequence='iiQQ')
+            num_params = {0: 3, 1: 4}[model_id]
+            params = read_next_bytes(fid, num_bytes=8 * num_params, format_char_sequence='d' * num_params)
+            cameras[camera_id] = (model_id, width, height, np.array(params))
+    return cameras
+
+
+# endregion
+
+def write_synthetic_model(root, num_points, num_images, track, points2D, seed=0):
+    """cameras.bin, images.bin, points3D.bin with random tracks of 1..2*track-1 elements"""
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(root, 'cameras.bin'), 'wb') as fid:
+        fid.write(struct.pack('<Q', 2))
+        fid.write(struct.pack('<iiQQ', 1, 1, 1600, 1200) + struct.pack('<4d', 1200.0, 1200.0, 800.0, 600.0))
+        fid.write(struct.pack('<iiQQ', 2, 0, 800, 600) + struct.pack('<3d', 600.0, 400.0, 300.0))
+    with open(os.path.join(root, 'images.bin'), 'wb') as fid:
+        fid.write(struct.pack('<Q', num_images))
+        for i in range(num_images):
+            qvec = rng.normal(size=4)
+            fid.write(struct.pack('<i7di', i + 1, *(qvec / np.linalg.norm(qvec)), *rng.normal(size=3), 1 + i % 2))
+            fid.write(f'frame_{i:06d}.jpg'.encode() + b'\x00')
+            records = np.zeros(points2D, dtype=[('xy', '<f8', 2), ('id', '<i8')])
+            records['xy'] = rng.uniform(0, 1600, size=(points2D, 2))
+            records['id'] = rng.integers(-1, num_points, size=points2D)
+            fid.write(struct.pack('<Q', points2D) + records.tobytes())
+    lengths = rng.integers(1, 2 * track, size=num_points)
+    head = np.zeros(num_points, dtype=[('id', '<u8'), ('xyz', '<f8', 3), ('rgb', 'u1', 3), ('error', '<f8'),
+                                       ('track_length', '<u8')])
+    head['id'] = np.arange(1, num_points + 1)
+    head['xyz'] = rng.normal(size=(num_points, 3))
+    head['rgb'] = rng.integers(0, 256, size=(num_points, 3))
+    head['error'] = rng.uniform(0, 2, size=num_points)
+    head['track_length'] = lengths
+    elems = rng.integers(0, num_images, size=(int(lengths.sum()), 2)).astype('<i4')
+    ends = np.cumsum(lengths)
+    with open(os.path.join(root, 'points3D.bin'), 'wb') as fid:
+        fid.write(struct.pack('<Q', num_points))
+        for i in range(num_points):
+            fid.write(head[i:i + 1].tobytes())
+            fid.write(elems[ends[i] - lengths[i]:ends[i]].tobytes())
+    return lengths, elems
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def peak_mb(fn, *args, **kwargs):
+    tracemalloc.start()
+    result = fn(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20, result
+
+
+def output_mb(result):
+    arrays = []
+    for item in result if isinstance(result, tuple) else result.values():
+        arrays.extend(item.values() if isinstance(item, dict) else [item])
+    return sum(a.nbytes for a in arrays if isinstance(a, np.ndarray)) / 2 ** 20
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--points', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--images', type=int, default=500)
+    parser.add_argument('--track', type=int, default=8)
+    parser.add_argument('--points2D', type=int, default=4000)
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    for num_points in args.points:
+        with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+            lengths, elems = write_synthetic_model(tmp, num_points, args.images, args.track, args.points2D)
+            points_path = os.path.join(tmp, 'points3D.bin')
+            images_path = os.path.join(tmp, 'images.bin')
+            cameras_path = os.path.join(tmp, 'cameras.bin')
+            size_mb = os.path.getsize(points_path) / 2 ** 20
+
+            legacy_time, legacy = timed(legacy_read_points3D_binary, points_path)
+            new_time, new = timed(read_points3D_binary, points_path)
+            tracks_time, (*with_tracks, track_data) = timed(read_points3D_binary, points_path, tracks=True)
+            for a, b, c in zip(legacy, new, with_tracks):
+                assert np.array_equal(a, b) and np.array_equal(a, c), 'points3D differ'
+            assert np.array_equal(track_data['image_ids'], elems[:, 0]), 'tracks differ'
+            assert np.array_equal(np.diff(track_data['track_offsets']), lengths), 'track lengths differ'
+            peak, full = peak_mb(read_points3D_binary, points_path, tracks=True)
+            rows.append([f'points3D.bin {num_points} ({size_mb:.0f}MB)', f'{legacy_time:.2f}', f'{new_time:.2f}',
+                         f'{tracks_time:.2f}', f'{legacy_time / new_time:.1f}x',
+                         f'{peak:.0f} / {output_mb(full) + size_mb:.0f}'])
+
+            legacy_time, legacy = timed(legacy_read_extrinsics_binary, images_path)
+            new_time, new = timed(read_extrinsics_binary, images_path)
+            skip_time, _ = timed(read_extrinsics_binary, images_path, skip_points2D=True)
+            for image_id, (qvec, tvec, camera_id, name, xys, point3D_ids) in legacy.items():
+                image = new[image_id]
+                assert np.array_equal(qvec, image.qvec) and np.array_equal(tvec, image.tvec), 'poses differ'
+                assert camera_id == image.camera_id and name == image.name, 'image records differ'
+                assert np.array_equal(xys, image.xys) and np.array_equal(point3D_ids, image.point3D_ids), \
+                    'points2D differ'
+            rows.append([f'images.bin {args.images} x {args.points2D} points2D', f'{legacy_time:.2f}',
+                         f'{skip_time:.2f}', f'{new_time:.2f}', f'{legacy_time / skip_time:.1f}x', '-'])
+
+            legacy = legacy_read_intrinsics_binary(cameras_path)
+            for camera_id, (model_id, width, height, params) in legacy.items():
+                camera = read_intrinsics_binary(cameras_path)[camera_id]
+                assert (width, height) == (camera.width, camera.height) and np.array_equal(params, camera.params)
+
+    print_table('COLMAP binary readers, seconds', rows,
+                ['file', 'struct.unpack', 'structured, skip', 'structured, full', 'speedup (skip)',
+                 'full peak / file + output MB'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+COLMAP text model readers: the two pass, per line numpy readers the loader used before against
+the single pass block parser of scene.colmap_loader on a synthetic points3D.txt / images.txt.
+Checks that both return exactly the same arrays (also with a tiny block size, so that lines
+are cut at block boundaries) and reports time and peak python heap (tracemalloc).
+
+    python -m benchmarks.bench_colmap_text [--points 100000 1000000] [--images 300] [--track 8]
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import numpy as np
+
+from benchmarks.bench_utils import print_table
+from scene.colmap_loader import read_points3D_text, read_extrinsics_text
+
+
+# region legacy readers
+def legacy_read_points3D_text(path):
+    num_points = 0
+    with open(path, 'r') as fid:
+        for line in fid:
+            line = line.strip()
+            if len(line) > 0 and line[0] != '#':
+                num_points += 1
+    xyzs = np.empty((num_points, 3))
+    rgbs = np.empty((num_points, 3))
+    errors = np.empty((num_points, 1))
+    count = 0
+    with open(path, 'r') as fid:
+        for line in fid:
+            line = line.strip()
+            if len(line) > 0 and line[0] != '#':
+                elems = line.split()
+                xyzs[count] = np.array(tuple(map(float, elems[1:4])))
+                rgbs[count] = np.array(tuple(map(int, elems[4:7])))
+                errors[count] = np.array(float(elems[7]))
+                count += 1
+    return xyzs, rgbs, errors
+
+
+def legacy_read_extrinsics_text(path):
+    images = {}
+    with open(path, 'r') as fid:
+        while True:
+            line = fid.readline()
+            if not line:
+                break
+            line = line.strip()
+            if len(line) > 0 and line[0] != '#':
+                elems = line.split()
+                qvec = np.array(tuple(map(float, elems[1:5])))
+                tvec = np.array(tuple(map(float, elems[5:8])))
+                elems2 = fid.readline().split()
+                xys = np.column_stack([tuple(map(float, elems2[0::3])), tuple(map(float, elems2[1::3]))])
+                point3D_ids = np.array(tuple(map(int, elems2[2::3])))
+                images[int(elems[0])] = (qvec, tvec, int(elems[8]), elems[9], xys, point3D_ids)
+    return images
+
+
+# endregion
+
+def write_synthetic_text_model(root, num_points, num_images, track, points2D, seed=0):
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(root, 'points3D.txt'), 'w') as fid:
+        fid.write('# 3D point list with one line of data per point:\n')
+        fid.write(f'# Number of points: {num_points}\n')
+        xyz = rng.normal(size=(num_points, 3)).tolist()  # python floats, repr round trips
+        rgb = rng.integers(0, 256, size=(num_points, 3)).tolist()
+        error = rng.uniform(0, 2, size=num_points).tolist()
+        lengths = rng.integers(1, 2 * track, size=num_points).tolist()
+        for i in range(num_points):
+            track_text = ' '.join(f'{image_id} {i % 1000}' for image_id in range(lengths[i]))
+            fid.write(f'{i + 1} {xyz[i][0]!r} {xyz[i][1]!r} {xyz[i][2]!r} {rgb[i][0]} {rgb[i][1]} {rgb[i][2]} '
+                      f'{error[i]!r} {track_text}\n')
+    with open(os.path.join(root, 'images.txt'), 'w') as fid:
+        fid.write('# Image list with two lines of data per image:\n')
+        for i in range(num_images):
+            qvec = rng.normal(size=4)
+            qvec /= np.linalg.norm(qvec)
+            tvec = rng.normal(size=3)
+            fid.write(f'{i + 1} ' + ' '.join(repr(float(v)) for v in (*qvec, *tvec)) + f' 1 frame_{i:06d}.jpg\n')
+            xy = rng.uniform(0, 1600, size=(points2D, 2)).tolist()
+            ids = rng.integers(-1, num_points, size=points2D).tolist()
+            fid.write(' '.join(f'{xy[k][0]!r} {xy[k][1]!r} {ids[k]}' for k in range(points2D)) + '\n')
+
+
+def measure(fn, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20, result
+
+
+def check_points(expected, actual):
+    for a, b in zip(expected, actual):
+        assert a.shape == b.shape and np.array_equal(a, b), 'points3D differ'
+
+
+def check_images(expected, actual):
+    assert expected.keys() == actual.keys(), 'image ids differ'
+    for image_id, (qvec, tvec, camera_id, name, xys, point3D_ids) in expected.items():
+        image = actual[image_id]
+        assert np.array_equal(qvec, image.qvec) and np.array_equal(tvec, image.tvec), 'poses differ'
+        assert camera_id == image.camera_id and name == image.name, 'image records differ'
+        assert np.array_equal(xys, image.xys) and np.array_equal(point3D_ids, image.point3D_ids), 'points2D differ'
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--points', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--images', type=int, default=300)
+    parser.add_argument('--track', type=int, default=8)
+    parser.add_argument('--points2D', type=int, default=2000)
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    for num_points in args.points:
+        with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+            write_synthetic_text_model(tmp, num_points, args.images, args.track, args.points2D)
+            points_path = os.path.join(tmp, 'points3D.txt')
+            images_path = os.path.join(tmp, 'images.txt')
+
+            legacy_time, legacy_mb, legacy = measure(legacy_read_points3D_text, points_path)
+            new_time, new_mb, new = measure(read_points3D_text, points_path)
+            check_points(legacy, new)
+            check_points(legacy, read_points3D_text(points_path, block_size=997))
+            size_mb = os.path.getsize(points_path) / 2 ** 20
+            rows.append([f'points3D.txt {num_points} ({size_mb:.0f}MB)', f'{legacy_time:.2f}', f'{new_time:.2f}',
+                         f'{legacy_time / new_time:.1f}x', f'{legacy_mb:.0f} / {new_mb:.0f}'])
+
+            legacy_time, legacy_mb, legacy = measure(legacy_read_extrinsics_text, images_path)
+            new_time, new_mb, new = measure(read_extrinsics_text, images_path)
+            check_images(legacy, new)
+            check_images(legacy, read_extrinsics_text(images_path, block_size=997))
+            skip_time, _, _ = measure(read_extrinsics_text, images_path, skip_points2D=True)
+            rows.append([f'images.txt {args.images} x {args.points2D} points2D', f'{legacy_time:.2f}',
+                         f'{new_time:.2f} (skip {skip_time:.2f})', f'{legacy_time / new_time:.1f}x',
+                         f'{legacy_mb:.0f} / {new_mb:.0f}'])
+
+    print_table('COLMAP text readers, seconds', rows,
+                ['file', 'per line', 'block parser', 'speedup', 'peak heap MB (old / new)'])
+
+
+if __name__ == '__main__':
+    main()
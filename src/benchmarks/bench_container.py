@@ -0,0 +1,81 @@
+"""
+Size, round-trip error and load throughput of the compact container (utils.container_utils)
+against float32 ply files.
+
+    python -m benchmarks.bench_container [--sizes 100000 1000000] [--encodings f2|u8|f4]
+"""
+import os
+import tempfile
+from argparse import ArgumentParser
+
+import numpy as np
+
+from benchmarks.bench_ply_io import chunked_save_ply
+from benchmarks.bench_ply_load import mmap_load
+from benchmarks.bench_utils import best_of, random_gaussian_arrays, print_table
+from utils.container_utils import write_container, GaussianContainer, sh_band_range, DEFAULT_ENCODINGS
+
+
+def to_container_arrays(arrays, sh_degree=3):
+    n = arrays['xyz'].shape[0]
+    f_rest = arrays['f_rest'].reshape(n, 3, -1).transpose(0, 2, 1)  # [n, SH - 1, 3]
+    result = {'xyz': arrays['xyz'], 'opacity': arrays['opacity'], 'scale': arrays['scale'],
+              'rotation': arrays['rotation'], 'sh0': arrays['f_dc']}
+    for band in range(1, sh_degree + 1):
+        start, end = sh_band_range(band)
+        result[f'sh{band}'] = f_rest[:, start:end, :]
+    return result
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--encodings', type=str, default=None,
+                        help='use one encoding for every attribute except xyz, default: DEFAULT_ENCODINGS')
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+    encodings = dict(DEFAULT_ENCODINGS)
+    if args.encodings is not None:
+        encodings = {name: args.encodings for name in encodings if name != 'xyz'}
+
+    size_rows, error_rows = [], []
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        for n in args.sizes:
+            arrays = random_gaussian_arrays(n)
+            reference = to_container_arrays(arrays)
+            ply_path = os.path.join(tmp, f'{n}.ply')
+            gsc_path = os.path.join(tmp, f'{n}.gsc')
+            chunked_save_ply(ply_path, arrays)
+            write_container(gsc_path, reference, 3, encodings=encodings)
+
+            def load_gsc(**kwargs):
+                with GaussianContainer(gsc_path) as c:
+                    return c.read(**kwargs)
+
+            with GaussianContainer(gsc_path) as c:
+                some_chunks = list(range(0, c.num_chunks, 8))
+            t_ply = best_of(lambda: mmap_load(ply_path))
+            t_gsc = best_of(lambda: load_gsc())
+            t_gsc_sh0 = best_of(lambda: load_gsc(sh_degree=0))
+            t_gsc_part = best_of(lambda: load_gsc(chunks=some_chunks))
+            ply_mb = os.path.getsize(ply_path) / 1024 ** 2
+            gsc_mb = os.path.getsize(gsc_path) / 1024 ** 2
+            size_rows.append((n, f'{ply_mb:.1f}', f'{gsc_mb:.1f}', f'{os.path.getsize(gsc_path) / n:.1f}',
+                              f'{t_ply * 1e3:.1f}', f'{t_gsc * 1e3:.1f}', f'{t_gsc_sh0 * 1e3:.1f}',
+                              f'{t_gsc_part * 1e3:.1f}'))
+
+            decoded = load_gsc()
+            for name, ref in reference.items():
+                ref = ref.reshape(n, -1)
+                err = np.abs(decoded[name] - ref)
+                error_rows.append((n, name, encodings.get(name, 'f4'), f'{err.max():.2e}', f'{err.mean():.2e}',
+                                   f'{np.ptp(ref):.2e}'))
+
+    print_table('container vs ply (sizes in MB, times in ms)', size_rows,
+                ['gaussians', 'ply MB', 'gsc MB', 'gsc B/gaussian', 'ply load', 'gsc load', 'gsc sh0',
+                 'gsc 1/8 chunks'])
+    print_table('round-trip error', error_rows, ['gaussians', 'attribute', 'encoding', 'max abs', 'mean abs', 'range'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Densification (clone / split / prune) with the pooled storage of utils.pool_utils against the
+torch.cat / boolean indexing path, on synthetic point clouds. Both runs use the same seed and must
+end up with the same gaussians. On cuda it also counts the allocator requests (number and bytes)
+made inside densify_and_prune.
+
+    python -m benchmarks.bench_densify [--sizes 100000 500000] [--rounds 10] [--device cuda]
+"""
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+
+from arguments import OptimizationParams
+from benchmarks.bench_utils import print_table
+from scene.gaussian_model import GaussianModel
+from utils.graphics_utils import BasicPointCloud
+
+
+def _sync(device):
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+
+
+def _allocations(device):
+    """(allocation requests, bytes requested) so far, zeros off cuda"""
+    if device.type != 'cuda':
+        return 0, 0
+    stats = torch.cuda.memory_stats(device)
+    return stats.get('allocation.all.allocated', 0), stats.get('allocated_bytes.all.allocated', 0)
+
+
+def run_densify(n, rounds, device, pooled, seed=0):
+    device = torch.device(device)
+    rng = np.random.default_rng(seed)
+    pcd = BasicPointCloud(points=rng.normal(size=(n, 3)) * 10, colors=rng.uniform(size=(n, 3)), normals=None)
+    opt = OptimizationParams(ArgumentParser())
+    opt.pooled_densification = pooled
+
+    torch.manual_seed(seed)
+    gaussians = GaussianModel(3, device=device)
+    gaussians.create_from_pcd(pcd, spatial_lr_scale=1.0)
+    gaussians.training_setup(opt)
+
+    if device.type == 'cuda':
+        torch.cuda.reset_peak_memory_stats()
+    total = 0.0
+    allocations = 0
+    allocated_bytes = 0
+    for _ in range(rounds):
+        # one adam step with fake gradients so the optimizer state exists and has to follow
+        for group in gaussians.optimizer.param_groups:
+            group['params'][0].grad = torch.randn_like(group['params'][0]) * 1e-3
+        gaussians.optimizer.step()
+        gaussians.optimizer.zero_grad(set_to_none=True)
+        # in place, like add_densification_stats and the rasterizer radii update
+        gaussians.xyz_gradient_accum.copy_(torch.rand_like(gaussians.xyz_gradient_accum) * 4e-4)
+        gaussians.denom.fill_(1.0)
+        gaussians.max_radii2D.copy_(torch.rand_like(gaussians.max_radii2D) * 10)
+
+        _sync(device)
+        count_before, bytes_before = _allocations(device)
+        start = time.perf_counter()
+        gaussians.densify_and_prune(opt.densify_grad_threshold, 0.005, 10.0, 20)
+        _sync(device)
+        total += time.perf_counter() - start
+        count_after, bytes_after = _allocations(device)
+        allocations += count_after - count_before
+        allocated_bytes += bytes_after - bytes_before
+    peak = torch.cuda.max_memory_allocated() / 2 ** 20 if device.type == 'cuda' else float('nan')
+    return total, peak, allocations, allocated_bytes / 2 ** 20, gaussians.get_xyz.detach().cpu()
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 500_000])
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        legacy_time, legacy_peak, legacy_allocs, legacy_mb, legacy_xyz = \
+            run_densify(n, args.rounds, args.device, pooled=False)
+        pooled_time, pooled_peak, pooled_allocs, pooled_mb, pooled_xyz = \
+            run_densify(n, args.rounds, args.device, pooled=True)
+        assert torch.equal(legacy_xyz, pooled_xyz)
+        rows.append([n, pooled_xyz.shape[0], f'{legacy_time * 1e3:.1f}', f'{pooled_time * 1e3:.1f}',
+                     f'{legacy_time / pooled_time:.2f}x', f'{legacy_peak:.0f}', f'{pooled_peak:.0f}',
+                     f'{legacy_allocs} / {legacy_mb:.0f}', f'{pooled_allocs} / {pooled_mb:.0f}'])
+    print_table(f'densify_and_prune x{args.rounds} on {args.device}', rows,
+                ['gaussians', 'final', 'cat (ms)', 'pooled (ms)', 'speedup', 'cat peak (MB)', 'pooled peak (MB)',
+                 'cat allocs / MB', 'pooled allocs / MB'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Non-rasterization GaussianManager operations (load / save, masks, color / alpha, noise, merge, prune)
+on CPU tensors against the CUDA path. CUDA is skipped when it is not available.
+
+    python -m benchmarks.bench_device [--sizes 100000 1000000] [--devices cpu cuda]
+"""
+import os
+import tempfile
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+
+from benchmarks.bench_ply_io import chunked_save_ply
+from benchmarks.bench_utils import best_of, random_gaussian_arrays, print_table
+from manager.gaussian_manager import GaussianManager, create_gaussian_from_ply
+
+
+def _synced(fn, device):
+    def run():
+        fn()
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+
+    return run
+
+
+def bench_device(path, device, out_path):
+    device = torch.device(device)
+    gm = GaussianManager.from_gaussians(create_gaussian_from_ply(3, path, device=device))
+    lo, hi = np.array([-5.0, -5.0, -5.0]), np.array([5.0, 5.0, 5.0])
+    mask = gm.position_mask(lo, hi)
+
+    def merge():
+        GaussianManager.merge_gaussian_managers([gm, gm])
+
+    def prune():
+        pruned = GaussianManager.from_gaussians(gm.gaussians)
+        pruned.delete_by_mask(~mask)
+
+    ops = {
+        'load': lambda: create_gaussian_from_ply(3, path, device=device),
+        'save': lambda: gm.gaussians.save_ply(out_path),
+        'mask': lambda: gm.position_mask(lo, hi),
+        'set_rgb': lambda: gm.set_rgb(np.array([1.0, 0.0, 0.0], dtype=np.float32), mask),
+        'set_alpha': lambda: gm.set_alpha(0.5, mask),
+        'noise': lambda: gm.add_position_noise(0.01, mask),
+        'merge': merge,
+        'prune': prune,
+    }
+    return {name: best_of(_synced(fn, device)) for name, fn in ops.items()}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--devices', type=str, nargs='+', default=['cpu', 'cuda'])
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    devices = [d for d in args.devices if d != 'cuda' or torch.cuda.is_available()]
+    rows = []
+    headers = None
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        for n in args.sizes:
+            path = os.path.join(tmp, f'{n}.ply')
+            chunked_save_ply(path, random_gaussian_arrays(n))
+            for device in devices:
+                results = bench_device(path, device, os.path.join(tmp, f'{n}_{device}_out.ply'))
+                headers = ['gaussians', 'device'] + list(results.keys())
+                rows.append([n, device] + [f'{t * 1e3:.1f}' for t in results.values()])
+    print_table('gaussian manager ops (ms)', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Resized training images from the source jpgs (PIL decode + resize every run) against the
+on-disk image cache: the first run builds it with a pool of decoders, later runs memory-map
+the stored uint8 pixels. Every resolution scale of loadCam is a separate entry.
+
+    python -m benchmarks.bench_disk_cache [--count 200] [--size 3200 2400] [--scales 1 2] [--workers 1 8]
+"""
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import torch
+from PIL import Image
+
+from benchmarks.bench_camera_load import synthetic_dataset
+from benchmarks.bench_utils import print_table
+from utils.disk_image_cache import DiskImageCache
+from utils.general_utils import PILtoTorch
+
+
+def load_all_pil(requests):
+    for path, resolution in requests:
+        with Image.open(path) as image:
+            PILtoTorch(image, resolution)
+
+
+def load_all_cached(cache, requests):
+    for path, resolution in requests:
+        cache.load(path, resolution)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--size', type=int, nargs=2, default=[3200, 2400])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        cam_infos = synthetic_dataset(tmp, args.count, args.size)
+        requests = [(c.image_path, (c.width // scale, c.height // scale)) for scale in args.scales for c in cam_infos]
+
+        start = time.perf_counter()
+        load_all_pil(requests)
+        rows.append(['PIL decode + resize', '-', f'{time.perf_counter() - start:.2f}', '-'])
+
+        for workers in args.workers:
+            root = os.path.join(tmp, f'cache_{workers}')
+            cache = DiskImageCache(root)
+            start = time.perf_counter()
+            cache.build(requests, workers=workers, desc=f'build, {workers} workers')
+            rows.append(['cold build', workers, f'{time.perf_counter() - start:.2f}',
+                         f'{cache.bytes / 2 ** 20:.0f}'])
+
+        cache = DiskImageCache(root)  # a new run, the index is read back from disk
+        start = time.perf_counter()
+        cache.build(requests)
+        validate = time.perf_counter() - start
+        start = time.perf_counter()
+        load_all_cached(cache, requests)
+        rows.append(['warm validate', '-', f'{validate:.2f}', f'{cache.bytes / 2 ** 20:.0f}'])
+        rows.append(['warm load (mmap)', '-', f'{time.perf_counter() - start:.2f}', '-'])
+
+        path, resolution = requests[0]
+        with Image.open(path) as image:
+            assert torch.equal(PILtoTorch(image, resolution), cache.load(path, resolution)), 'cached pixels differ'
+
+    print_table(f'{len(requests)} resized images of {args.count} {args.size[0]}x{args.size[1]} jpgs, '
+                f'scales {args.scales}', rows, ['mode', 'workers', 'time (s)', 'cache MB'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+A scripted edit pipeline (dozens of box / sphere edits and deletions) run eagerly through
+GaussianManager against the same script recorded in an EditBuffer and applied by one flush().
+The colors of both results are compared, then the buffer's log is replayed on a second scene.
+A script that moves gaussians between region edits is also run both ways, with the same noise
+seed, and must give the same gaussians, also with a Mask region (sized for the gaussians left by
+the deletions) recorded after them.
+
+    python -m benchmarks.bench_edit_buffer [--sizes 1000000 5000000] [--edits 48] [--device cuda]
+"""
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+
+from benchmarks.bench_spatial_index import synthetic_manager, _synced
+from benchmarks.bench_utils import best_of, print_table
+from manager.edit_buffer import Box, Mask, Sphere
+
+
+def random_script(num_edits, seed=0):
+    """[(op, value, region)], deletions last so the eager run sees the same regions"""
+    rng = np.random.default_rng(seed)
+    script = []
+    for i in range(num_edits):
+        lo = rng.uniform(-20, 16, size=3)
+        region = Box(tuple(lo), tuple(lo + rng.uniform(2, 6, size=3))) if i % 4 else \
+            Sphere(tuple(rng.uniform(-15, 15, size=3)), float(rng.uniform(1, 4)))
+        op = ('set_color', 'set_rgb', 'set_alpha', 'clear_features_rest')[i % 4]
+        value = {'set_color': float(rng.uniform()), 'set_rgb': rng.uniform(size=3).tolist(),
+                 'set_alpha': float(rng.uniform(0.1, 0.9)), 'clear_features_rest': None}[op]
+        script.append((op, value, region))
+    for _ in range(max(1, num_edits // 8)):
+        lo = rng.uniform(-20, 16, size=3)
+        script.append(('delete', None, Box(tuple(lo), tuple(lo + 3))))
+    return script
+
+
+def eager(gm, script):
+    delete = gm.zero_like_mask()
+    for op, value, region in script:
+        if isinstance(region, Box):
+            mask = gm.position_mask(np.array(region.min), np.array(region.max))
+        else:
+            mask = gm.sphere_mask(region.center, region.radius)
+        if op == 'delete':
+            delete |= mask
+        elif op == 'clear_features_rest':
+            gm.clear_features_rest(mask)
+        else:
+            getattr(gm, op)(value, mask)
+    gm.delete_by_mask(~delete)
+
+
+def moving_script(seed=0):
+    """region edits and deletions around position noise large enough to move points across the regions"""
+    rng = np.random.default_rng(seed)
+
+    def sphere():
+        return Sphere(tuple(rng.uniform(-8, 8, size=3)), float(rng.uniform(4, 8)))
+
+    def box():
+        lo = rng.uniform(-15, 5, size=3)
+        return Box(tuple(lo), tuple(lo + 10))
+
+    return [('set_color', 0.9, box()),
+            ('add_position_noise', 2.0, sphere()),
+            ('set_alpha', 0.3, box()),
+            ('delete', None, sphere()),
+            ('set_rgb', [0.1, 0.5, 0.9], sphere()),
+            ('add_position_noise', 1.0, None),
+            ('delete', None, box()),
+            ('clear_features_rest', None, sphere()),
+            ('set_color', 0.2, sphere())]
+
+
+def eager_in_order(gm, script):
+    """every call right away, deletions included"""
+    for op, value, region in script:
+        if region is None:
+            mask = None
+        elif isinstance(region, Mask):
+            mask = region.mask
+        elif isinstance(region, Box):
+            mask = gm.position_mask(np.array(region.min), np.array(region.max))
+        else:
+            mask = gm.sphere_mask(region.center, region.radius)
+        if op == 'delete':
+            gm.delete_by_mask(~mask)
+        elif op == 'clear_features_rest':
+            gm.clear_features_rest(mask)
+        else:
+            getattr(gm, op)(value, mask)
+
+
+def check_moving_script(n, device):
+    script = moving_script()
+    eager_gm, buffered_gm = synthetic_manager(n, device), synthetic_manager(n, device)
+    eager_gm.seed_noise(0)
+    buffered_gm.seed_noise(0)
+    eager_in_order(eager_gm, script)
+    # every third survivor, only known once the eager deletions ran
+    survivors = eager_gm.gaussians.get_xyz.shape[0]
+    mask_edit = ('set_alpha', 0.7, Mask(torch.arange(survivors, device=eager_gm.device) % 3 == 0))
+    eager_in_order(eager_gm, [mask_edit])
+    buffered(buffered_gm, script + [mask_edit])
+    for name in ('_xyz', '_features_dc', '_features_rest', '_opacity'):
+        a, b = getattr(eager_gm.gaussians, name), getattr(buffered_gm.gaussians, name)
+        # fill values are converted in float32 by the buffer, a wrong selection differs by far more
+        assert a.shape == b.shape and torch.allclose(a, b, rtol=0, atol=1e-5), \
+            f'buffered script differs from the eager calls in {name}'
+    return eager_gm.gaussians.get_xyz.shape[0]
+
+
+def buffered(gm, script):
+    buffer = gm.edit_buffer().extend(script)
+    buffer.flush()
+    return buffer
+
+
+def bench_edits(n, num_edits, device):
+    device = torch.device(device)
+    script = random_script(num_edits)
+
+    eager_gm, buffered_gm = synthetic_manager(n, device), synthetic_manager(n, device)
+    eager(eager_gm, script)
+    log = buffered(buffered_gm, script).log
+    assert eager_gm.gaussians.get_xyz.shape[0] == buffered_gm.gaussians.get_xyz.shape[0]
+    # boxes are compared in float32 by the buffer, points right on a face may differ
+    mismatches = (eager_gm.gaussians._features_dc != buffered_gm.gaussians._features_dc).any(dim=2).sum().item()
+
+    replay_gm = synthetic_manager(n, device, seed=1)
+    replay_gm.replay(log)
+    moved_left = check_moving_script(n, device)
+
+    def timed(fn, repeat=3):
+        """the edits are destructive, every run starts from a fresh scene"""
+        times = []
+        for _ in range(repeat):
+            gm = synthetic_manager(n, device)
+            times.append(best_of(_synced(lambda: fn(gm, script), device), repeat=1))
+        return min(times)
+
+    return {
+        'eager (ms)': f'{timed(eager) * 1e3:.1f}',
+        'buffered (ms)': f'{timed(buffered) * 1e3:.1f}',
+        'left': buffered_gm.gaussians.get_xyz.shape[0],
+        'replay left': replay_gm.gaussians.get_xyz.shape[0],
+        'mismatches': mismatches,
+        'moving script left': moved_left,
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--edits', type=int, default=48)
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    rows = []
+    headers = None
+    for n in args.sizes:
+        results = bench_edits(n, args.edits, args.device)
+        headers = ['gaussians', 'edits'] + list(results.keys())
+        rows.append([n, args.edits] + list(results.values()))
+    print_table(f'scripted edits on {args.device}', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Ground truth images kept as float32 (12 bytes per rgb pixel, the alpha mask multiplied in)
+against uint8 with the alpha as a 4th channel (3 or 4 bytes), converted to float when a view
+is drawn. Reports the memory of the whole dataset on the device and the per iteration cost
+of the conversion, and checks that both give the same float image.
+
+    python -m benchmarks.bench_gt_storage [--count 300] [--size 1600 1200] [--alpha] [--device cuda]
+"""
+from argparse import ArgumentParser
+
+import torch
+
+from benchmarks.bench_spatial_index import _synced
+from benchmarks.bench_utils import best_of, print_table
+from utils.general_utils import pack_image, unpack_image
+
+
+def synthetic_images(count, size, alpha, device, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    base = torch.randint(0, 256, (4 if alpha else 3, size[1], size[0]), dtype=torch.uint8, generator=generator)
+    return [base.roll(i, dims=2).to(device) for i in range(count)]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--count', type=int, default=300)
+    parser.add_argument('--size', type=int, nargs=2, default=[1600, 1200])
+    parser.add_argument('--alpha', action='store_true')
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    packed = synthetic_images(args.count, args.size, args.alpha, device)
+    packed_bytes = sum(image.numel() for image in packed)
+
+    def to_float(image):
+        # what Camera kept before: the clamped float image with the alpha multiplied in
+        rgb = image[:3].float() / 255.0
+        if image.shape[0] == 4:
+            rgb *= image[3:4].float() / 255.0
+        return rgb.clamp(0.0, 1.0)
+
+    floats = [to_float(image) for image in packed[:min(args.count, 8)]]  # the dataset may not fit as float
+    float_bytes = floats[0].numel() * 4 * args.count
+    for image, reference in zip(packed, floats):
+        assert torch.equal(unpack_image(image), reference), 'uint8 storage changed the ground truth'
+        if not args.alpha:
+            assert torch.equal(pack_image(reference), image), 'float -> uint8 is not exact'
+
+    def draw_float():
+        for i in range(args.iterations):
+            floats[i % len(floats)].sum()  # stands in for the loss reading the drawn view
+
+    def draw_uint8():
+        for i in range(args.iterations):
+            unpack_image(packed[i % len(floats)]).sum()
+
+    float_time = best_of(_synced(draw_float, device))
+    uint8_time = best_of(_synced(draw_uint8, device))
+    rows = [
+        ['float32', f'{float_bytes / 2 ** 20:.0f}', f'{float_bytes / (args.count * args.size[0] * args.size[1]):.0f}',
+         '-'],
+        ['uint8', f'{packed_bytes / 2 ** 20:.0f}', f'{packed_bytes / (args.count * args.size[0] * args.size[1]):.0f}',
+         f'{(uint8_time - float_time) / args.iterations * 1000:+.3f}'],
+    ]
+    print_table(f'{args.count} ground truth images {args.size[0]}x{args.size[1]}'
+                f'{" with alpha" if args.alpha else ""} on {args.device}',
+                rows, ['storage', 'dataset MB', 'bytes / pixel', 'conversion ms / iter'])
+
+
+if __name__ == '__main__':
+    main()
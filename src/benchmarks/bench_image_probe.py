@@ -0,0 +1,95 @@
+"""
+Image dimensions of a whole dataset: keeping an Image.open handle per frame (what
+readCamerasFromTransforms did), a PIL header open closed right away, and the header probe of
+utils.image_probe serially and with a thread pool. Reports time and the open file descriptors
+held afterwards, and checks that all report the same sizes.
+
+    python -m benchmarks.bench_image_probe [--count 2000] [--size 1600 1200] [--workers 16]
+"""
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.bench_utils import print_table
+from utils.image_probe import probe_image_uncached, probe_images, clear_probe_cache
+
+
+def open_fds():
+    """open file descriptors of this process (linux), None elsewhere"""
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def synthetic_images(root, count, size, seed=0):
+    """jpgs and rgba pngs, the two formats of the camera readers"""
+    rng = np.random.default_rng(seed)
+    rgb = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    rgba = np.concatenate((rgb, np.full((size[1], size[0], 1), 255, dtype=np.uint8)), axis=2)
+    first_jpg = Image.fromarray(rgb)
+    first_png = Image.fromarray(rgba)
+    paths = []
+    for i in range(count):
+        if i % 2 == 0:
+            path = os.path.join(root, f'{i:05d}.jpg')
+            first_jpg.save(path, quality=90)
+        else:
+            path = os.path.join(root, f'{i:05d}.png')
+            first_png.save(path, compress_level=1)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--size', type=int, nargs=2, default=[1600, 1200])
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        paths = synthetic_images(tmp, args.count, args.size)
+        fds_before = open_fds()
+
+        start = time.perf_counter()
+        handles = [Image.open(path) for path in paths]
+        held = [image.size for image in handles]
+        elapsed = time.perf_counter() - start
+        fds = open_fds()
+        rows.append(['Image.open handles kept', f'{elapsed:.3f}', '-' if fds is None else fds - fds_before])
+        for image in handles:
+            image.close()
+        del handles
+
+        start = time.perf_counter()
+        sizes = []
+        for path in paths:
+            with Image.open(path) as image:
+                sizes.append(image.size)
+        rows.append(['Image.open + close', f'{time.perf_counter() - start:.3f}', 0])
+        assert sizes == held
+
+        start = time.perf_counter()
+        infos = [probe_image_uncached(path) for path in paths]
+        rows.append(['header probe, serial', f'{time.perf_counter() - start:.3f}', 0])
+        assert [(info.width, info.height) for info in infos] == held, 'probe sizes differ from PIL'
+
+        clear_probe_cache()
+        start = time.perf_counter()
+        infos = probe_images(paths, workers=args.workers)
+        rows.append([f'probe_images, {args.workers} workers', f'{time.perf_counter() - start:.3f}', 0])
+        assert [(info.width, info.height) for info in infos] == held
+
+    print_table(f'dimensions of {args.count} {args.size[0]}x{args.size[1]} images (jpg / png)', rows,
+                ['mode', 'time (s)', 'fds held'])
+
+
+if __name__ == '__main__':
+    main()
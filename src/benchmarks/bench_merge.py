@@ -0,0 +1,89 @@
+"""
+Toggle, edit and add latency of a GaussianCollection style merge as the number of loaded
+managers grows: concatenating everything again (the old merge_gaussian_managers) against
+MergedGaussianView, which only rewrites the rows of the manager that changed.
+
+    python -m benchmarks.bench_merge [--tiles 1 2 5 10] [--tile_size 200000] [--device cuda]
+"""
+from argparse import ArgumentParser
+
+import torch
+
+from benchmarks.bench_spatial_index import _synced
+from benchmarks.bench_utils import best_of, print_table
+from manager.gaussian_manager import GaussianManager
+from manager.merged_view import MergedGaussianView, ATTRIBUTES
+from scene.gaussian_model import GaussianModel
+
+
+def synthetic_tile(n, device, seed, sh_degree=3):
+    generator = torch.Generator().manual_seed(seed)
+    gaussians = GaussianModel(sh_degree, device=device)
+    gaussians._xyz = (torch.randn((n, 3), generator=generator) * 10).to(device)
+    gaussians._features_dc = torch.randn((n, 1, 3), generator=generator).to(device)
+    gaussians._features_rest = torch.randn((n, (sh_degree + 1) ** 2 - 1, 3), generator=generator).to(device)
+    gaussians._scaling = torch.randn((n, 3), generator=generator).to(device)
+    gaussians._rotation = torch.randn((n, 4), generator=generator).to(device)
+    gaussians._opacity = torch.randn((n, 1), generator=generator).to(device)
+    gaussians.max_radii2D = torch.zeros(n, device=device)
+    return GaussianManager.from_gaussians(gaussians)
+
+
+def concat_merge(gms):
+    """what every add / remove / toggle cost before: all visible managers concatenated again"""
+    return {name: torch.cat([getattr(gm.gaussians, name).detach() for gm in gms]) for name in ATTRIBUTES}
+
+
+def bench_tiles(num_tiles, tile_size, device):
+    device = torch.device(device)
+    gms = [synthetic_tile(tile_size, device, seed) for seed in range(num_tiles)]
+    extra = synthetic_tile(tile_size, device, num_tiles)
+    view = MergedGaussianView(gms)
+    expected = concat_merge(gms)
+    for name in ATTRIBUTES:
+        assert torch.equal(getattr(view.gm.gaussians, name), expected[name])
+
+    def toggle():
+        view.set_visible(gms[0], False)
+        view.set_visible(gms[0], True)
+
+    def edit():
+        gms[-1].set_alpha(0.5)  # marks the last manager as changed
+        view.refresh()
+
+    def add_remove():
+        view.add(extra)
+        view.remove(extra)
+
+    rows_before = view.rows_written
+    toggle()
+    toggle_rows = view.rows_written - rows_before
+    return {
+        'concat (ms)': f'{best_of(_synced(lambda: concat_merge(gms), device)) * 1e3:.1f}',
+        'build (ms)': f'{best_of(_synced(lambda: MergedGaussianView(gms), device)) * 1e3:.1f}',
+        'toggle (ms)': f'{best_of(_synced(toggle, device)) * 1e3:.1f}',
+        'edit (ms)': f'{best_of(_synced(edit, device)) * 1e3:.1f}',
+        'add+remove (ms)': f'{best_of(_synced(add_remove, device)) * 1e3:.1f}',
+        'toggle rows': toggle_rows,
+        'merged MB': f'{sum(t.numel() * t.element_size() for t in expected.values()) / 2 ** 20:.0f}',
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--tiles', type=int, nargs='+', default=[1, 2, 5, 10])
+    parser.add_argument('--tile_size', type=int, default=200_000)
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    rows = []
+    headers = None
+    for num_tiles in args.tiles:
+        results = bench_tiles(num_tiles, args.tile_size, args.device)
+        headers = ['managers'] + list(results.keys())
+        rows.append([num_tiles] + list(results.values()))
+    print_table(f'merged view of {args.tile_size} gaussians per manager on {args.device}', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
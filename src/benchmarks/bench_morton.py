@@ -0,0 +1,81 @@
+"""
+Region queries and box-limited container loads with and without Morton (Z-order) reordering.
+Besides the timings it reports the share of row blocks / container chunks whose bounds intersect
+the query box, i.e. what a range-skipping query has to touch.
+
+    python -m benchmarks.bench_morton [--sizes 100000 1000000] [--device cpu]
+"""
+import os
+import tempfile
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+
+from benchmarks.bench_ply_io import chunked_save_ply
+from benchmarks.bench_utils import best_of, random_gaussian_arrays, print_table
+from manager.gaussian_manager import GaussianManager, create_gaussian_from_ply
+from scene.gaussian_model import GaussianModel
+from utils.container_utils import GaussianContainer
+
+BLOCK_SIZE = 4096
+
+
+def touched_blocks(xyz: torch.Tensor, lo, hi, block_size=BLOCK_SIZE):
+    """share of consecutive row blocks whose bounding box intersects [lo, hi]"""
+    n = xyz.shape[0]
+    pad = (-n) % block_size
+    xyz = torch.cat((xyz, xyz[-1:].expand(pad, 3))).reshape(-1, block_size, 3)
+    lo = torch.tensor(lo, dtype=xyz.dtype, device=xyz.device)
+    hi = torch.tensor(hi, dtype=xyz.dtype, device=xyz.device)
+    hit = ((xyz.min(dim=1).values <= hi) & (xyz.max(dim=1).values >= lo)).all(dim=1)
+    return hit.float().mean().item()
+
+
+def bench_order(ply_path, gsc_path, device, morton, lo, hi):
+    gaussians = create_gaussian_from_ply(3, ply_path, device=device, morton_order=morton)
+    gm = GaussianManager.from_gaussians(gaussians)
+    gaussians.save_container(gsc_path)
+    with GaussianContainer(gsc_path) as container:
+        chunks = len(container.chunks_in_box(lo, hi)) / container.num_chunks
+
+    def mask():
+        gm.position_mask(np.array(lo), np.array(hi))
+        if gm.device.type == 'cuda':
+            torch.cuda.synchronize()
+
+    def load():
+        GaussianModel(3, device).load_container(gsc_path, bbox=(lo, hi))
+
+    return {
+        'mask (ms)': f'{best_of(mask) * 1e3:.1f}',
+        'blocks': f'{touched_blocks(gaussians.get_xyz.detach(), lo, hi) * 100:.1f}%',
+        'chunks': f'{chunks * 100:.1f}%',
+        'box load (ms)': f'{best_of(load) * 1e3:.1f}',
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    lo, hi = [-3.0, -3.0, -3.0], [3.0, 3.0, 3.0]  # ~1% of the synthetic gaussians
+    rows = []
+    headers = None
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        for n in args.sizes:
+            ply_path = os.path.join(tmp, f'{n}.ply')
+            chunked_save_ply(ply_path, random_gaussian_arrays(n))
+            for morton in (False, True):
+                gsc_path = os.path.join(tmp, f'{n}_{morton}.gsc')
+                results = bench_order(ply_path, gsc_path, args.device, morton, lo, hi)
+                headers = ['gaussians', 'order'] + list(results.keys())
+                rows.append([n, 'morton' if morton else 'insertion'] + list(results.values()))
+    print_table(f'region query and box load on {args.device}', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
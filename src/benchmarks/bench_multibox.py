@@ -0,0 +1,81 @@
+"""
+Region masks of many boxes (GaussianManager.masks_from_json / mask_from_json) with one position_mask
+pass per box against the batched boxes_mask, which tests all boxes against chunks of points at once.
+
+    python -m benchmarks.bench_multibox [--sizes 1000000 5000000] [--boxes 16 128] [--device cuda]
+"""
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+
+from benchmarks.bench_spatial_index import synthetic_manager, _synced
+from benchmarks.bench_utils import best_of, print_table
+
+NUM_REGIONS = 8
+
+
+def random_regions(num_boxes, seed=0):
+    """[region][(min, max)] like GaussianManager.bboxes_from_json"""
+    rng = np.random.default_rng(seed)
+    regions = [[] for _ in range(NUM_REGIONS)]
+    for i in range(num_boxes):
+        lo = rng.uniform(-20, 16, size=3)
+        regions[i % NUM_REGIONS].append((lo, lo + rng.uniform(1, 4, size=3)))
+    return regions
+
+
+def loop_masks(gm, regions, use_index):
+    masks = []
+    for region in regions:
+        mask = gm.zero_like_mask()
+        for bbox in region:
+            mask |= gm.position_mask(*bbox, use_index=use_index)
+        masks.append(mask)
+    return masks
+
+
+def batched_masks(gm, regions, labels=False):
+    groups = [i for i, region in enumerate(regions) for _ in region]
+    return gm.boxes_mask([bbox for region in regions for bbox in region], groups, len(regions), labels=labels)
+
+
+def bench_boxes(n, num_boxes, device):
+    device = torch.device(device)
+    gm = synthetic_manager(n, device)
+    regions = random_regions(num_boxes)
+    gm.spatial_index  # built once, not part of the timings
+
+    expected = torch.stack(loop_masks(gm, regions, use_index=False))
+    assert torch.equal(batched_masks(gm, regions), expected)
+    labels = batched_masks(gm, regions, labels=True)
+    assert torch.equal(labels >= 0, expected.any(dim=0))
+
+    return {
+        'loop (ms)': f'{best_of(_synced(lambda: loop_masks(gm, regions, False), device)) * 1e3:.1f}',
+        'loop index (ms)': f'{best_of(_synced(lambda: loop_masks(gm, regions, True), device)) * 1e3:.1f}',
+        'batched (ms)': f'{best_of(_synced(lambda: batched_masks(gm, regions), device)) * 1e3:.1f}',
+        'labels (ms)': f'{best_of(_synced(lambda: batched_masks(gm, regions, True), device)) * 1e3:.1f}',
+        'inside': f'{expected.any(dim=0).float().mean().item() * 100:.1f}%',
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--boxes', type=int, nargs='+', default=[16, 128])
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    rows = []
+    headers = None
+    for n in args.sizes:
+        for num_boxes in args.boxes:
+            results = bench_boxes(n, num_boxes, args.device)
+            headers = ['gaussians', 'boxes'] + list(results.keys())
+            rows.append([n, num_boxes] + list(results.values()))
+    print_table(f'{NUM_REGIONS} region masks on {args.device}', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
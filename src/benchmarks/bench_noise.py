@@ -0,0 +1,78 @@
+"""
+Position noise drawn on the host with np.random (float64, copied to the device and cast, the old
+add_position_noise) against GaussianManager.add_noise, which draws float32 noise on the device
+from its own seeded generator and only for the masked rows. Also checks that two managers with
+the same seed end up identical.
+
+    python -m benchmarks.bench_noise [--sizes 1000000 5000000] [--ratio 0.1] [--device cuda]
+"""
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+
+from benchmarks.bench_spatial_index import synthetic_manager, _synced
+from benchmarks.bench_utils import best_of, print_table
+
+
+def host_noise(gm, std, mask):
+    """the old add_position_noise"""
+    with torch.no_grad():
+        size = gm.gaussians._xyz[mask].shape
+        noise = torch.from_numpy(np.random.normal(0.0, std, size=size)).to(gm.gaussians._xyz)
+        gm.gaussians._xyz[mask] += noise
+
+
+def peak_bytes(fn, device):
+    """extra device memory allocated while fn runs (cuda only)"""
+    if device.type != 'cuda':
+        return None
+    torch.cuda.synchronize()
+    torch.cuda.reset_peak_memory_stats()
+    before = torch.cuda.memory_allocated()
+    fn()
+    torch.cuda.synchronize()
+    return torch.cuda.max_memory_allocated() - before
+
+
+def bench_noise(n, ratio, device):
+    device = torch.device(device)
+    gm = synthetic_manager(n, device)
+    mask = torch.rand(n, device=device) < ratio
+
+    a, b = synthetic_manager(n, device), synthetic_manager(n, device)
+    for other in (a, b):
+        other.seed_noise(42)
+        for kind in ('position', 'color', 'opacity', 'scale'):
+            other.add_noise(kind, 0.1, mask)
+    assert all(torch.equal(getattr(a.gaussians, name), getattr(b.gaussians, name))
+               for name in ('_xyz', '_features_dc', '_opacity', '_scaling'))
+
+    results = {}
+    for name, fn in (('host', lambda: host_noise(gm, 0.01, mask)),
+                     ('device', lambda: gm.add_position_noise(0.01, mask))):
+        results[f'{name} (ms)'] = f'{best_of(_synced(fn, device)) * 1e3:.1f}'
+        peak = peak_bytes(fn, device)
+        results[f'{name} peak MB'] = '-' if peak is None else f'{peak / 2 ** 20:.1f}'
+    results['host array MB'] = f'{int(mask.sum()) * 3 * 8 / 2 ** 20:.1f}'
+    return results
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--ratio', type=float, default=0.1)
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    rows = []
+    headers = None
+    for n in args.sizes:
+        results = bench_noise(n, args.ratio, args.device)
+        headers = ['gaussians'] + list(results.keys())
+        rows.append([n] + list(results.values()))
+    print_table(f'masked position noise ({args.ratio:.0%} of the gaussians) on {args.device}', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Throughput of the chunked ply writer (utils.ply_utils.write_vertex_ply) against the legacy
+`elements[:] = list(map(tuple, attributes))` + plyfile path. Also checks both files are byte-identical.
+
+    python -m benchmarks.bench_ply_io [--sizes 100000 1000000] [--tmp_dir /tmp]
+"""
+import filecmp
+import os
+import tempfile
+from argparse import ArgumentParser
+
+import numpy as np
+from plyfile import PlyData, PlyElement
+
+from benchmarks.bench_utils import best_of, random_gaussian_arrays, gaussian_attribute_names, print_table
+from utils.ply_utils import write_vertex_ply
+
+
+def legacy_save_ply(path, arrays):
+    xyz = arrays['xyz']
+    normals = np.zeros_like(xyz)
+    dtype_full = [(attribute, 'f4') for attribute in gaussian_attribute_names()]
+    elements = np.empty(xyz.shape[0], dtype=dtype_full)
+    attributes = np.concatenate((xyz, normals, arrays['f_dc'], arrays['f_rest'], arrays['opacity'],
+                                 arrays['scale'], arrays['rotation']), axis=1)
+    elements[:] = list(map(tuple, attributes))
+    el = PlyElement.describe(elements, 'vertex')
+    PlyData([el]).write(path)
+
+
+def chunked_save_ply(path, arrays):
+    names = gaussian_attribute_names()
+    columns = []
+    offset = 0
+    for array in (arrays['xyz'], None, arrays['f_dc'], arrays['f_rest'], arrays['opacity'],
+                  arrays['scale'], arrays['rotation']):
+        width = 3 if array is None else array.shape[1]
+        columns.append((names[offset:offset + width], array, 'f4'))
+        offset += width
+    write_vertex_ply(path, columns)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        for n in args.sizes:
+            arrays = random_gaussian_arrays(n)
+            legacy_path = os.path.join(tmp, f'legacy_{n}.ply')
+            chunked_path = os.path.join(tmp, f'chunked_{n}.ply')
+            t_legacy = best_of(lambda: legacy_save_ply(legacy_path, arrays), repeat=1)
+            t_chunked = best_of(lambda: chunked_save_ply(chunked_path, arrays))
+            size_mb = os.path.getsize(chunked_path) / 1024 ** 2
+            identical = filecmp.cmp(legacy_path, chunked_path, shallow=False)
+            rows.append((n, f'{size_mb:.1f}', f'{size_mb / t_legacy:.1f}', f'{size_mb / t_chunked:.1f}',
+                         f'{t_legacy / t_chunked:.1f}x', identical))
+    print_table('save_ply throughput (MB/s)', rows, ['gaussians', 'file MB', 'legacy', 'chunked', 'speedup', 'identical'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Load time of the memory-mapped ply reader (utils.ply_utils.PlyVertexMap) against the legacy plyfile path
+used by GaussianModel.load_ply, for a full load, a truncated SH degree 0 load and a position-only preview.
+
+    python -m benchmarks.bench_ply_load [--sizes 100000 1000000]
+"""
+import os
+import tempfile
+from argparse import ArgumentParser
+
+import numpy as np
+from plyfile import PlyData
+
+from benchmarks.bench_ply_io import chunked_save_ply
+from benchmarks.bench_utils import best_of, random_gaussian_arrays, print_table
+from utils.ply_utils import PlyVertexMap
+
+
+def legacy_load(path):
+    plydata = PlyData.read(path)
+    el = plydata.elements[0]
+    xyz = np.stack((np.asarray(el["x"]), np.asarray(el["y"]), np.asarray(el["z"])), axis=1)
+    features_dc = np.zeros((xyz.shape[0], 3, 1))
+    for i in range(3):
+        features_dc[:, i, 0] = np.asarray(el[f"f_dc_{i}"])
+    extra_f_names = sorted([p.name for p in el.properties if p.name.startswith("f_rest_")],
+                           key=lambda x: int(x.split('_')[-1]))
+    features_extra = np.zeros((xyz.shape[0], len(extra_f_names)))
+    for idx, attr_name in enumerate(extra_f_names):
+        features_extra[:, idx] = np.asarray(el[attr_name])
+    opacities = np.asarray(el["opacity"])[..., np.newaxis]
+    scales = np.stack([np.asarray(el[f"scale_{i}"]) for i in range(3)], axis=1)
+    rots = np.stack([np.asarray(el[f"rot_{i}"]) for i in range(4)], axis=1)
+    return xyz, features_dc, features_extra, opacities, scales, rots
+
+
+def mmap_load(path, sh_degree=3):
+    with PlyVertexMap(path) as ply:
+        n = ply.count
+        num_coeffs = (sh_degree + 1) ** 2 - 1
+        return (PlyVertexMap.materialize(ply.xyz),
+                PlyVertexMap.materialize(ply.f_dc.reshape(n, 3, 1).transpose(0, 2, 1)),
+                PlyVertexMap.materialize(ply.f_rest.reshape(n, 3, -1)[:, :, :num_coeffs].transpose(0, 2, 1)),
+                PlyVertexMap.materialize(ply.opacity),
+                PlyVertexMap.materialize(ply.scale),
+                PlyVertexMap.materialize(ply.rot))
+
+
+def legacy_positions(path):
+    el = PlyData.read(path).elements[0]
+    return np.stack((np.asarray(el["x"]), np.asarray(el["y"]), np.asarray(el["z"])), axis=1)
+
+
+def mmap_positions(path):
+    with PlyVertexMap(path) as ply:
+        return PlyVertexMap.materialize(ply.xyz)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        for n in args.sizes:
+            path = os.path.join(tmp, f'{n}.ply')
+            chunked_save_ply(path, random_gaussian_arrays(n))
+            assert np.array_equal(legacy_positions(path), mmap_positions(path))
+            t_full_legacy = best_of(lambda: legacy_load(path))
+            t_full_mmap = best_of(lambda: mmap_load(path))
+            t_sh0_mmap = best_of(lambda: mmap_load(path, sh_degree=0))
+            full_mb = sum(a.nbytes for a in mmap_load(path)) / 1024 ** 2
+            sh0_mb = sum(a.nbytes for a in mmap_load(path, sh_degree=0)) / 1024 ** 2
+            t_pos_legacy = best_of(lambda: legacy_positions(path))
+            t_pos_mmap = best_of(lambda: mmap_positions(path))
+            rows.append((n, f'{t_full_legacy * 1e3:.1f}', f'{t_full_mmap * 1e3:.1f}', f'{t_sh0_mmap * 1e3:.1f}',
+                         f'{full_mb:.1f}', f'{sh0_mb:.1f}', f'{t_pos_legacy * 1e3:.1f}', f'{t_pos_mmap * 1e3:.1f}'))
+    print_table('ply load (ms, host side only)', rows,
+                ['gaussians', 'full legacy', 'full mmap', 'sh0 mmap', 'full MB', 'sh0 MB', 'xyz legacy', 'xyz mmap'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Training loop data loading with CameraPrefetcher at several queue depths. Lazy cameras over
+synthetic jpgs, the image cache is kept small so every view is decoded again, and the render /
+backward step is simulated by a fixed busy wait. Reports time per iteration and loader stall,
+and checks that every depth draws the same sequence of cameras.
+
+    python -m benchmarks.bench_prefetch [--count 100] [--size 1600 1200] [--iterations 200] [--step_ms 20]
+"""
+import random
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+
+import torch
+
+from benchmarks.bench_camera_load import synthetic_dataset
+from benchmarks.bench_utils import print_table
+from utils.camera_utils import loadCam
+from utils.image_cache import clear_image_caches, set_image_cache_budget
+from utils.prefetch_utils import CameraPrefetcher
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def run(cameras, depth, device, iterations, step_ms, workers, seed=0):
+    clear_image_caches()
+    random.seed(seed)
+    order = []
+    with CameraPrefetcher(cameras, depth=depth, device=device, workers=workers) as prefetcher:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            camera, image = prefetcher.next()
+            image.sum().item()
+            busy_wait(step_ms / 1000)
+            order.append(camera.uid)
+        total = time.perf_counter() - start
+        stats = prefetcher.stats()
+    return total, stats, order
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--size', type=int, nargs=2, default=[1600, 1200])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--step_ms', type=float, default=20.0)
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 1, 2, 4, 8])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        cam_infos = synthetic_dataset(tmp, args.count, args.size)
+        load_args = Namespace(resolution=1, data_device='cpu', eager_images=False)
+        cameras = [loadCam(load_args, i, cam_info, 1.0) for i, cam_info in enumerate(cam_infos)]
+        set_image_cache_budget('cpu', 0)  # only the newest image stays, every view is decoded
+
+        rows = []
+        reference = None
+        for depth in args.depths:
+            total, stats, order = run(cameras, depth, args.device, args.iterations, args.step_ms, args.workers)
+            reference = order if reference is None else reference
+            rows.append([depth, f'{total / args.iterations * 1000:.1f}', f'{stats["mean_stall_ms"]:.2f}',
+                         f'{stats["total_stall_s"]:.2f}', 'yes' if order == reference else 'NO'])
+    print_table(f'{args.count} lazy {args.size[0]}x{args.size[1]} views -> {args.device}, '
+                f'{args.step_ms:.0f}ms per step, {args.workers} workers',
+                rows, ['depth', 'ms / iter', 'stall ms / iter', 'stall total (s)', 'same order'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Opening a COLMAP scene with readColmapSceneInfo (parse the sparse model, normalization, read
+points3D.ply) against the scene info cache in <source>/cache/scene_info.npz: cold (parse and
+write the cache) and warm (key check and one .npz read). Also checks that a warm load returns
+the same cameras and point cloud, and that touching the sparse model invalidates the cache.
+
+    python -m benchmarks.bench_scene_cache [--points 100000 1000000] [--images 1000]
+"""
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from benchmarks.bench_colmap_binary import write_synthetic_model
+from benchmarks.bench_utils import print_table
+from scene.dataset_readers import readColmapSceneInfo, readColmapSceneInfoCached, SCENE_CACHE_NAME
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def check_same(a, b):
+    assert len(a.train_cameras) == len(b.train_cameras) and len(a.test_cameras) == len(b.test_cameras)
+    for x, y in zip(a.train_cameras + a.test_cameras, b.train_cameras + b.test_cameras):
+        assert x.uid == y.uid and x.image_path == y.image_path and x.image_name == y.image_name
+        assert np.array_equal(x.R, y.R) and np.array_equal(x.T, y.T) and x.FovX == y.FovX and x.FovY == y.FovY
+    assert np.array_equal(a.point_cloud.points, b.point_cloud.points), 'point clouds differ'
+    assert a.nerf_normalization['radius'] == b.nerf_normalization['radius'], 'normalization differs'
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--points', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--images', type=int, default=1000)
+    parser.add_argument('--points2D', type=int, default=2000)
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    for num_points in args.points:
+        with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+            sparse = os.path.join(tmp, 'sparse', '0')
+            os.makedirs(sparse)
+            write_synthetic_model(sparse, num_points, args.images, track=4, points2D=args.points2D)
+            readColmapSceneInfo(tmp, None, True)  # converts points3D.bin to .ply once, as on a first open
+
+            parse_time, reference = timed(readColmapSceneInfo, tmp, None, True)
+            cold_time, _ = timed(readColmapSceneInfoCached, tmp, None, True)
+            warm_time, cached = timed(readColmapSceneInfoCached, tmp, None, True)
+            check_same(reference, cached)
+            cache_mb = os.path.getsize(os.path.join(tmp, 'cache', SCENE_CACHE_NAME)) / 2 ** 20
+
+            images_bin = os.path.join(sparse, 'images.bin')
+            os.utime(images_bin)  # new mtime, same content: still valid
+            touched_time, _ = timed(readColmapSceneInfoCached, tmp, None, True)
+            with open(os.path.join(sparse, 'cameras.bin'), 'r+b') as fid:
+                fid.seek(-8, os.SEEK_END)
+                fid.write(np.float64(301.0).tobytes())  # changed principal point, must rebuild
+            changed_time, _ = timed(readColmapSceneInfoCached, tmp, None, True)
+            rows.append([num_points, args.images, f'{parse_time:.2f}', f'{cold_time:.2f}', f'{warm_time:.3f}',
+                         f'{touched_time:.3f}', f'{changed_time:.2f}', f'{cache_mb:.0f}'])
+
+    print_table('scene info load, seconds', rows,
+                ['points', 'images', 'readColmapSceneInfo', 'cold', 'warm', 'warm (touched)', 'changed', 'cache MB'])
+
+
+if __name__ == '__main__':
+    main()
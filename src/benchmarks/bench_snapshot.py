@@ -0,0 +1,94 @@
+"""
+Virtual edits (cache -> set_rgb -> restore) and undo history with copy-on-write snapshots against
+the former copy.deepcopy of the whole GaussianModel.
+
+    python -m benchmarks.bench_snapshot [--sizes 1000000 3000000] [--device cuda]
+"""
+import copy
+import os
+import tempfile
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+
+from benchmarks.bench_ply_io import chunked_save_ply
+from benchmarks.bench_utils import best_of, random_gaussian_arrays, print_table
+from manager.gaussian_manager import GaussianManager, create_gaussian_from_ply
+
+
+def deepcopy_edit(gm, mask, color):
+    """the former cache / restore"""
+    backup = gm.gaussians
+    gm.gaussians = copy.deepcopy(gm.gaussians)
+    gm.set_rgb(color, mask)
+    gm.gaussians = backup
+
+
+def cow_edit(gm, mask, color):
+    gm.cache()
+    gm.set_rgb(color, mask)
+    gm.restore()
+
+
+def _measure(fn, device):
+    def run():
+        fn()
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+        base = torch.cuda.memory_allocated()
+        torch.cuda.reset_peak_memory_stats()
+    seconds = best_of(run)
+    peak = (torch.cuda.max_memory_allocated() - base) / 2 ** 20 if device.type == 'cuda' else float('nan')
+    return f'{seconds * 1e3:.1f}', f'{peak:.0f}'
+
+
+def bench_snapshot(path, device):
+    device = torch.device(device)
+    gm = GaussianManager.from_gaussians(create_gaussian_from_ply(3, path, device=device))
+    mask = gm.position_mask(np.array([-5.0, -5.0, -5.0]), np.array([5.0, 5.0, 5.0]))
+    color = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+
+    results = {}
+    results['deepcopy (ms)'], results['deepcopy peak (MB)'] = _measure(lambda: deepcopy_edit(gm, mask, color), device)
+    results['cow (ms)'], results['cow peak (MB)'] = _measure(lambda: cow_edit(gm, mask, color), device)
+
+    # 10 committed edits, then undo all of them
+    for i in range(10):
+        gm.cache()
+        if i % 2:
+            gm.set_alpha(0.1 * i, mask)
+        else:
+            gm.set_rgb(color, mask)
+        gm.apply(f'edit {i}')
+    results['history (MB)'] = f'{gm.history_footprint()["bytes"] / 2 ** 20:.0f}'
+    results['model (MB)'] = f'{gm.gaussians.tensor_nbytes() / 2 ** 20:.0f}'
+    while gm.undo() is not None:
+        pass
+    return results
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 3_000_000])
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    rows = []
+    headers = None
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        for n in args.sizes:
+            path = os.path.join(tmp, f'{n}.ply')
+            chunked_save_ply(path, random_gaussian_arrays(n))
+            results = bench_snapshot(path, args.device)
+            headers = ['gaussians'] + list(results.keys())
+            rows.append([n] + list(results.values()))
+    print_table(f'virtual edit snapshots on {args.device}', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Box, sphere, prism and frustum masks through GaussianManager.spatial_index against the brute force
+test of every gaussian. Also counts the gaussians where both masks differ (only expected for
+frustum points right on a clip plane, the matmul of a subset may round differently).
+
+    python -m benchmarks.bench_spatial_index [--sizes 1000000 5000000] [--device cuda]
+"""
+import math
+import time
+from argparse import ArgumentParser
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from benchmarks.bench_utils import best_of, print_table
+from manager.gaussian_manager import GaussianManager
+from scene.gaussian_model import GaussianModel
+from utils.graphics_utils import getWorld2View2, getProjectionMatrix
+from utils.spatial_utils import SpatialIndex, points_in_polygon, points_in_frustum
+
+
+def _synced(fn, device):
+    def run():
+        fn()
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+
+    return run
+
+
+def synthetic_manager(n, device, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    gaussians = GaussianModel(0, device=device)
+    gaussians._xyz = (torch.randn((n, 3), generator=generator) * 10).to(device)
+    gaussians._features_dc = torch.zeros((n, 1, 3), device=device)
+    gaussians._features_rest = torch.zeros((n, 0, 3), device=device)
+    gaussians._scaling = torch.zeros((n, 3), device=device)
+    gaussians._rotation = torch.zeros((n, 4), device=device)
+    gaussians._opacity = torch.zeros((n, 1), device=device)
+    gaussians.max_radii2D = torch.zeros(n, device=device)
+    return GaussianManager.from_gaussians(gaussians)
+
+
+def synthetic_camera(device):
+    R = np.eye(3)
+    T = np.array([0.0, 0.0, 30.0])
+    world_view = torch.tensor(getWorld2View2(R, T)).transpose(0, 1)
+    projection = getProjectionMatrix(znear=0.01, zfar=100.0, fovX=math.radians(30), fovY=math.radians(30)).transpose(0, 1)
+    return SimpleNamespace(full_proj_transform=(world_view @ projection).to(device))
+
+
+def bench_index(n, device):
+    device = torch.device(device)
+    gm = synthetic_manager(n, device)
+    xyz = gm.gaussians.get_xyz
+    lo, hi = torch.tensor([-3.0, -3.0, -3.0], device=device), torch.tensor([3.0, 3.0, 3.0], device=device)
+    center, radius = torch.tensor([5.0, 0.0, 0.0], device=device), 3.0
+    polygon = np.array([[0.0, 0.0], [6.0, 0.0], [6.0, 4.0], [3.0, 7.0], [0.0, 4.0]], dtype=np.float32)
+    camera = synthetic_camera(device)
+
+    queries = {
+        'box': (lambda: gm.position_mask(lo, hi),
+                lambda: gm.position_mask(lo, hi, use_index=False)),
+        'sphere': (lambda: gm.sphere_mask(center, radius),
+                   lambda: ((xyz - center) ** 2).sum(dim=1) <= radius ** 2),
+        'prism': (lambda: gm.prism_mask(polygon, -2.0, 2.0),
+                  lambda: points_in_polygon(xyz[:, :2], polygon) & (xyz[:, 2] >= -2.0) & (xyz[:, 2] <= 2.0)),
+        'frustum': (lambda: gm.frustum_mask(camera),
+                    lambda: points_in_frustum(xyz, camera.full_proj_transform)),
+    }
+
+    start = time.perf_counter()
+    gm._spatial_index = SpatialIndex(xyz)
+    _synced(lambda: None, device)()
+    results = {'build (ms)': f'{(time.perf_counter() - start) * 1e3:.1f}'}
+    mismatches = 0
+    for name, (indexed, brute) in queries.items():
+        mismatches += (indexed() != brute()).sum().item()
+        results[f'{name} index (ms)'] = f'{best_of(_synced(indexed, device)) * 1e3:.1f}'
+        results[f'{name} brute (ms)'] = f'{best_of(_synced(brute, device)) * 1e3:.1f}'
+
+    keep = torch.rand(n, device=device) > 0.1
+    start = time.perf_counter()
+    gm.delete_by_mask(keep)
+    _synced(lambda: None, device)()
+    results['delete patch (ms)'] = f'{(time.perf_counter() - start) * 1e3:.1f}'
+    assert gm._valid_spatial_index() is not None
+    assert torch.equal(gm.position_mask(lo, hi), gm.position_mask(lo, hi, use_index=False))
+    results['mismatches'] = mismatches
+    return results
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    rows = []
+    headers = None
+    for n in args.sizes:
+        results = bench_index(n, args.device)
+        headers = ['gaussians'] + list(results.keys())
+        rows.append([n] + list(results.values()))
+    print_table(f'spatial index queries on {args.device}', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
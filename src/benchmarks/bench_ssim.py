@@ -0,0 +1,71 @@
+"""
+SSIM as the training loss computes it: the original implementation (new 2D window built on the
+host and copied to the device on every call, five 2D convolutions) against the cached window
+with the five blurs fused into one grouped convolution, 2D and separable, plus the batched
+per image mode of metrics.py. Forward and backward, checked against the original to tolerance.
+
+    python -m benchmarks.bench_ssim [--size 1600 1200] [--batch 8] [--devices cpu cuda]
+"""
+from argparse import ArgumentParser
+
+import torch
+
+from benchmarks.bench_spatial_index import _synced
+from benchmarks.bench_utils import best_of, print_table
+from utils.loss_utils import ssim, ssim_batched, ssim_reference
+
+
+def check(device, size):
+    generator = torch.Generator().manual_seed(0)
+    img1 = torch.rand((3, size[1], size[0]), generator=generator).to(device)
+    img2 = (img1 + 0.1 * torch.rand((3, size[1], size[0]), generator=generator).to(device)).clamp(0, 1)
+    reference = ssim_reference(img1, img2)
+    for separable in (False, True):
+        value = ssim(img1, img2, separable=separable)
+        assert torch.allclose(value, reference, atol=1e-5), f'ssim differs: {value.item()} {reference.item()}'
+    return img1, img2
+
+
+def bench_loss(fn, img1, img2, iterations):
+    def run():
+        for _ in range(iterations):
+            image = img1.detach().requires_grad_(True)
+            (1.0 - fn(image, img2)).backward()
+
+    return best_of(_synced(run, img1.device)) / iterations
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--size', type=int, nargs=2, default=[1600, 1200])
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--devices', type=str, nargs='+',
+                        default=['cpu', 'cuda'] if torch.cuda.is_available() else ['cpu'])
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.devices:
+        device = torch.device(name)
+        iterations = args.iterations if device.type == 'cuda' else max(args.iterations // 10, 1)
+        img1, img2 = check(device, args.size)
+        base = bench_loss(ssim_reference, img1, img2, iterations)
+        rows.append([name, 'original, forward + backward', f'{base * 1000:.2f}', '1.00x'])
+        for label, separable in (('cached 2D, fused', False), ('cached separable, fused', True)):
+            t = bench_loss(lambda a, b: ssim(a, b, separable=separable), img1, img2, iterations)
+            rows.append([name, f'{label}, forward + backward', f'{t * 1000:.2f}', f'{base / t:.2f}x'])
+
+        imgs1 = [img1[None] for _ in range(args.batch)]
+        imgs2 = [img2[None] for _ in range(args.batch)]
+        with torch.no_grad():
+            reference = torch.stack([ssim_reference(a, b) for a, b in zip(imgs1, imgs2)])
+            assert torch.allclose(ssim_batched(imgs1, imgs2), reference, atol=1e-5), 'batched ssim differs'
+            loop = best_of(_synced(lambda: [ssim_reference(a, b) for a, b in zip(imgs1, imgs2)], device))
+            batched = best_of(_synced(lambda: ssim_batched(imgs1, imgs2), device))
+        rows.append([name, f'original, {args.batch} images one by one', f'{loop * 1000:.2f}', '1.00x'])
+        rows.append([name, f'ssim_batched, {args.batch} images', f'{batched * 1000:.2f}', f'{loop / batched:.2f}x'])
+    print_table(f'ssim of {args.size[0]}x{args.size[1]} images', rows, ['device', 'mode', 'ms', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
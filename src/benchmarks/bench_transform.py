@@ -0,0 +1,152 @@
+"""
+Similarity transform of gaussians (xyz, quaternions, log-scales, SH bands 1-3) and of a camera
+batch through utils.transform_utils, against a per-element reference: matrices per gaussian, and
+the SH checked by comparing colors, the transformed gaussian seen from d has to look like the
+original one seen from R^T d. Cameras are compared with the tr2pa / pa2tr loop of SceneManager.rotate.
+
+    python -m benchmarks.bench_transform [--sizes 100000 1000000] [--reference 2000] [--device cpu]
+"""
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+from scipy.spatial.transform import Rotation
+
+from benchmarks.bench_utils import best_of, print_table
+from utils.general_utils import build_rotation
+from utils.graphics_utils import tr2pa, pa2tr
+from utils.sh_utils import eval_sh
+from utils.transform_utils import transform_gaussians, transform_cameras
+
+SH_DEGREE = 3
+
+
+def random_similarity(seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = np.eye(4)
+    matrix[:3, :3] = 1.7 * Rotation.random(random_state=seed).as_matrix()
+    matrix[:3, 3] = rng.normal(size=3) * 5
+    return matrix
+
+
+def random_gaussians(n, device, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    return {
+        'xyz': (torch.randn((n, 3), generator=generator) * 10).to(device),
+        'rotation': torch.randn((n, 4), generator=generator).to(device),
+        'scaling': torch.randn((n, 3), generator=generator).to(device),
+        'features_dc': torch.randn((n, 1, 3), generator=generator).to(device),
+        'features_rest': (torch.randn((n, (SH_DEGREE + 1) ** 2 - 1, 3), generator=generator) * 0.3).to(device),
+    }
+
+
+def colors(features_dc, features_rest, dirs):
+    """[n, 3] colors of each gaussian seen from its own direction in [n, 3]"""
+    sh = torch.cat((features_dc, features_rest), dim=1).transpose(1, 2)  # [n, 3, coeff]
+    return eval_sh(SH_DEGREE, sh, dirs)
+
+
+def reference(matrix, g):
+    """one gaussian at a time, plain matrices"""
+    scale = np.cbrt(np.linalg.det(matrix[:3, :3]))
+    rotation = matrix[:3, :3] / scale
+    out = {'xyz': [], 'rotation_matrix': [], 'scaling': []}
+    for i in range(g['xyz'].shape[0]):
+        p = g['xyz'][i].double().numpy()
+        out['xyz'].append(matrix[:3, :3] @ p + matrix[:3, 3])
+        out['rotation_matrix'].append(rotation @ build_rotation(g['rotation'][i:i + 1].float())[0].double().numpy())
+        out['scaling'].append(g['scaling'][i].double().numpy() + np.log(scale))
+    return {key: np.stack(value) for key, value in out.items()}
+
+
+def bench_gaussians(n, num_reference, device, matrix):
+    device = torch.device(device)
+    original = random_gaussians(n, device)
+    g = {key: value.clone() for key, value in original.items()}
+
+    def run():
+        transform_gaussians(matrix, g['xyz'], g['rotation'], g['scaling'], g['features_rest'])
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+
+    start = time.perf_counter()
+    run()
+    fused = time.perf_counter() - start
+
+    subset = {key: value[:num_reference].cpu() for key, value in original.items()}
+    start = time.perf_counter()
+    expected = reference(matrix, subset)
+    per_element = (time.perf_counter() - start) / num_reference
+
+    transformed = {key: value[:num_reference].cpu().double() for key, value in g.items()}
+    rotation = torch.as_tensor(matrix[:3, :3] / np.cbrt(np.linalg.det(matrix[:3, :3])))
+    dirs = torch.nn.functional.normalize(torch.randn((num_reference, 3), dtype=torch.float64), dim=1)
+    color_error = (colors(transformed['features_dc'], transformed['features_rest'], dirs)
+                   - colors(subset['features_dc'].double(), subset['features_rest'].double(), dirs @ rotation)).abs().max()
+    errors = {
+        'xyz': np.abs(transformed['xyz'].numpy() - expected['xyz']).max(),
+        'rotation': np.abs(build_rotation(transformed['rotation'].float()).double().numpy()
+                           - expected['rotation_matrix']).max(),
+        'scaling': np.abs(transformed['scaling'].numpy() - expected['scaling']).max(),
+        'sh color': color_error.item(),
+    }
+    return {
+        'fused (ms)': f'{fused * 1e3:.1f}',
+        'reference (ms, extrapolated)': f'{per_element * n * 1e3:.0f}',
+        'max error': ', '.join(f'{key} {value:.1e}' for key, value in errors.items()),
+    }
+
+
+def bench_cameras(num_cameras, matrix, seed=0):
+    rotations = Rotation.random(num_cameras, random_state=seed).as_matrix()
+    translations = np.random.default_rng(seed).normal(size=(num_cameras, 3)) * 10
+    rotation = Rotation.from_matrix(matrix[:3, :3] / np.cbrt(np.linalg.det(matrix[:3, :3])))
+    rigid = np.eye(4)
+    rigid[:3, :3] = rotation.as_matrix()
+
+    def loop():
+        result = []
+        for i in range(num_cameras):
+            pos, axis = tr2pa(translations[i], rotations[i])
+            result.append(pa2tr(rotation.apply(pos), rotation.apply(axis)))
+        return result
+
+    looped = loop()
+    new_R, new_T = transform_cameras(rigid, rotations, translations)
+    error = max(np.abs(new_T - np.stack([t for t, _ in looped])).max(),
+                np.abs(new_R - np.stack([r for _, r in looped])).max())
+    return {
+        'loop (ms)': f'{best_of(loop) * 1e3:.1f}',
+        'batched (ms)': f'{best_of(lambda: transform_cameras(rigid, rotations, translations)) * 1e3:.2f}',
+        'max error': f'{error:.1e}',
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--reference', type=int, default=2000)
+    parser.add_argument('--cameras', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--device', type=str, default='cpu')
+    args = parser.parse_args()
+
+    matrix = random_similarity()
+    rows = []
+    headers = None
+    for n in args.sizes:
+        results = bench_gaussians(n, min(args.reference, n), args.device, matrix)
+        headers = ['gaussians'] + list(results.keys())
+        rows.append([n] + list(results.values()))
+    print_table(f'similarity transform of gaussians on {args.device}', rows, headers)
+
+    rows = []
+    for num_cameras in args.cameras:
+        results = bench_cameras(num_cameras, matrix)
+        headers = ['cameras'] + list(results.keys())
+        rows.append([num_cameras] + list(results.values()))
+    print_table('rotation of cameras', rows, headers)
+
+
+if __name__ == '__main__':
+    main()
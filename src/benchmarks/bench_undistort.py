@@ -0,0 +1,153 @@
+"""
+Undistortion of an OPENCV camera dataset: the external path (write an undistorted copy of every
+image, as COLMAP's image_undistorter does, then decode the copies) against utils.undistort_utils
+remapping while the images are decoded, with the remap tables built (cold) or read from
+<source>/cache/undistort (warm). Reports preprocessing / load time and bytes written. With
+--colmap the external pass is the real image_undistorter run on a synthetic sparse model, and
+its output camera is checked against ours.
+
+    python -m benchmarks.bench_undistort [--count 200] [--size 1920 1080] [--workers 8] [--colmap colmap]
+"""
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.bench_utils import print_table
+from scene.colmap_loader import read_intrinsics_binary
+from utils.disk_image_cache import resize_to_array
+from utils.undistort_utils import Undistorter, distort_points, undistort_points
+
+OPENCV_MODEL_ID = 4
+
+
+def synthetic_images(root, count, size, seed=0):
+    """smooth jpgs (compress like photos, unlike noise)"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(size[1] // 16, size[0] // 16, 3), dtype=np.uint8)
+    base = np.array(Image.fromarray(small).resize(tuple(size), Image.BICUBIC))
+    names = []
+    for i in range(count):
+        name = f'{i:05d}.jpg'
+        Image.fromarray(np.roll(base, 7 * i, axis=1)).save(os.path.join(root, name), quality=90)
+        names.append(name)
+    return names
+
+
+def write_distorted_model(root, names, size, params):
+    """cameras.bin with one OPENCV camera, images.bin without points2D, empty points3D.bin"""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, 'cameras.bin'), 'wb') as fid:
+        fid.write(struct.pack('<Q', 1))
+        fid.write(struct.pack('<iiQQ', 1, OPENCV_MODEL_ID, size[0], size[1]) + struct.pack('<8d', *params))
+    with open(os.path.join(root, 'images.bin'), 'wb') as fid:
+        fid.write(struct.pack('<Q', len(names)))
+        for i, name in enumerate(names):
+            fid.write(struct.pack('<i7di', i + 1, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, float(i), 1))
+            fid.write(name.encode() + b'\x00' + struct.pack('<Q', 0))
+    with open(os.path.join(root, 'points3D.bin'), 'wb') as fid:
+        fid.write(struct.pack('<Q', 0))
+
+
+def dir_bytes(root):
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, _, files in os.walk(root) for name in files)
+
+
+def run_pool(fn, items, workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fn, items))
+
+
+def external_python(input_dir, output_dir, names, undistort, workers):
+    """image_undistorter stand-in: remap and write a jpg per image"""
+    os.makedirs(output_dir, exist_ok=True)
+
+    def task(name):
+        with Image.open(os.path.join(input_dir, name)) as image:
+            undistort(image).save(os.path.join(output_dir, name), quality=95)
+
+    run_pool(task, names, workers)
+
+
+def external_colmap(colmap, source, output_dir):
+    subprocess.run([colmap, 'image_undistorter', '--image_path', os.path.join(source, 'input'),
+                    '--input_path', os.path.join(source, 'distorted', 'sparse', '0'),
+                    '--output_path', output_dir, '--output_type', 'COLMAP'], check=True, capture_output=True)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--colmap', type=str, default=None, help='colmap executable for the real external pass')
+    parser.add_argument('--tmp_dir', type=str, default=None)
+    args = parser.parse_args()
+
+    width, height = args.size
+    params = (0.8 * width, 0.8 * width, width / 2 + 3.5, height / 2 - 2.5, -0.12, 0.03, 0.0005, -0.0003)
+    rows = []
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        names = synthetic_images(input_dir, args.count, args.size)
+        paths = [os.path.join(input_dir, name) for name in names]
+        write_distorted_model(os.path.join(tmp, 'distorted', 'sparse', '0'), names, args.size, params)
+
+        undistort = Undistorter('OPENCV', width, height, params)
+        fx, fy, cx, cy = undistort.intrinsics
+        u = np.linspace(0.5, width - 0.5, 101)
+        x, y = undistort_points((u - cx) / fx, np.full_like(u, (0.5 - cy) / fy), undistort.coeffs)
+        xd, yd = distort_points(x, y, undistort.coeffs)
+        assert np.allclose(fx * xd + cx, u, atol=1e-3), 'undistort_points does not invert distort_points'
+        resolution = undistort.pinhole_size
+
+        # external: undistorted copies on disk, then the loader decodes those
+        output_dir = os.path.join(tmp, 'undistorted')
+        start = time.perf_counter()
+        if args.colmap:
+            external_colmap(args.colmap, tmp, output_dir)
+            colmap_camera = read_intrinsics_binary(os.path.join(output_dir, 'sparse', 'cameras.bin'))[1]
+            colmap_size = (colmap_camera.width, colmap_camera.height)
+            print(f'image_undistorter camera {colmap_camera.model} {colmap_size} {colmap_camera.params}, '
+                  f'ours PINHOLE {undistort.pinhole_size} {undistort.pinhole_params}')
+            resolution = colmap_size
+        else:
+            external_python(input_dir, os.path.join(output_dir, 'images'), names, undistort, args.workers)
+        preprocess = time.perf_counter() - start
+        written = dir_bytes(output_dir)
+        start = time.perf_counter()
+        run_pool(lambda name: resize_to_array(os.path.join(output_dir, 'images', name), resolution),
+                 names, args.workers)
+        load = time.perf_counter() - start
+        rows.append(['colmap image_undistorter' if args.colmap else 'undistorted copies (python)',
+                     f'{preprocess:.2f}', f'{load:.2f}', f'{preprocess + load:.2f}', f'{written / 2 ** 20:.1f}'])
+        shutil.rmtree(output_dir)
+
+        # in process: the first pass builds and stores the tables (cold), the second reads them (warm)
+        cache_dir = os.path.join(tmp, 'cache', 'undistort')
+        for label in ('in process, cold maps', 'in process, warm maps'):
+            undistort = Undistorter('OPENCV', width, height, params, cache_dir)
+            start = time.perf_counter()
+            undistort.maps()
+            preprocess = time.perf_counter() - start
+            start = time.perf_counter()
+            arrays = run_pool(lambda path: resize_to_array(path, resolution, undistort), paths, args.workers)
+            load = time.perf_counter() - start
+            rows.append([label, f'{preprocess:.2f}', f'{load:.2f}', f'{preprocess + load:.2f}',
+                         f'{dir_bytes(cache_dir) / 2 ** 20:.1f}'])
+        assert arrays[0].shape[:2] == (resolution[1], resolution[0])
+
+    print_table(f'undistortion of {args.count} {width}x{height} OPENCV images, {args.workers} workers, seconds', rows,
+                ['mode', 'preprocess', 'load', 'total', 'MB written'])
+
+
+if __name__ == '__main__':
+    main()
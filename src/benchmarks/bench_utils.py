@@ -0,0 +1,52 @@
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+@contextmanager
+def timer(results: dict, name: str):
+    """Store the wall time (in seconds) of the enclosed block in results[name]"""
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
+
+
+def best_of(fn, repeat=3):
+    """Return the best wall time (in seconds) of `repeat` calls of fn"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def random_gaussian_arrays(n, sh_degree=3, seed=0):
+    """Synthetic gaussian attributes with the shapes saved by GaussianModel.save_ply"""
+    rng = np.random.default_rng(seed)
+    num_rest = 3 * ((sh_degree + 1) ** 2 - 1)
+    return {
+        'xyz': rng.normal(size=(n, 3)).astype(np.float32) * 10,
+        'f_dc': rng.normal(size=(n, 3)).astype(np.float32),
+        'f_rest': rng.normal(size=(n, num_rest)).astype(np.float32) * 0.1,
+        'opacity': rng.normal(size=(n, 1)).astype(np.float32),
+        'scale': rng.normal(size=(n, 3)).astype(np.float32) - 4,
+        'rotation': rng.normal(size=(n, 4)).astype(np.float32),
+    }
+
+
+def gaussian_attribute_names(sh_degree=3):
+    """Same order as GaussianModel.construct_list_of_attributes"""
+    names = ['x', 'y', 'z', 'nx', 'ny', 'nz', 'f_dc_0', 'f_dc_1', 'f_dc_2']
+    names += [f'f_rest_{i}' for i in range(3 * ((sh_degree + 1) ** 2 - 1))]
+    names += ['opacity', 'scale_0', 'scale_1', 'scale_2', 'rot_0', 'rot_1', 'rot_2', 'rot_3']
+    return names
+
+
+def print_table(title, rows, headers):
+    print(f'\n== {title} ==')
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for r in rows:
+        print('  '.join(str(v).ljust(w) for v, w in zip(r, widths)))
@@ -3,6 +3,7 @@ import random
 from scene.cameras import Camera
 from scene.dataset_readers import CameraInfo
 from utils.camera_utils import cameraList_from_camInfos
+from utils.image_cache import set_image_cache_budget
 
 
 class CameraManager:
@@ -20,6 +21,8 @@ class CameraManager:
         """
 
         print("Creating Cameras")
+        if getattr(args, "image_cache_mb", 0) > 0:
+            set_image_cache_budget(args.data_device, int(args.image_cache_mb) << 20)
         self.train_cameras = {}
         self.test_cameras = {}
         shuffle = True
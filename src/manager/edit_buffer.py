@@ -0,0 +1,312 @@
+"""
+Deferred edits of a GaussianManager
+
+The eager edits (set_color, set_alpha, add_position_noise, delete_by_mask, ...) each derive
+their mask and write their column on their own. EditBuffer only records them
+
+    buffer = gm.edit_buffer()
+    buffer.set_color(1.0, Box(lo, hi))
+    buffer.add_position_noise(0.01, Sphere(center, 2.0))
+    buffer.delete(Box(lo2, hi2))
+    buffer.flush()
+
+and flush() evaluates every distinct region once (all boxes in one GaussianManager.boxes_mask pass),
+fuses the writes to one column into a single masked write and deletes once at the end, per pass
+(see EditBuffer for the passes and how they match the eager calls).
+
+buffer.log keeps every recorded command. Replaying it on another manager evaluates the
+regions there, so an edit script works on any scene (Mask regions only on one of the same size).
+"""
+
+import json
+from typing import NamedTuple, Optional, Union
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from utils.noise_utils import NOISE_KINDS
+
+
+class Box(NamedTuple):
+    min: tuple
+    max: tuple
+
+
+class Sphere(NamedTuple):
+    center: tuple
+    radius: float
+
+
+class Mask(NamedTuple):
+    """an explicit [n, ] bool mask, cannot be saved with save_log"""
+    mask: Tensor
+
+
+Region = Union[Box, Sphere, Mask, None]  # None: all gaussians
+
+
+class EditCommand(NamedTuple):
+    op: str
+    value: object
+    region: Region
+
+
+# op -> (column, kind), "set" overwrites the masked rows, "noise" adds gaussian noise to them
+OPS = {
+    "set_color": ("_features_dc", "set"),
+    "set_rgb": ("_features_dc", "set"),
+    "set_alpha": ("_opacity", "set"),
+    "clear_features_rest": ("_features_rest", "set"),
+    "add_position_noise": ("_xyz", "noise"),
+    "add_color_noise": ("_features_dc", "noise"),
+    "add_opacity_noise": ("_opacity", "noise"),
+    "add_scale_noise": ("_scaling", "noise"),
+    "delete": (None, "delete"),
+}
+MOVING_COLUMNS = {"_xyz"}  # writing these changes which gaussians a Box / Sphere selects
+
+
+def _region_key(region: Region):
+    if region is None:
+        return None
+    if isinstance(region, Mask):
+        return "mask", id(region.mask)
+    return type(region).__name__, tuple(np.asarray(region[0], dtype=np.float64).reshape(-1).tolist()), \
+        tuple(np.asarray(region[1], dtype=np.float64).reshape(-1).tolist())
+
+
+class EditBuffer:
+    """
+    A flush selects the same gaussians as the eager calls in the same order would: a Box or Sphere
+    is matched against the positions left by the commands recorded before it. Commands that move
+    gaussians (add_position_noise) therefore end a pass, the regions of later commands are evaluated
+    again after it. Deletions are applied at the end of their pass, and a deletion followed by a noise
+    command ends a pass too, so noise is drawn for the same rows in the same order as the eager calls
+    with the same seed. So does a deletion followed by a Mask region, which is sized for the gaussians
+    left by the deletion, as in the eager calls. Only where several noise commands on one column are
+    fused the noise values differ (the distribution is the same).
+    """
+
+    def __init__(self, gm):
+        self.gm = gm
+        self.pending: list[EditCommand] = []
+        self.log: list[EditCommand] = []
+
+    # region recording
+    def record(self, op, value=None, region: Region = None):
+        assert op in OPS, f"unknown edit {op}"
+        command = EditCommand(op, value, region)
+        self.pending.append(command)
+        self.log.append(command)
+        return self
+
+    def extend(self, commands):
+        for command in commands:
+            self.record(*command)
+        return self
+
+    def set_color(self, color: float, region: Region = None):
+        return self.record("set_color", float(color), region)
+
+    def set_rgb(self, rgb_color, region: Region = None):
+        return self.record("set_rgb", [float(c) for c in rgb_color], region)
+
+    def set_alpha(self, alpha: float, region: Region = None):
+        return self.record("set_alpha", float(alpha), region)
+
+    def clear_features_rest(self, region: Region = None):
+        return self.record("clear_features_rest", None, region)
+
+    def add_position_noise(self, std, region: Region = None):
+        return self.record("add_position_noise", float(std), region)
+
+    def add_color_noise(self, std, region: Region = None):
+        return self.record("add_color_noise", float(std), region)
+
+    def add_opacity_noise(self, std, region: Region = None):
+        return self.record("add_opacity_noise", float(std), region)
+
+    def add_scale_noise(self, std, region: Region = None):
+        return self.record("add_scale_noise", float(std), region)
+
+    def delete(self, region: Region):
+        return self.record("delete", None, region)
+
+    # endregion
+
+    # region flush
+    def _evaluate_regions(self, regions) -> dict:
+        """region key -> [n, ] bool, every distinct region once, all boxes in one pass"""
+        gm = self.gm
+        n = gm.gaussians.get_xyz.shape[0]
+        masks = {}
+        boxes = {}
+        for region in regions:
+            key = _region_key(region)
+            if region is None or key in masks or key in boxes:
+                continue
+            if isinstance(region, Box):
+                boxes[key] = region
+            elif isinstance(region, Sphere):
+                masks[key] = gm.sphere_mask(region.center, region.radius)
+            elif isinstance(region, Mask):
+                assert region.mask.shape[0] == n, "Mask regions only apply to a scene of the same size"
+                masks[key] = region.mask.to(gm.device)
+            else:
+                raise TypeError(f"unknown region {region!r}")
+        if boxes:
+            box_masks = gm.boxes_mask(list(boxes.values()), groups=np.arange(len(boxes)), num_groups=len(boxes))
+            masks.update(zip(boxes.keys(), box_masks))
+        return masks
+
+    def _fill_value(self, command: EditCommand, row_shape):
+        gm = self.gm
+        if command.op == "clear_features_rest":
+            value = 0.0
+        else:
+            value = gm.rgb2feature_dc(np.asarray(command.value, dtype=np.float32))
+        return torch.as_tensor(value, dtype=torch.float32, device=gm.device).expand(row_shape)
+
+    @staticmethod
+    def _noise_std(command: EditCommand):
+        _, to_feature = NOISE_KINDS[command.op[len("add_"):-len("_noise")]]
+        return to_feature(command.value)
+
+    def _apply_sets(self, column: Tensor, commands, masks):
+        """later writes win: pick the last command per row, then one gather and one write"""
+        values = torch.stack([self._fill_value(command, column.shape[1:]) for command in commands])
+        writer = torch.full((column.shape[0],), -1, dtype=torch.long, device=column.device)
+        for k, command in enumerate(commands):
+            if command.region is None:
+                writer.fill_(k)
+            else:
+                writer[masks[_region_key(command.region)]] = k
+        rows = torch.nonzero(writer >= 0).squeeze(1)
+        column[rows] = values[writer[rows]].to(column.dtype)
+
+    def _apply_noise(self, column: Tensor, commands, masks):
+        """independent gaussian noise adds up, sum the variances and draw once"""
+        variance = torch.zeros(column.shape[0], dtype=torch.float32, device=column.device)
+        for command in commands:
+            std = self._noise_std(command)
+            if command.region is None:
+                variance += std ** 2
+            else:
+                variance[masks[_region_key(command.region)]] += std ** 2
+        rows = torch.nonzero(variance > 0).squeeze(1)
+        scale = variance[rows].sqrt().view(-1, *([1] * (column.dim() - 1)))
+        noise = self.gm.noise.normal((rows.shape[0], *column.shape[1:]), dtype=column.dtype)  # seeded, see seed_noise
+        column.index_add_(0, rows, noise.mul_(scale.to(column.dtype)))
+
+    @staticmethod
+    def _passes(commands) -> list[list[EditCommand]]:
+        """
+        split after every command that moves gaussians if a later command has a position region,
+        and after every deletion if a later command draws noise or has a Mask region
+        """
+        def last(condition):
+            return max((i for i, command in enumerate(commands) if condition(command)), default=-1)
+
+        last_positional = last(lambda command: isinstance(command.region, (Box, Sphere)))
+        last_row_bound = last(lambda command: OPS[command.op][1] == "noise" or isinstance(command.region, Mask))
+        passes = [[]]
+        for i, command in enumerate(commands):
+            passes[-1].append(command)
+            name, kind = OPS[command.op]
+            if (name in MOVING_COLUMNS and i < last_positional) or (kind == "delete" and i < last_row_bound):
+                passes.append([])
+        return [commands for commands in passes if commands]
+
+    def flush(self) -> int:
+        """apply all pending edits, returns their number"""
+        commands, self.pending = self.pending, []
+        if not commands:
+            return 0
+        for commands_pass in self._passes(commands):
+            self._apply_pass(commands_pass)
+        return len(commands)
+
+    def _apply_pass(self, commands):
+        """apply commands whose regions all see the same gaussians, deleting once at the end"""
+        gm = self.gm
+        masks = self._evaluate_regions([command.region for command in commands])
+
+        # per column, consecutive commands of the same kind are fused
+        runs: dict[str, list[tuple[str, list[EditCommand]]]] = {}
+        deletions = []
+        for command in commands:
+            name, kind = OPS[command.op]
+            if kind == "delete":
+                deletions.append(command)
+                continue
+            column_runs = runs.setdefault(name, [])
+            if column_runs and column_runs[-1][0] == kind:
+                column_runs[-1][1].append(command)
+            else:
+                column_runs.append((kind, [command]))
+
+        gm._writable(*runs.keys())
+        with torch.no_grad():
+            for name, column_runs in runs.items():
+                column = getattr(gm.gaussians, name)
+                if column.shape[0] == 0 or column.shape[1:].numel() == 0:
+                    continue
+                for kind, run in column_runs:
+                    if kind == "set":
+                        self._apply_sets(column, run, masks)
+                    else:
+                        self._apply_noise(column, run, masks)
+
+        if deletions:
+            keep = gm.ones_like_mask()
+            for command in deletions:
+                if command.region is None:
+                    keep.fill_(False)
+                else:
+                    keep &= ~masks[_region_key(command.region)]
+            gm.delete_by_mask(keep)
+
+    # endregion
+
+    # region replay
+    @classmethod
+    def replay(cls, gm, log) -> "EditBuffer":
+        """apply the commands of another buffer's log (or load_log) to gm"""
+        buffer = cls(gm).extend(log)
+        buffer.flush()
+        return buffer
+
+    @staticmethod
+    def _region_to_dict(region: Region) -> Optional[dict]:
+        if region is None:
+            return None
+        if isinstance(region, Box):
+            return {"type": "box", "min": np.asarray(region.min).tolist(), "max": np.asarray(region.max).tolist()}
+        if isinstance(region, Sphere):
+            return {"type": "sphere", "center": np.asarray(region.center).tolist(), "radius": float(region.radius)}
+        raise TypeError(f"{type(region).__name__} regions cannot be saved")
+
+    @staticmethod
+    def _region_from_dict(data: Optional[dict]) -> Region:
+        if data is None:
+            return None
+        if data["type"] == "box":
+            return Box(tuple(data["min"]), tuple(data["max"]))
+        if data["type"] == "sphere":
+            return Sphere(tuple(data["center"]), data["radius"])
+        raise ValueError(f"unknown region type {data['type']}")
+
+    def save_log(self, path):
+        data = [{"op": command.op, "value": command.value, "region": self._region_to_dict(command.region)}
+                for command in self.log]
+        with open(path, "w") as file:
+            json.dump(data, file, indent=2)
+
+    @classmethod
+    def load_log(cls, path) -> list[EditCommand]:
+        with open(path, "r") as file:
+            data = json.load(file)
+        return [EditCommand(item["op"], item["value"], cls._region_from_dict(item["region"])) for item in data]
+
+    # endregion
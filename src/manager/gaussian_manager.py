@@ -1,42 +1,71 @@
 import copy
 import json
 import os
+from collections import deque
 from contextlib import contextmanager
 from functools import reduce
-from typing import Optional
+from typing import Optional, NamedTuple
 
 import numpy as np
 import torch
 from pyrr import Matrix44
 from torch import Tensor
 
+from manager.edit_buffer import EditBuffer
 from scene import GaussianModel
 from utils.arg_utils import parse_args
 from utils.image_utils import get_pil_image
-
-
-def create_gaussian_from_ply(sh_degree, path):
-    _gaussians = GaussianModel(sh_degree)
-    _gaussians.load_ply(path)
+from utils.noise_utils import NoiseGenerator, NOISE_KINDS
+from utils.spatial_utils import SpatialIndex, boxes_mask, points_in_polygon, points_in_frustum
+from utils.transform_utils import transform_gaussians, TRANSFORM_CHUNK_SIZE
+
+
+def create_gaussian_from_ply(sh_degree, path, load_sh_degree=None, device="cuda", morton_order=False):
+    """
+    load_sh_degree: 只加载到该阶数的SH, 用于预览等不需要高阶SH的场合, None则全部加载
+    morton_order: 加载后按Z-order曲线重排高斯, 空间上相近的高斯在内存中也相邻
+    """
+    _gaussians = GaussianModel(sh_degree, device)
+    _gaussians.morton_order = morton_order
+    if path.endswith(".gsc"):
+        _gaussians.load_container(path, sh_degree=load_sh_degree)
+    else:
+        _gaussians.load_ply(path, sh_degree=load_sh_degree)
     return _gaussians
 
 
-def create_gaussian_from_scene_info(sh_degree, scene_info):
-    _gaussians = GaussianModel(sh_degree)
+def create_gaussian_from_scene_info(sh_degree, scene_info, device="cuda"):
+    _gaussians = GaussianModel(sh_degree, device)
     cameras_extent = scene_info.nerf_normalization["radius"]
     _gaussians.create_from_pcd(scene_info.point_cloud, cameras_extent)
     return _gaussians
 
 
+class GaussianSnapshot(NamedTuple):
+    """undo/redo历史中的一项, gaussians与其他快照及当前状态共享未修改的tensor"""
+    label: str
+    gaussians: GaussianModel
+    bg: Tensor
+    spatial_index: Optional[SpatialIndex]
+
+
+HISTORY_LIMIT = 20  # undo的最大步数
+HISTORY_MAX_BYTES = 4 << 30  # 历史独占的显存上限
+
+
 class GaussianManager:
     def __init__(self, args,
                  scene_info,
-                 custom_ply_path=None):
+                 custom_ply_path=None,
+                 load_sh_degree=None,
+                 device="cuda"):
         """
 
         :param args:
         :param scene_info:
         :param custom_ply_path:
+        :param load_sh_degree: 从ply加载时只保留到该阶数的SH, None则保留全部
+        :param device: 高斯数据所在的设备, cpu上可以进行除渲染以外的所有操作(编辑, mask, 合并, 导出等)
         """
         self.args = args
         lp, op, pp = parse_args(args)
@@ -49,25 +78,51 @@ class GaussianManager:
             # 如果有custom ply path， 则使用自定义的路径创建gaussian
             print("[Gaussian Manager] Creating gaussians from custom ply")
             self.source_ply_path = custom_ply_path
-            self.gaussians = create_gaussian_from_ply(args.sh_degree, custom_ply_path)
+            self.gaussians = create_gaussian_from_ply(args.sh_degree, custom_ply_path, load_sh_degree, device,
+                                                      morton_order=opt.morton_order)
 
         elif args.loaded_iter:
             print("[Gaussian Manager] Creating gaussians from ply")
             self.source_ply_path = os.path.join(args.model_path, "point_cloud", "iteration_" + str(args.loaded_iter), "point_cloud.ply")
-            self.gaussians = create_gaussian_from_ply(args.sh_degree, self.source_ply_path)
+            self.gaussians = create_gaussian_from_ply(args.sh_degree, self.source_ply_path, load_sh_degree, device,
+                                                      morton_order=opt.morton_order)
         else:
             print("[Gaussian Manager] Creating gaussians from scene info")
-            self.gaussians = create_gaussian_from_scene_info(args.sh_degree, scene_info)
-
-        self.bg = torch.tensor([0, 0, 0], dtype=torch.float32, device="cuda")
+            self.gaussians = create_gaussian_from_scene_info(args.sh_degree, scene_info, device)
+        self._init_runtime()
+
+    @classmethod
+    def from_gaussians(cls, gaussians: GaussianModel, pipe=None) -> "GaussianManager":
+        """不经过args直接包装已有的GaussianModel, 用于批处理等场合, 设备与gaussians一致"""
+        gm = cls.__new__(cls)
+        gm.args = None
+        gm.pipe = pipe
+        gm.source_ply_path = ''
+        gm.gaussians = gaussians
+        gm._init_runtime()
+        return gm
+
+    def _init_runtime(self):
+        self.bg = torch.tensor([0, 0, 0], dtype=torch.float32, device=self.device)
         self.bg_backup = None
         self.gaussians_backup = None
-
-        # 加载渲染后端
-        from gaussian_renderer.default_renderer import render
-        self._render_function = render  # default renderer
-        from gaussian_renderer.fork_renderer import render
-        self._render_function_fork = render  # for fast rendering
+        self._spatial_index: Optional[SpatialIndex] = None  # 按需构建, 见spatial_index
+        self._spatial_index_backup: Optional[SpatialIndex] = None
+        self.noise = NoiseGenerator(self.device)  # 编辑用的噪声, 见seed_noise
+        self._init_history()
+
+        # 加载渲染后端, 光栅化只支持cuda
+        self._render_function = None
+        self._render_function_fork = None
+        if self.device.type == "cuda":
+            from gaussian_renderer.default_renderer import render
+            self._render_function = render  # default renderer
+            from gaussian_renderer.fork_renderer import render
+            self._render_function_fork = render  # for fast rendering
+
+    @property
+    def device(self) -> torch.device:
+        return self.gaussians.device
 
     # region 缓存相关
     @contextmanager
@@ -82,10 +137,14 @@ class GaussianManager:
             self.restore()
 
     def cache(self):
+        """
+        copy on write: 当前的gaussians只是备份的浅拷贝, 编辑前才复制被修改的属性 (见_writable)
+        bg只会被整体替换, 不需要复制
+        """
         self.gaussians_backup = self.gaussians
-        self.gaussians = copy.deepcopy(self.gaussians)
+        self.gaussians = self.gaussians.snapshot()
         self.bg_backup = self.bg
-        self.bg = copy.deepcopy(self.bg)
+        self._spatial_index_backup = self._spatial_index  # _xyz是共享的, 索引依然有效
 
     def restore(self):
         if self.gaussians_backup is None:
@@ -96,20 +155,122 @@ class GaussianManager:
         self.bg = self.bg_backup
         del self.bg_backup
         self.bg_backup = None
+        self._spatial_index = self._spatial_index_backup
+        self._spatial_index_backup = None
 
     def has_cache(self):
         return self.gaussians_backup is not None
 
-    def apply(self):
+    def apply(self, label=""):
         """
-        应用改变
+        应用改变, 改变之前的状态进入undo历史
         """
-        self.gaussians_backup = self.gaussians
+        if self.gaussians_backup is not None:
+            self._push_undo(GaussianSnapshot(label, self.gaussians_backup, self.bg_backup, self._spatial_index_backup))
+        self.gaussians_backup = self.gaussians.snapshot()
         self.bg_backup = self.bg
+        self._spatial_index_backup = self._spatial_index
 
     def clear_cache(self):
         self.gaussians_backup = None
         self.bg_backup = None
+        self._spatial_index_backup = None
+
+    def _writable(self, *names):
+        """
+        原地修改gaussians的属性前调用
+        属性仍与备份或历史共享时先复制一份 (保持nn.Parameter类型), 只复制被修改的属性
+        """
+        shared = self._shared_tensor_ids()
+        for name in names:
+            tensor = getattr(self.gaussians, name)
+            if id(tensor) not in shared:
+                continue
+            cloned = tensor.detach().clone()
+            setattr(self.gaussians, name, torch.nn.Parameter(cloned.requires_grad_(tensor.requires_grad))
+                    if isinstance(tensor, torch.nn.Parameter) else cloned)
+
+    def _held_models(self):
+        """备份和历史中的GaussianModel"""
+        models = [] if self.gaussians_backup is None else [self.gaussians_backup]
+        models += [snapshot.gaussians for snapshot in self._undo_stack]
+        models += [snapshot.gaussians for snapshot in self._redo_stack]
+        return models
+
+    def _shared_tensor_ids(self):
+        return {id(getattr(model, name)) for model in self._held_models() for name in GaussianModel.TENSOR_NAMES}
+
+    # endregion
+
+    # region undo / redo
+    def _init_history(self, limit=HISTORY_LIMIT, max_bytes=HISTORY_MAX_BYTES):
+        self.history_limit = limit
+        self.history_max_bytes = max_bytes
+        self._undo_stack: deque[GaussianSnapshot] = deque()
+        self._redo_stack: list[GaussianSnapshot] = []
+
+    def _current_snapshot(self, label=""):
+        return GaussianSnapshot(label, self.gaussians.snapshot(), self.bg, self._spatial_index)
+
+    def _push_undo(self, snapshot: GaussianSnapshot):
+        self._undo_stack.append(snapshot)
+        self._redo_stack.clear()
+        # 超出步数或显存上限时丢弃最旧的
+        while len(self._undo_stack) > self.history_limit or \
+                (len(self._undo_stack) > 1 and self.history_footprint()["bytes"] > self.history_max_bytes):
+            self._undo_stack.popleft()
+
+    def push_history(self, label=""):
+        """记录当前状态, 之后的编辑可以undo回到这里"""
+        self._push_undo(self._current_snapshot(label))
+
+    def _switch_to(self, snapshot: GaussianSnapshot):
+        self.gaussians = snapshot.gaussians
+        self.bg = snapshot.bg
+        self._spatial_index = snapshot.spatial_index
+        self.clear_cache()
+
+    def can_undo(self):
+        return len(self._undo_stack) > 0
+
+    def can_redo(self):
+        return len(self._redo_stack) > 0
+
+    def undo(self) -> Optional[str]:
+        """回到上一个历史状态, 返回其label, 没有历史时返回None"""
+        if not self._undo_stack:
+            return None
+        self.restore()
+        snapshot = self._undo_stack.pop()
+        self._redo_stack.append(self._current_snapshot(snapshot.label))
+        self._switch_to(snapshot)
+        return snapshot.label
+
+    def redo(self) -> Optional[str]:
+        if not self._redo_stack:
+            return None
+        self.restore()
+        snapshot = self._redo_stack.pop()
+        self._undo_stack.append(self._current_snapshot(snapshot.label))
+        self._switch_to(snapshot)
+        return snapshot.label
+
+    def clear_history(self):
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+
+    def history_footprint(self) -> dict:
+        """
+        undo/redo步数以及备份和历史独占的字节数 (与当前gaussians共享的tensor不计)
+        """
+        current = {getattr(self.gaussians, name).untyped_storage().data_ptr() for name in GaussianModel.TENSOR_NAMES}
+        storages = {}
+        for model in self._held_models():
+            for name in GaussianModel.TENSOR_NAMES:
+                storage = getattr(model, name).untyped_storage()
+                if storage.data_ptr() not in current:
+                    storages[storage.data_ptr()] = storage.nbytes()
+        return {"undo": len(self._undo_stack), "redo": len(self._redo_stack), "bytes": sum(storages.values())}
 
     # endregion
 
@@ -121,6 +282,7 @@ class GaussianManager:
                convert_to_rgb_arr=False,
                ):
         """default render for gaussian splatting training"""
+        assert self._render_function is not None, f"rendering is not available on {self.device}"
         with torch.no_grad():
             render_pkg = self._render_function(camera, self.gaussians, self.pipe, self.bg)
             image = render_pkg["render"]
@@ -141,6 +303,7 @@ class GaussianManager:
 
     def render_fork(self, camera, opaque_depth) -> torch.Tensor:
         """custom render function for fast rendering"""
+        assert self._render_function_fork is not None, f"rendering is not available on {self.device}"
         with torch.no_grad():
             image = self._render_function_fork(
                 viewpoint_camera=camera,
@@ -182,34 +345,98 @@ class GaussianManager:
 
     # endregion
 
+    # region 空间索引
+    def _valid_spatial_index(self, gaussians=None) -> Optional[SpatialIndex]:
+        gaussians = self.gaussians if gaussians is None else gaussians
+        index = self._spatial_index
+        if index is not None and index.is_valid_for(gaussians.get_xyz):
+            return index
+        return None
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """
+        高斯中心的体素索引, 第一次查询时构建
+        _xyz被替换或原地修改后自动失效, 删除和平移时直接修补索引
+        """
+        index = self._valid_spatial_index()
+        if index is None:
+            index = self._spatial_index = SpatialIndex(self.gaussians.get_xyz)
+        return index
+
+    def _mask_from_candidates(self, ranges, exact_test):
+        """只对索引给出的候选点做精确测试"""
+        index = self.spatial_index
+        candidates = index.candidates(*ranges)
+        mask = self.zero_like_mask()
+        with torch.no_grad():
+            mask[candidates] = exact_test(self.gaussians.get_xyz[candidates])
+        return mask
+
+    # endregion
+
     # region 创建与修改mask
     def zero_like_mask(self):
-        return torch.zeros((self.gaussians.get_xyz.shape[0]), dtype=torch.bool, device='cuda')
+        return torch.zeros((self.gaussians.get_xyz.shape[0]), dtype=torch.bool, device=self.device)
 
     def ones_like_mask(self):
-        return torch.ones((self.gaussians.get_xyz.shape[0]), dtype=torch.bool, device='cuda')
+        return torch.ones((self.gaussians.get_xyz.shape[0]), dtype=torch.bool, device=self.device)
 
-    def position_mask(self, min, max):
+    def position_mask(self, min, max, use_index=True):
         """
         @Jeremy
         min max 推荐为torch.tensor格式
-        程序会自动将其转换为tensor并传至GPU
+        程序会自动将其转换为tensor并传至高斯所在的设备
+        use_index: 通过空间索引只测试候选点, False则测试全部点
         """
         if isinstance(min, np.ndarray) or isinstance(max, np.ndarray):
             min: Tensor = torch.tensor(min)
             max: Tensor = torch.tensor(max)
 
-        min: Tensor = min.cuda()
-        max: Tensor = max.cuda()
+        min: Tensor = min.to(self.device)
+        max: Tensor = max.to(self.device)
 
-        with torch.no_grad():
-            xyz: Tensor = self.gaussians.get_xyz
+        def inside(xyz: Tensor):
             # 使用比较运算符筛选点
-            mask = (xyz[:, 0] >= min[0]) & (xyz[:, 0] <= max[0]) & \
+            return (xyz[:, 0] >= min[0]) & (xyz[:, 0] <= max[0]) & \
                    (xyz[:, 1] >= min[1]) & (xyz[:, 1] <= max[1]) & \
                    (xyz[:, 2] >= min[2]) & (xyz[:, 2] <= max[2])
+
+        if use_index:
+            return self._mask_from_candidates(self.spatial_index.query_box(min, max), inside)
+        with torch.no_grad():
+            mask = inside(self.gaussians.get_xyz)
         return mask
 
+    def sphere_mask(self, center, radius):
+        center = torch.as_tensor(center, dtype=torch.float32, device=self.device)
+        return self._mask_from_candidates(self.spatial_index.query_sphere(center, radius),
+                                          lambda xyz: ((xyz - center) ** 2).sum(dim=1) <= radius ** 2)
+
+    def prism_mask(self, polygon_xy, z_min, z_max):
+        """xy平面上的多边形沿z方向拉伸至[z_min, z_max]"""
+        polygon_xy = np.asarray(polygon_xy, dtype=np.float32)[:, :2]
+
+        def inside(xyz: Tensor):
+            return points_in_polygon(xyz[:, :2], polygon_xy) & (xyz[:, 2] >= z_min) & (xyz[:, 2] <= z_max)
+
+        return self._mask_from_candidates(self.spatial_index.query_prism(polygon_xy, z_min, z_max), inside)
+
+    def frustum_mask(self, camera):
+        """相机视锥内的高斯, camera需要有full_proj_transform (scene.cameras)"""
+        full_proj_transform = camera.full_proj_transform.to(self.device)
+        return self._mask_from_candidates(self.spatial_index.query_frustum(full_proj_transform),
+                                          lambda xyz: points_in_frustum(xyz, full_proj_transform))
+
+    def geometry_mask(self, geometry):
+        """
+        gui中几何体的is_points_inside, 几何体提供world_bounds时只测试包围盒内的候选点
+        """
+        bounds = geometry.world_bounds() if hasattr(geometry, "world_bounds") else None
+        if bounds is None:
+            return geometry.is_points_inside(self.gaussians.get_xyz)
+        return self._mask_from_candidates(self.spatial_index.query_box(*bounds), geometry.is_points_inside)
+
     def bboxes_from_json(self, json_path, z_min, z_max):
         """
         @Jeremy
@@ -230,32 +457,42 @@ class GaussianManager:
             bboxes.append(bboxes_per_region)
         return bboxes
 
+    def boxes_mask(self, bboxes, groups=None, num_groups=None, labels=False):
+        """
+        一次广播测试所有包围盒, 代替逐个position_mask
+        bboxes: [(min, max), ...]
+        groups/num_groups/labels: 见spatial_utils.boxes_mask
+        """
+        lo = np.array([bbox[0] for bbox in bboxes], dtype=np.float32).reshape(-1, 3)
+        hi = np.array([bbox[1] for bbox in bboxes], dtype=np.float32).reshape(-1, 3)
+        return boxes_mask(self.gaussians.get_xyz, lo, hi, groups=groups, num_groups=num_groups, labels=labels)
+
+    def labels_from_json(self, json_path):
+        """
+        每个高斯所在的region序号(重叠时取第一个), 不在任何region内为-1
+        """
+        bboxes = self.bboxes_from_json(json_path, -100, 100)
+        groups = [i for i, region in enumerate(bboxes) for _ in region]
+        return self.boxes_mask([bbox for region in bboxes for bbox in region], groups, len(bboxes), labels=True)
+
     def masks_from_json(self, json_path):
         """
         @Jeremy
         为每一个region创建一个mask
         注意，可能会占用大量显存
         """
-        masks = []
         bboxes = self.bboxes_from_json(json_path, -100, 100)
-        for region in bboxes:
-            mask = self.zero_like_mask()
-            for bbox in region:
-                mask |= self.position_mask(*bbox)
-            masks.append(mask)
-        return masks
+        groups = [i for i, region in enumerate(bboxes) for _ in region]
+        masks = self.boxes_mask([bbox for region in bboxes for bbox in region], groups, len(bboxes))
+        return list(masks)
 
     def mask_from_json(self, json_path):
         """
         @Jeremy
         所有region共享一个mask
         """
-        mask = self.zero_like_mask()
         bboxes = self.bboxes_from_json(json_path, -100, 100)
-        for region in bboxes:
-            for bbox in region:
-                mask |= self.position_mask(*bbox)
-        return mask
+        return self.boxes_mask([bbox for region in bboxes for bbox in region])
 
     @staticmethod
     def combine_masks(masks: list):
@@ -267,6 +504,7 @@ class GaussianManager:
         return mask1 | mask2
 
     def delete_by_mask(self, mask):
+        index = self._valid_spatial_index()
         self.gaussians._xyz = self.gaussians._xyz[mask]
         self.gaussians._features_dc = self.gaussians._features_dc[mask]
         self.gaussians._features_rest = self.gaussians._features_rest[mask]
@@ -280,11 +518,16 @@ class GaussianManager:
             self.gaussians.xyz_gradient_accum = self.gaussians.xyz_gradient_accum[mask]
         if self.gaussians.denom.shape[0] == mask.shape[0]:
             self.gaussians.denom = self.gaussians.denom[mask]
+        if index is not None:
+            # 修补副本, 快照和备份里的索引仍对应它们的_xyz, 撤销后不必重建
+            self._spatial_index = index.rebound(self.gaussians.get_xyz)
+            self._spatial_index.remove(mask)
 
     # endregion
 
     # region 高斯操作-颜色
     def set_color(self, color: float, mask=None):
+        self._writable("_features_dc")
         with torch.no_grad():
             if mask is None:
                 self.gaussians._features_dc[:] = GaussianManager.rgb2feature_dc(color)
@@ -292,15 +535,17 @@ class GaussianManager:
                 self.gaussians._features_dc[mask] = GaussianManager.rgb2feature_dc(color)
 
     def set_rgb(self, rgb_color, mask=None):
+        self._writable("_features_dc")
         with torch.no_grad():
             color = GaussianManager.rgb2feature_dc(rgb_color)
-            color = torch.tensor(color, device="cuda")
+            color = torch.tensor(color, device=self.device)
             if mask is None:
                 self.gaussians._features_dc[:, 0, :] = color
             else:
                 self.gaussians._features_dc[mask, 0, :] = color
 
     def set_alpha(self, alpha: float, mask=None):
+        self._writable("_opacity")
         with torch.no_grad():
             if mask is None:
                 self.gaussians._opacity[:] = GaussianManager.rgb2feature_dc(alpha)
@@ -308,6 +553,7 @@ class GaussianManager:
                 self.gaussians._opacity[mask] = GaussianManager.rgb2feature_dc(alpha)
 
     def clear_features_rest(self, mask=None):
+        self._writable("_features_rest")
         with torch.no_grad():
             if mask is None:
                 self.gaussians._features_rest *= 0
@@ -316,7 +562,7 @@ class GaussianManager:
 
     def paint_by_mask(self, mask):
         with torch.no_grad():
-            self.bg = torch.tensor([0, 0, 0], dtype=torch.float32, device="cuda")
+            self.bg = torch.tensor([0, 0, 0], dtype=torch.float32, device=self.device)
             self.clear_features_rest()
             self.set_color(0, ~mask)
             self.set_color(1, mask)
@@ -325,50 +571,55 @@ class GaussianManager:
         with torch.no_grad():
             raise NotImplementedError
 
-    def add_position_noise(self, std, mask=None):
-        with torch.no_grad():
-            if mask is None:
-                size = self.gaussians._xyz.shape
-                noise = np.random.normal(0.0, std, size=size)
-                noise = torch.tensor(noise).cuda()
-                self.gaussians._xyz += noise
+    # endregion
 
-            else:
-                size = self.gaussians._xyz[mask].shape
-                noise = np.random.normal(0.0, std, size=size)
-                noise = torch.tensor(noise).cuda()
-                self.gaussians._xyz[mask] += noise
+    # region 高斯操作-噪声
+    def seed_noise(self, seed=None):
+        """重置噪声流, 相同的seed在同一类设备上得到相同的噪声, None则随机"""
+        self.noise.seed(seed)
+
+    def add_noise(self, kind, std, mask=None):
+        """
+        在设备上生成噪声, 只为mask选中的点生成
+        kind: position(世界坐标), color(rgb), opacity(logit), scale(对数缩放)
+        """
+        name, to_feature = NOISE_KINDS[kind]
+        self._writable(name)
+        self.noise.add_normal_(getattr(self.gaussians, name), to_feature(std), mask)
+
+    def add_position_noise(self, std, mask=None):
+        self.add_noise("position", std, mask)
 
     def add_color_noise(self, std, mask=None):
-        with torch.no_grad():
-            if mask is None:
-                size = self.gaussians._features_dc.shape
-                noise = np.random.normal(0.0, abs(GaussianManager.rgb2feature_dc(std)), size=size)
-                noise = torch.tensor(noise).cuda()
-                self.gaussians._features_dc += noise
+        self.add_noise("color", std, mask)
 
-            else:
-                size = self.gaussians._features_dc[mask].shape
-                noise = np.random.normal(0.0, abs(GaussianManager.rgb2feature_dc(std)), size=size)
-                noise = torch.tensor(noise).cuda()
-                self.gaussians._features_dc[mask] += noise
+    def add_opacity_noise(self, std, mask=None):
+        self.add_noise("opacity", std, mask)
+
+    def add_scale_noise(self, std, mask=None):
+        self.add_noise("scale", std, mask)
 
     def noise_position(self, mask, bbox):
-        x_range = (bbox[0][0], bbox[1][0])
-        y_range = (bbox[0][1], bbox[1][1])
-        z_range = (bbox[0][2], bbox[1][2])
-        # 生成随机点
-        num_points = self.gaussians._xyz[mask].shape[0]  # 点的数量
-        x = np.random.uniform(x_range[0], x_range[1], size=num_points)
-        y = np.random.uniform(y_range[0], y_range[1], size=num_points)
-        z = np.random.uniform(z_range[0], z_range[1], size=num_points)
-
-        points = np.column_stack((x, y, z)).astype(np.float32)
-        points = torch.tensor(points).cuda()
-        print(points.shape)
+        """把mask选中的点随机均匀地放到bbox内"""
+        lo = torch.as_tensor(np.asarray(bbox[0]), dtype=torch.float32, device=self.device)
+        hi = torch.as_tensor(np.asarray(bbox[1]), dtype=torch.float32, device=self.device)
+        self._writable("_xyz")
         with torch.no_grad():
-            print(self.gaussians._xyz[mask].shape)
-            self.gaussians._xyz[mask] = points
+            rows = mask.nonzero().squeeze(1) if mask.dtype == torch.bool else mask
+            self.gaussians._xyz[rows] = self.noise.uniform((rows.shape[0], 3), lo, hi)
+
+    # endregion
+
+    # region 延迟编辑
+    def edit_buffer(self) -> EditBuffer:
+        """
+        记录编辑而不立即执行, flush时一次性应用 (区域只计算一次, 同一属性的写入合并), 见manager.edit_buffer
+        """
+        return EditBuffer(self)
+
+    def replay(self, log) -> EditBuffer:
+        """在当前高斯上重新应用一段编辑记录 (EditBuffer.log 或 EditBuffer.load_log)"""
+        return EditBuffer.replay(self, log)
 
     # endregion
 
@@ -391,17 +642,28 @@ class GaussianManager:
 
     # region 移动旋转
     def move(self, offset):
-        offset = torch.tensor(offset, dtype=torch.float32).cuda()
+        offset = torch.tensor(offset, dtype=torch.float32, device=self.device)
+        index = self._valid_spatial_index()
         with torch.no_grad():
             self.gaussians._xyz = self.gaussians._xyz + offset
+        if index is not None:
+            # 同delete_by_mask, 修补副本
+            self._spatial_index = index.rebound(self.gaussians.get_xyz)
+            self._spatial_index.translate(offset)
 
     def rotate(self, matrix: Matrix44):
-        matrix44 = torch.tensor(matrix, dtype=torch.float32).cuda()
-        matrix33 = torch.tensor(matrix.matrix33, dtype=torch.float32).cuda()
-        with torch.no_grad():
-            # self.gaussians._xyz = torch.matmul(self.gaussians._xyz, matrix33)
-            self.gaussians._rotation = torch.dot(self.gaussians._rotation, matrix44.t())
-            # self.gaussians._scaling = torch.matmul(self.gaussians._scaling, matrix33)
+        """pyrr的Matrix44为行向量约定, 转置后交给transform"""
+        self.transform(np.asarray(matrix, dtype=np.float64).T)
+
+    def transform(self, matrix, chunk_size=TRANSFORM_CHUNK_SIZE):
+        """
+        相似变换 (均匀缩放 + 旋转 + 平移), matrix为列向量约定的4x4矩阵: p' = M @ p
+        同时变换位置, 旋转四元数, 对数缩放与1-3阶SH, 原地分块进行, 见utils.transform_utils
+        """
+        self._writable("_xyz", "_rotation", "_scaling", "_features_rest")
+        gaussians = self.gaussians
+        transform_gaussians(matrix, gaussians._xyz, gaussians._rotation, gaussians._scaling,
+                            gaussians._features_rest, chunk_size=chunk_size)
 
     # endregion
     # region static methods
@@ -429,32 +691,18 @@ class GaussianManager:
         if len(gms) == 1:
             return gms[0]
 
-        with torch.no_grad():
-            final_gm = copy.deepcopy(gms[0])
-            final_gm.clear_cache()
-            final_xyz_list = []
-            final_features_dc_list = []
-            final_features_rest_list = []
-            final_scaling_list = []
-            final_rotation_list = []
-            final_opacity_list = []
-            final_max_radii2D_list = []
-            for i, gm in enumerate(gms):
-                gaussians = gm.gaussians
-                final_xyz_list.append(gaussians._xyz.detach())
-                final_features_dc_list.append(gaussians._features_dc.detach())
-                final_features_rest_list.append(gaussians._features_rest.detach())
-                final_scaling_list.append(gaussians._scaling.detach())
-                final_rotation_list.append(gaussians._rotation.detach())
-                final_opacity_list.append(gaussians._opacity.detach())
-                final_max_radii2D_list.append(gaussians.max_radii2D.detach())
-
-            final_gm.gaussians._xyz = torch.cat(final_xyz_list, dim=0)
-            final_gm.gaussians._features_dc = torch.cat(final_features_dc_list, dim=0)
-            final_gm.gaussians._features_rest = torch.cat(final_features_rest_list, dim=0)
-            final_gm.gaussians._scaling = torch.cat(final_scaling_list, dim=0)
-            final_gm.gaussians._rotation = torch.cat(final_rotation_list, dim=0)
-            final_gm.gaussians._opacity = torch.cat(final_opacity_list, dim=0)
-            final_gm.gaussians.max_radii2D = torch.cat(final_max_radii2D_list, dim=0)
-            return final_gm
+        from manager.merged_view import MergedGaussianView
+        # 一次分配全部行再逐个写入, 不经过中间的列表和torch.cat
+        # 需要反复增删/隐藏时直接持有MergedGaussianView, 只重写变化的部分
+        final_gm = MergedGaussianView(gms).gm
+        # 第一个manager已有索引时, 把其余的点追加进去, 否则下次查询时重新构建
+        index = gms[0]._valid_spatial_index()
+        if index is not None:
+            num_first = gms[0].gaussians.get_xyz.shape[0]
+            final_xyz = final_gm.gaussians.get_xyz
+            final_gm._spatial_index = index.rebound(final_xyz)
+            final_gm._spatial_index.append(final_xyz[num_first:])
+            final_gm._spatial_index.bind(final_xyz)
+        return final_gm
+
     # endregion
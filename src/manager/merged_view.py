@@ -0,0 +1,256 @@
+"""
+Several GaussianManagers rendered as one
+
+merge_gaussian_managers used to torch.cat every attribute of every manager, and the gui
+re-merged on every add, remove or edit. MergedGaussianView keeps all of them in one set of
+over-allocated buffers (utils.pool_utils.TensorPool), each manager owns a row range:
+
+    buffer: [ gm0 rows | gm1 rows | freed rows | gm2 rows | spare capacity ]
+
+only the range of a changed manager (and only its edited attributes) is rewritten, hidden managers get a zero opacity in place
+and removed ones leave a hole that is compacted away once holes make up half of the rows.
+view.gm is a GaussianManager over the used rows.
+"""
+
+import copy
+import weakref
+from typing import Optional
+
+import torch
+
+from manager.gaussian_manager import GaussianManager
+from utils.pool_utils import TensorPool
+
+ATTRIBUTES = ("_xyz", "_features_dc", "_features_rest", "_scaling", "_rotation", "_opacity", "max_radii2D")
+HIDDEN_OPACITY = -1e4  # sigmoid -> 0, the rasterizer skips these gaussians
+COMPACT_RATIO = 0.5  # compact once freed rows exceed this share of all rows
+
+
+class _Slot:
+    """row range of one manager in the buffers"""
+
+    def __init__(self, gm: GaussianManager, start, count, visible):
+        self.gm = gm
+        self.start = start
+        self.count = count
+        self.visible = visible
+        self.signature = None  # (weakref to the attribute tensor, version) at the last write, see _signature
+
+    @property
+    def end(self):
+        return self.start + self.count
+
+
+def _signature(gm: GaussianManager):
+    """
+    weak references to the attribute tensors and their versions. Compared by identity, unlike bare
+    ids a replacement allocated where a freed attribute was never looks unchanged, and replaced
+    attributes are not kept alive until the next refresh.
+    """
+    return tuple((weakref.ref(tensor), tensor._version)
+                 for tensor in (getattr(gm.gaussians, name) for name in ATTRIBUTES))
+
+
+def _changed(old, new) -> bool:
+    return old is None or old[0]() is not new[0]() or old[1] != new[1]
+
+
+class MergedGaussianView:
+    def __init__(self, gms: list[GaussianManager] = (), hidden=()):
+        self.slots: dict[int, _Slot] = {}  # id(gm) -> slot, in insertion order
+        self.pools: dict[str, TensorPool] = {}
+        self.sh_degree: Optional[int] = None
+        self.freed = 0  # rows of removed managers not compacted yet
+        self.rows_written = 0  # full rows, for benchmarks
+        self.gm: Optional[GaussianManager] = None
+        if gms:
+            self.sync(gms, hidden)
+
+    @property
+    def device(self):
+        return self.gm.device
+
+    @property
+    def num_rows(self):
+        return next(iter(self.pools.values())).count if self.pools else 0
+
+    def managers(self) -> list[GaussianManager]:
+        return [slot.gm for slot in self.slots.values()]
+
+    # region buffers
+    def _rebuild(self, gms: list[GaussianManager], hidden):
+        """allocate the buffers for exactly these managers and write all of them"""
+        hidden = {id(gm) for gm in hidden}
+        self.sh_degree = min(gm.gaussians.max_sh_degree for gm in gms)
+        num_rest = (self.sh_degree + 1) ** 2 - 1
+        total = sum(gm.gaussians.get_xyz.shape[0] for gm in gms)
+
+        # 所有属性都会被替换, 浅拷贝即可
+        first = gms[0]
+        self.gm = copy.copy(first)
+        self.gm.gaussians = first.gaussians.snapshot()
+        self.gm.clear_cache()
+        self.gm._init_history()
+        self.gm._spatial_index = None
+        device = self.gm.device  # managers on other devices are moved to the device of the first one
+
+        self.pools = {}
+        for name in ATTRIBUTES:
+            row_shape = getattr(first.gaussians, name).shape[1:]
+            if name == "_features_rest":
+                row_shape = (num_rest, 3)
+            self.pools[name] = TensorPool(torch.empty((0, *row_shape), device=device), capacity=total)
+        self.slots = {}
+        self.freed = 0
+        for gm in gms:
+            self._append(gm, id(gm) not in hidden)
+        self._publish()
+
+    def _append(self, gm: GaussianManager, visible):
+        count = gm.gaussians.get_xyz.shape[0]
+        slot = _Slot(gm, self.num_rows, count, visible)
+        for pool in self.pools.values():
+            pool.resize(slot.end)
+        self.slots[id(gm)] = slot
+        self._write(slot)
+
+    def _write(self, slot: _Slot, names=ATTRIBUTES):
+        gaussians = slot.gm.gaussians
+        with torch.no_grad():
+            for name in names:
+                rows = self.pools[name].buffer[slot.start:slot.end]
+                tensor = getattr(gaussians, name).detach()
+                if tensor.shape[0] != slot.count:
+                    if name != "max_radii2D":
+                        raise ValueError(f"{name} of a merged manager has {tensor.shape[0]} rows, "
+                                         f"its other attributes {slot.count}")
+                    rows.zero_()  # a model that never rendered
+                    continue
+                if name == "_features_rest":
+                    tensor = tensor[:, :rows.shape[1]]
+                rows.copy_(tensor)
+            if not slot.visible and "_opacity" in names:
+                self.pools["_opacity"].buffer[slot.start:slot.end].fill_(HIDDEN_OPACITY)
+        slot.signature = _signature(slot.gm)
+        self.rows_written += slot.count * len(names) // len(ATTRIBUTES)
+
+    def _compact(self):
+        """move the rows of the remaining managers to the front, in place"""
+        device = self.device
+        index = torch.cat([torch.arange(slot.start, slot.end, device=device) for slot in self.slots.values()]
+                          + [torch.zeros(0, dtype=torch.long, device=device)])
+        for pool in self.pools.values():
+            pool.compact(index)
+        start = 0
+        for slot in self.slots.values():
+            slot.start = start
+            start = slot.end
+        self.freed = 0
+
+    def _publish(self):
+        """point view.gm at the used rows, the views change whenever a buffer grows"""
+        gaussians = self.gm.gaussians
+        for name, pool in self.pools.items():
+            setattr(gaussians, name, pool.tensor)
+        gaussians.xyz_gradient_accum = torch.empty(0, device=self.device)
+        gaussians.denom = torch.empty(0, device=self.device)
+        gaussians.max_sh_degree = self.sh_degree
+        gaussians.active_sh_degree = min(gaussians.active_sh_degree, self.sh_degree)
+
+    # endregion
+
+    # region managers
+    def add(self, gm: GaussianManager, visible=True):
+        if id(gm) in self.slots:
+            return
+        if self.gm is None or gm.gaussians.max_sh_degree < self.sh_degree:
+            # fewer SH bands than the buffers hold, every manager has to be rewritten
+            self._rebuild(self.managers() + [gm], [slot.gm for slot in self.slots.values() if not slot.visible])
+            if not visible:
+                self.set_visible(gm, False)
+            return
+        self._append(gm, visible)
+        self._publish()
+
+    def remove(self, gm: GaussianManager):
+        slot = self.slots.pop(id(gm), None)
+        if slot is None:
+            return
+        if not self.slots:
+            self.clear()
+            return
+        with torch.no_grad():
+            self.pools["_opacity"].buffer[slot.start:slot.end].fill_(HIDDEN_OPACITY)
+        self.freed += slot.count
+        if self.freed > COMPACT_RATIO * self.num_rows:
+            self._compact()
+        self._publish()
+
+    def set_visible(self, gm: GaussianManager, visible):
+        """only the opacity rows of gm are written"""
+        slot = self.slots[id(gm)]
+        if slot.visible == visible:
+            return
+        slot.visible = visible
+        with torch.no_grad():
+            rows = self.pools["_opacity"].buffer[slot.start:slot.end]
+            if visible:
+                rows.copy_(gm.gaussians._opacity.detach())
+            else:
+                rows.fill_(HIDDEN_OPACITY)
+        self.rows_written += slot.count
+
+    def refresh(self) -> bool:
+        """rewrite the ranges of managers that were edited since their last write, True if any was"""
+        changed = False
+        grown = False
+        for key, slot in list(self.slots.items()):
+            signature = _signature(slot.gm)
+            edited = [name for name, old, new in zip(ATTRIBUTES, slot.signature or [None] * len(ATTRIBUTES), signature)
+                      if _changed(old, new)]
+            if not edited:
+                continue
+            changed = True
+            if slot.gm.gaussians.get_xyz.shape[0] == slot.count:
+                # only the attributes that were edited
+                self._write(slot, edited)
+                continue
+            # the number of gaussians changed, move the manager to the end
+            del self.slots[key]
+            with torch.no_grad():
+                self.pools["_opacity"].buffer[slot.start:slot.end].fill_(HIDDEN_OPACITY)
+            self.freed += slot.count
+            self._append(slot.gm, slot.visible)
+            grown = True
+        if grown:
+            if self.freed > COMPACT_RATIO * self.num_rows:
+                self._compact()
+            self._publish()
+        return changed
+
+    def sync(self, gms: list[GaussianManager], hidden=()):
+        """make the view hold exactly gms, `hidden` ones with zero opacity"""
+        if not gms:
+            self.clear()
+            return
+        hidden = {id(gm) for gm in hidden}
+        if self.gm is None or min(gm.gaussians.max_sh_degree for gm in gms) != self.sh_degree:
+            self._rebuild(gms, [gm for gm in gms if id(gm) in hidden])
+            return
+        wanted = {id(gm) for gm in gms}
+        for slot in list(self.slots.values()):
+            if id(slot.gm) not in wanted:
+                self.remove(slot.gm)
+        for gm in gms:
+            self.add(gm, id(gm) not in hidden)
+            self.set_visible(gm, id(gm) not in hidden)
+        self.refresh()
+
+    def clear(self):
+        self.slots = {}
+        self.pools = {}
+        self.freed = 0
+        self.sh_degree = None
+        self.gm = None
+
+    # endregion
@@ -7,7 +7,8 @@ import os
 from scipy.spatial.transform import Rotation as R
 from src.scene.gaussian_model import BasicPointCloud
 from src.scene import sceneLoadTypeCallbacks
-from src.utils.graphics_utils import getWorld2View2, tr2pa, pa2tr
+from src.utils.graphics_utils import tr2pa
+from src.utils.transform_utils import transform_cameras
 
 
 class SceneManager:
@@ -193,16 +194,16 @@ class SceneManager:
         pcd = BasicPointCloud(points=rotated_points, colors=self.__scene_info.point_cloud.colors,
                               normals=self.__scene_info.point_cloud.normals)
 
+        cameras = self.__scene_info.train_cameras
+        matrix = np.eye(4)
+        matrix[:3, :3] = rotation.as_matrix()
         rotated_cameras = []
-        for i in range(len(self.__scene_info.train_cameras)):
-            cam = self.__scene_info.train_cameras[i]
-            cam_pos, cam_axis = tr2pa(cam.T, cam.R)
-
-            new_cam_pos = rotation.apply(cam_pos).astype(np.float32)
-            new_cam_axis = rotation.apply(cam_axis).astype(np.float32)
-
-            new_cam_t, new_cam_r = pa2tr(new_cam_pos, new_cam_axis)
-            rotated_cameras.append(cam._replace(R=new_cam_r, T=new_cam_t))
+        if len(cameras) > 0:
+            # 所有相机一次变换
+            new_cam_r, new_cam_t = transform_cameras(matrix, np.stack([cam.R for cam in cameras]),
+                                                     np.stack([cam.T for cam in cameras]))
+            rotated_cameras = [cam._replace(R=new_cam_r[i], T=new_cam_t[i])
+                               for i, cam in enumerate(cameras)]
 
         new_scene_info = self.__scene_info._replace(point_cloud=pcd, train_cameras=rotated_cameras)
 
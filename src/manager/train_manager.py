@@ -2,7 +2,6 @@ import copy
 import json
 import math
 import os
-import random
 import uuid
 from argparse import Namespace
 from enum import Enum
@@ -18,6 +17,7 @@ from utils.arg_utils import parse_args
 from utils.camera_utils import camera_to_JSON
 from utils.image_utils import get_pil_image, save_pil_image
 from utils.loss_utils import l1_loss, ssim
+from utils.prefetch_utils import CameraPrefetcher
 
 try:
     from torch.utils.tensorboard import SummaryWriter
@@ -138,6 +138,19 @@ def prepare_output_and_logger(args):
     return tb_writer
 
 
+def log_densify_stats(tb_writer, iteration, stats):
+    """per densification step counts and memory, to tune max_gaussians / max_gaussian_mb"""
+    budget = stats["budget"] if stats["budget"] is not None else "-"
+    allocated = f"{stats['allocated_mb']:.0f}MB" if stats["allocated_mb"] is not None else "-"
+    tqdm.write(f"[ITER {iteration}] densify: {stats['before']} -> {stats['after']} / {budget} "
+               f"(candidates {stats['candidates']}, cloned {stats['cloned']}, split {stats['split']}, "
+               f"pruned {stats['pruned']}) gaussians {stats['gaussian_mb']:.0f}MB, allocated {allocated}")
+    if tb_writer:
+        for key in ("after", "candidates", "cloned", "split", "pruned", "gaussian_mb", "allocated_mb"):
+            if stats[key] is not None:
+                tb_writer.add_scalar(f"densify/{key}", stats[key], iteration)
+
+
 def init_output_folder(args, scene_info):
     if not args.loaded_iter:
 
@@ -194,70 +207,55 @@ def train(args, scene_info, gaussians, train_cameras, gt_socket=None, loss_socke
 
     assert opt.iterations > first_iter, "opt.iterations must be larger than loaded_iter"
 
-    viewpoint_stack = None
-    ema_loss_for_log = 0.0
-    progress_bar = tqdm(range(first_iter, opt.iterations), desc="Training progress")
-    pu.p_new_progress("train_gaussian", opt.iterations - first_iter)
+    # 预取之后的视角和真值图像, 抽取顺序与逐个 pop 相同
+    with CameraPrefetcher(train_cameras[1.0], depth=opt.prefetch_depth, load_images=gt_socket is None) as prefetcher:
+        ema_loss_for_log = 0.0
+        progress_bar = tqdm(range(first_iter, opt.iterations), desc="Training progress")
+        pu.p_new_progress("train_gaussian", opt.iterations - first_iter)
 
-    first_iter += 1
-    for iteration in range(first_iter, opt.iterations + 1):
+        first_iter += 1
+        for iteration in range(first_iter, opt.iterations + 1):
 
-        iter_start.record()
+            iter_start.record()
 
-        gaussians.update_learning_rate(iteration)
+            gaussians.update_learning_rate(iteration)
 
-        # Every 1000 its we increase the levels of SH up to a maximum degree
-        if iteration % 1000 == 0:
-            gaussians.oneupSHdegree()
+            # Every 1000 its we increase the levels of SH up to a maximum degree
+            if iteration % 1000 == 0:
+                gaussians.oneupSHdegree()
 
-        # Pick a random Camera
-        if not viewpoint_stack:
-            viewpoint_stack = train_cameras[1.0].copy()
-        viewpoint_cam = viewpoint_stack.pop(random.randint(0, len(viewpoint_stack) - 1))
+            # Pick a random Camera
+            viewpoint_cam, prefetched_image = prefetcher.next()
 
-        # Render
+            # Render
 
-        bg = torch.rand((3), device="cuda") if opt.random_background else background
+            bg = torch.rand((3), device="cuda") if opt.random_background else background
 
-        render_pkg = render(viewpoint_cam, gaussians, pipe, bg)
-        image, viewspace_point_tensor, visibility_filter, radii = render_pkg["render"], render_pkg["viewspace_points"], \
-            render_pkg["visibility_filter"], render_pkg["radii"]
+            render_pkg = render(viewpoint_cam, gaussians, pipe, bg)
+            image, viewspace_point_tensor, visibility_filter, radii = render_pkg["render"], render_pkg["viewspace_points"], \
+                render_pkg["visibility_filter"], render_pkg["radii"]
 
-        # =========== ground truth socket ===============
-        if gt_socket is not None:
-            gt_image = gt_socket(args=args,
-                                 image=image,
-                                 iteration=iteration,
-                                 gaussians=gaussians,
-                                 scene_info=scene_info,
-                                 viewpoint_cam=viewpoint_cam, )
-        else:
-            gt_image = viewpoint_cam.original_image.cuda()
-
-        # Loss
-        Ll1 = l1_loss(image, gt_image)
-        loss = (1.0 - opt.lambda_dssim) * Ll1 + opt.lambda_dssim * (1.0 - ssim(image, gt_image))
-
-        loss.backward()
-        iter_end.record()
-
-        # =============loss socket=======================
-        if loss_socket is not None:
-            loss_socket(args=args,
-                        gt_image=gt_image,
-                        image=image,
-                        iteration=iteration,
-                        gaussians=gaussians,
-                        scene_info=scene_info,
-                        Ll1=Ll1,
-                        loss=loss,
-                        viewpoint_cam=viewpoint_cam, )
-        # ================================================
-
-        with torch.no_grad():
-            # ====================CUSTOM CODE===============
-            if post_socket is not None:
-                post_socket(args=args,
+            # =========== ground truth socket ===============
+            if gt_socket is not None:
+                gt_image = gt_socket(args=args,
+                                     image=image,
+                                     iteration=iteration,
+                                     gaussians=gaussians,
+                                     scene_info=scene_info,
+                                     viewpoint_cam=viewpoint_cam, )
+            else:
+                gt_image = prefetched_image
+
+            # Loss
+            Ll1 = l1_loss(image, gt_image)
+            loss = (1.0 - opt.lambda_dssim) * Ll1 + opt.lambda_dssim * (1.0 - ssim(image, gt_image))
+
+            loss.backward()
+            iter_end.record()
+
+            # =============loss socket=======================
+            if loss_socket is not None:
+                loss_socket(args=args,
                             gt_image=gt_image,
                             image=image,
                             iteration=iteration,
@@ -265,60 +263,79 @@ def train(args, scene_info, gaussians, train_cameras, gt_socket=None, loss_socke
                             scene_info=scene_info,
                             Ll1=Ll1,
                             loss=loss,
-                            viewpoint_cam=viewpoint_cam,
-                            )
-            # ==============================================
-
-            # Progress bar
-            ema_loss_for_log = 0.4 * loss.item() + 0.6 * ema_loss_for_log
-            if iteration % 10 == 0:
-                progress_bar.set_postfix({"Loss": f"{ema_loss_for_log:.{7}f}"})
-                progress_bar.update(10)
-                pu.p_update("train_gaussian", 10)
-            if iteration == opt.iterations:
-                progress_bar.close()
-                pu.p_set_state("train_gaussian", ProgressState.Complete)
-            # Log and save
-            # training_report(tb_writer, iteration, Ll1, loss, l1_loss,
-            # iter_start.elapsed_time(iter_end),testing_iterations, scene, render, (pipe, background))
-            if iteration in saving_iterations:
-                print("\n[ITER {}] Saving Gaussians".format(iteration))
-                # scene.save(iteration)
-                point_cloud_path = os.path.join(args.model_path, "point_cloud/iteration_{}".format(iteration))
-                gaussians.save_ply(os.path.join(point_cloud_path, "point_cloud.ply"))
-
-            # Densification
-            if iteration < opt.densify_until_iter:
-                # Keep track of max radii in image-space for pruning
-                gaussians.max_radii2D[visibility_filter] = torch.max(gaussians.max_radii2D[visibility_filter],
-                                                                     radii[visibility_filter])
-                gaussians.add_densification_stats(viewspace_point_tensor, visibility_filter)
-
-                if iteration > opt.densify_from_iter and iteration % opt.densification_interval == 0:
-                    size_threshold = 20 if iteration > opt.opacity_reset_interval else None
-                    gaussians.densify_and_prune(opt.densify_grad_threshold, 0.005, cameras_extent, size_threshold)
-
-                if iteration % opt.opacity_reset_interval == 0 or (
-                        dataset.white_background and iteration == opt.densify_from_iter):
-                    if iteration != opt.iterations:
-                        gaussians.reset_opacity()
-
-            # Optimizer step
-            if iteration < opt.iterations:
-                gaussians.optimizer.step()
-                gaussians.optimizer.zero_grad(set_to_none=True)
-
-            if iteration in checkpoint_iterations:
-                print("\n[ITER {}] Saving Checkpoint".format(iteration))
-                torch.save((gaussians.capture(), iteration), args.model_path + "/chkpnt" + str(iteration) + ".pth")
-
-            # Stop conditions
-            if 'force_stop' in cmd_dict and cmd_dict['force_stop'] == 1:
-                break
-
-            if 'stop_and_save' in cmd_dict and cmd_dict['stop_and_save'] == 1:
-                print("\n[ITER {}] Saving Gaussians".format(iteration))
-                # scene.save(iteration)
-                point_cloud_path = os.path.join(args.model_path, "point_cloud/iteration_{}".format(iteration))
-                gaussians.save_ply(os.path.join(point_cloud_path, "point_cloud.ply"))
-                break
+                            viewpoint_cam=viewpoint_cam, )
+            # ================================================
+
+            with torch.no_grad():
+                # ====================CUSTOM CODE===============
+                if post_socket is not None:
+                    post_socket(args=args,
+                                gt_image=gt_image,
+                                image=image,
+                                iteration=iteration,
+                                gaussians=gaussians,
+                                scene_info=scene_info,
+                                Ll1=Ll1,
+                                loss=loss,
+                                viewpoint_cam=viewpoint_cam,
+                                )
+                # ==============================================
+
+                # Progress bar
+                ema_loss_for_log = 0.4 * loss.item() + 0.6 * ema_loss_for_log
+                if iteration % 10 == 0:
+                    progress_bar.set_postfix({"Loss": f"{ema_loss_for_log:.{7}f}",
+                                              "Stall": f"{prefetcher.mean_stall * 1000:.1f}ms"})
+                    progress_bar.update(10)
+                    pu.p_update("train_gaussian", 10)
+                if tb_writer:
+                    tb_writer.add_scalar("loader/stall_ms", prefetcher.last_stall * 1000, iteration)
+                if iteration == opt.iterations:
+                    progress_bar.close()
+                    pu.p_set_state("train_gaussian", ProgressState.Complete)
+                # Log and save
+                # training_report(tb_writer, iteration, Ll1, loss, l1_loss,
+                # iter_start.elapsed_time(iter_end),testing_iterations, scene, render, (pipe, background))
+                if iteration in saving_iterations:
+                    print("\n[ITER {}] Saving Gaussians".format(iteration))
+                    # scene.save(iteration)
+                    point_cloud_path = os.path.join(args.model_path, "point_cloud/iteration_{}".format(iteration))
+                    gaussians.save_ply(os.path.join(point_cloud_path, "point_cloud.ply"))
+
+                # Densification
+                if iteration < opt.densify_until_iter:
+                    # Keep track of max radii in image-space for pruning
+                    gaussians.max_radii2D[visibility_filter] = torch.max(gaussians.max_radii2D[visibility_filter],
+                                                                         radii[visibility_filter])
+                    gaussians.add_densification_stats(viewspace_point_tensor, visibility_filter)
+
+                    if iteration > opt.densify_from_iter and iteration % opt.densification_interval == 0:
+                        size_threshold = 20 if iteration > opt.opacity_reset_interval else None
+                        densify_stats = gaussians.densify_and_prune(opt.densify_grad_threshold, 0.005, cameras_extent,
+                                                                    size_threshold)
+                        log_densify_stats(tb_writer, iteration, densify_stats)
+
+                    if iteration % opt.opacity_reset_interval == 0 or (
+                            dataset.white_background and iteration == opt.densify_from_iter):
+                        if iteration != opt.iterations:
+                            gaussians.reset_opacity()
+
+                # Optimizer step
+                if iteration < opt.iterations:
+                    gaussians.optimizer.step()
+                    gaussians.optimizer.zero_grad(set_to_none=True)
+
+                if iteration in checkpoint_iterations:
+                    print("\n[ITER {}] Saving Checkpoint".format(iteration))
+                    torch.save((gaussians.capture(), iteration), args.model_path + "/chkpnt" + str(iteration) + ".pth")
+
+                # Stop conditions
+                if 'force_stop' in cmd_dict and cmd_dict['force_stop'] == 1:
+                    break
+
+                if 'stop_and_save' in cmd_dict and cmd_dict['stop_and_save'] == 1:
+                    print("\n[ITER {}] Saving Gaussians".format(iteration))
+                    # scene.save(iteration)
+                    point_cloud_path = os.path.join(args.model_path, "point_cloud/iteration_{}".format(iteration))
+                    gaussians.save_ply(os.path.join(point_cloud_path, "point_cloud.ply"))
+                    break
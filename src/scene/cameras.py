@@ -13,15 +13,29 @@ import torch
 from torch import nn
 import numpy as np
 from utils.graphics_utils import getWorld2View2, getProjectionMatrix, tr2pa, pa2tr, pa2cw
+from utils.general_utils import pack_image, unpack_image
+from utils.image_cache import image_cache
 from scipy.spatial.transform import Rotation as R
 
 
 class Camera(nn.Module):
     def __init__(self, colmap_id, R, T, FoVx, FoVy, image, gt_alpha_mask,
                  image_name, uid,
-                 trans=np.array([0.0, 0.0, 0.0]), scale=1.0, data_device="cuda"
+                 trans=np.array([0.0, 0.0, 0.0]), scale=1.0, data_device="cuda", device="cuda",
+                 image_loader=None, resolution=None, image_key=None, compact_image=False
                  ):
+        """
+        :param data_device: device of the ground truth image
+        :param device: device of the view / projection transforms
+        :param image_loader: image is None: returns (image, gt_alpha_mask) of the given resolution on first access
+            of original_image, the result is kept in the image cache of data_device (utils.image_cache)
+        :param resolution: (width, height) of the lazily loaded image
+        :param image_key: key of the image in the cache
+        :param compact_image: keep the ground truth as uint8 (alpha as a 4th channel), 4x smaller than float,
+            original_image converts it on every access, see stored_image
+        """
         super(Camera, self).__init__()
+        self.device = torch.device(device)
 
         self.uid = uid
         self.colmap_id = colmap_id
@@ -35,17 +49,20 @@ class Camera(nn.Module):
             self.data_device = torch.device(data_device)
         except Exception as e:
             print(e)
-            print(f"[Warning] Custom device {data_device} failed, fallback to default cuda device")
-            self.data_device = torch.device("cuda")
-
-        self.original_image = image.clamp(0.0, 1.0).to(self.data_device)
-        self.image_width = self.original_image.shape[2]
-        self.image_height = self.original_image.shape[1]
-
-        if gt_alpha_mask is not None:
-            self.original_image *= gt_alpha_mask.to(self.data_device)
+            print(f"[Warning] Custom device {data_device} failed, fallback to {self.device}")
+            self.data_device = self.device
+
+        self.compact_image = compact_image
+        self._image_loader = image_loader
+        self._image_key = image_key if image_key is not None else (image_name, uid, resolution)
+        if image is None:
+            assert image_loader is not None and resolution is not None, "lazy cameras need a loader and a resolution"
+            self._original_image = None
+            self.image_width, self.image_height = resolution
         else:
-            self.original_image *= torch.ones((1, self.image_height, self.image_width), device=self.data_device)
+            self._original_image = self._prepare_image(image, gt_alpha_mask)
+            self.image_width = self._original_image.shape[2]
+            self.image_height = self._original_image.shape[1]
 
         self.zfar = 100.0
         self.znear = 0.01
@@ -53,25 +70,53 @@ class Camera(nn.Module):
         self.trans = trans
         self.scale = scale
 
-        self.world_view_transform = torch.tensor(getWorld2View2(R, T, trans, scale)).transpose(0, 1).cuda()
+        self.world_view_transform = torch.tensor(getWorld2View2(R, T, trans, scale)).transpose(0, 1).to(self.device)
         self.projection_matrix = getProjectionMatrix(znear=self.znear, zfar=self.zfar, fovX=self.FoVx,
-                                                     fovY=self.FoVy).transpose(0, 1).cuda()
+                                                     fovY=self.FoVy).transpose(0, 1).to(self.device)
         self.full_proj_transform = (
             self.world_view_transform.unsqueeze(0).bmm(self.projection_matrix.unsqueeze(0))).squeeze(0)
         self.camera_center = self.world_view_transform.inverse()[3, :3]
 
 
+    def _prepare_image(self, image, gt_alpha_mask):
+        if self.compact_image:
+            return pack_image(image, gt_alpha_mask).to(self.data_device)
+        image = image.clamp(0.0, 1.0).to(self.data_device)
+        if gt_alpha_mask is not None:
+            image *= gt_alpha_mask.to(self.data_device)
+        return image
+
+    @property
+    def stored_image(self) -> torch.Tensor:
+        """the ground truth as kept on data_device, uint8 for compact images, utils.general_utils.unpack_image converts it"""
+        if self._original_image is not None:
+            return self._original_image
+        return image_cache(self.data_device).get(self._image_key, lambda: self._prepare_image(*self._image_loader()))
+
+    @property
+    def original_image(self) -> torch.Tensor:
+        return unpack_image(self.stored_image)
+
+    @original_image.setter
+    def original_image(self, image):
+        self._original_image = image
+
+    @property
+    def is_lazy(self):
+        return self._original_image is None
+
     def update(self):
-        self.world_view_transform = torch.tensor(getWorld2View2(self.R, self.T, self.trans, self.scale)).transpose(0, 1).cuda()
+        self.world_view_transform = torch.tensor(getWorld2View2(self.R, self.T, self.trans, self.scale)).transpose(0, 1).to(self.device)
         self.projection_matrix = getProjectionMatrix(znear=self.znear, zfar=self.zfar, fovX=self.FoVx,
-                                                     fovY=self.FoVy).transpose(0, 1).cuda()
+                                                     fovY=self.FoVy).transpose(0, 1).to(self.device)
         self.full_proj_transform = (
             self.world_view_transform.unsqueeze(0).bmm(self.projection_matrix.unsqueeze(0))).squeeze(0)
         self.camera_center = self.world_view_transform.inverse()[3, :3]
 
 class MiniCam:
-    def __init__(self, T, R, width, height, fovy, fovx, znear=0.01, zfar=100.0):
+    def __init__(self, T, R, width, height, fovy, fovx, znear=0.01, zfar=100.0, device="cuda"):
         # c2w (pose) should be in NeRF convention.
+        self.device = torch.device(device)
         self.T = T
         self.R = R
         self.image_width = width
@@ -84,9 +129,9 @@ class MiniCam:
         self.scale = 1.0
 
         self.world_view_transform = torch.tensor(getWorld2View2(self.R, self.T, self.trans, self.scale)).transpose(0,
-                                                                                                                   1).cuda()
+                                                                                                                   1).to(self.device)
         self.projection_matrix = getProjectionMatrix(znear=self.znear, zfar=self.zfar, fovX=self.FoVx,
-                                                     fovY=self.FoVy).transpose(0, 1).cuda()
+                                                     fovY=self.FoVy).transpose(0, 1).to(self.device)
         self.full_proj_transform = (
             self.world_view_transform.unsqueeze(0).bmm(self.projection_matrix.unsqueeze(0))).squeeze(0)
         self.camera_center = self.world_view_transform.inverse()[3, :3]
@@ -131,9 +176,9 @@ class MiniCam:
 
     def update(self):
         self.world_view_transform = torch.tensor(getWorld2View2(self.R, self.T, self.trans, self.scale)).transpose(0,
-                                                                                                                   1).cuda()
+                                                                                                                   1).to(self.device)
         self.projection_matrix = getProjectionMatrix(znear=self.znear, zfar=self.zfar, fovX=self.FoVx,
-                                                     fovY=self.FoVy).transpose(0, 1).cuda()
+                                                     fovY=self.FoVy).transpose(0, 1).to(self.device)
         self.full_proj_transform = (
             self.world_view_transform.unsqueeze(0).bmm(self.projection_matrix.unsqueeze(0))).squeeze(0)
         self.camera_center = self.world_view_transform.inverse()[3, :3]
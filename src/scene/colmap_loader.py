@@ -39,6 +39,17 @@ CAMERA_MODEL_IDS = dict([(camera_model.model_id, camera_model)
 CAMERA_MODEL_NAMES = dict([(camera_model.model_name, camera_model)
                            for camera_model in CAMERA_MODELS])
 
+# fixed size parts of the binary records, packed little endian as written by colmap
+POINT3D_DTYPE = np.dtype([("id", "<u8"), ("xyz", "<f8", 3), ("rgb", "u1", 3), ("error", "<f8"),
+                          ("track_length", "<u8")])
+TRACK_ELEM_DTYPE = np.dtype([("image_id", "<i4"), ("point2D_idx", "<i4")])
+IMAGE_DTYPE = np.dtype([("id", "<i4"), ("qvec", "<f8", 4), ("tvec", "<f8", 3), ("camera_id", "<i4")])
+POINT2D_DTYPE = np.dtype([("xy", "<f8", 2), ("point3D_id", "<i8")])
+CAMERA_DTYPE = np.dtype([("id", "<i4"), ("model_id", "<i4"), ("width", "<u8"), ("height", "<u8")])
+_UINT64 = struct.Struct("<Q")
+TEXT_BLOCK_SIZE = 16 << 20  # characters of a text model parsed at a time
+GATHER_CHUNK = 1 << 16  # binary records gathered at a time
+
 
 def qvec2rotmat(qvec):
     return np.array([
@@ -80,78 +91,122 @@ def read_next_bytes(fid, num_bytes, format_char_sequence, endian_character="<"):
     data = fid.read(num_bytes)
     return struct.unpack(endian_character + format_char_sequence, data)
 
-def read_points3D_text(path):
+def _iter_text_blocks(path, block_size=TEXT_BLOCK_SIZE):
+    """the lines of a text file, a block of whole lines at a time"""
+    with open(path, "r") as fid:
+        rest = ""
+        while True:
+            block = fid.read(block_size)
+            if not block:
+                break
+            lines = (rest + block).split("\n")
+            rest = lines.pop()  # maybe cut in the middle
+            yield lines
+        if rest:
+            yield [rest]
+
+def _parse_floats(text, count, path, multiple=False):
+    """the numbers of a whitespace separated text, exactly count of them (or a multiple of count)"""
+    values = np.fromstring(text, dtype=np.float64, sep=" ") if text else np.empty(0)
+    if (values.shape[0] % count if multiple else values.shape[0] - count) != 0:
+        raise ValueError(f"malformed line in {path}")
+    return values
+
+def read_points3D_text(path, block_size=TEXT_BLOCK_SIZE):
     """
     see: src/base/reconstruction.cc
         void Reconstruction::ReadPoints3DText(const std::string& path)
         void Reconstruction::WritePoints3DText(const std::string& path)
+
+    One pass in blocks of block_size characters, the memory stays bounded by the block and the
+    output. Only the first 8 columns of a line are split off (the track is never tokenized), the
+    numbers of a whole block are parsed by one np.fromstring into arrays that grow by doubling.
     """
-    xyzs = None
-    rgbs = None
-    errors = None
+    columns = np.empty((1 << 16, 7))  # x y z r g b error
     num_points = 0
-    with open(path, "r") as fid:
-        while True:
-            line = fid.readline()
-            if not line:
-                break
-            line = line.strip()
-            if len(line) > 0 and line[0] != "#":
-                num_points += 1
+    for lines in _iter_text_blocks(path, block_size):
+        heads = [line.split(None, 8)[1:8] for line in lines if line.strip() and line.lstrip()[0] != "#"]
+        if not heads:
+            continue
+        values = _parse_floats(" ".join(" ".join(head) for head in heads), 7 * len(heads), path)
+        while num_points + len(heads) > columns.shape[0]:
+            columns = np.resize(columns, (2 * columns.shape[0], 7))
+        columns[num_points:num_points + len(heads)] = values.reshape(-1, 7)
+        num_points += len(heads)
 
+    columns = columns[:num_points]
+    return columns[:, 0:3].copy(), columns[:, 3:6].copy(), columns[:, 6:7].copy()
 
-    xyzs = np.empty((num_points, 3))
-    rgbs = np.empty((num_points, 3))
-    errors = np.empty((num_points, 1))
-    count = 0
-    with open(path, "r") as fid:
-        while True:
-            line = fid.readline()
-            if not line:
-                break
-            line = line.strip()
-            if len(line) > 0 and line[0] != "#":
-                elems = line.split()
-                xyz = np.array(tuple(map(float, elems[1:4])))
-                rgb = np.array(tuple(map(int, elems[4:7])))
-                error = np.array(float(elems[7]))
-                xyzs[count] = xyz
-                rgbs[count] = rgb
-                errors[count] = error
-                count += 1
+def _read_file(path):
+    with open(path, "rb") as fid:
+        return fid.read()
+
+def _gather(data, count, dtype, chunk_offsets):
+    """count records of dtype, chunk_offsets(start, stop) giving the byte offsets of records start..stop"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    records = np.empty(count, dtype=dtype)
+    raw = records.view(np.uint8).reshape(count, dtype.itemsize)
+    columns = np.arange(dtype.itemsize)
+    # the byte index is 8 bytes per record byte, so only GATHER_CHUNK records of it exist at a time
+    for start in range(0, count, GATHER_CHUNK):
+        stop = min(start + GATHER_CHUNK, count)
+        np.take(buffer, chunk_offsets(start, stop)[:, None] + columns, out=raw[start:stop])
+    return records
+
+def _gather_records(data, offsets, dtype):
+    """the fixed size records of dtype starting at each of offsets, without a python loop"""
+    return _gather(data, len(offsets), dtype, lambda start, stop: offsets[start:stop])
+
+def _gather_ranges(data, starts, counts, dtype):
+    """concatenation of counts[i] records of dtype at starts[i]"""
+    ends = np.cumsum(counts)
+    begins = ends - counts
+
+    def chunk_offsets(start, stop):
+        element = np.arange(start, stop)
+        owner = np.searchsorted(ends, element, side="right")
+        return starts[owner] + (element - begins[owner]) * dtype.itemsize
 
-    return xyzs, rgbs, errors
+    return _gather(data, int(ends[-1]) if len(ends) else 0, dtype, chunk_offsets)
 
-def read_points3D_binary(path_to_model_file):
+def read_points3D_binary(path_to_model_file, tracks=False):
     """
     see: src/base/reconstruction.cc
         void Reconstruction::ReadPoints3DBinary(const std::string& path)
         void Reconstruction::WritePoints3DBinary(const std::string& path)
+
+    Only the track lengths are read in a loop to find the records, the fixed fields are gathered
+    with one structured view and the track data is skipped unless `tracks`.
+    :return: xyzs [n, 3], rgbs [n, 3], errors [n, 1] (float64), with tracks also a dict of
+        ids [n, ], track_offsets [n + 1, ] and the concatenated image_ids / point2D_idxs of all tracks
     """
+    data = _read_file(path_to_model_file)
+    num_points = _UINT64.unpack_from(data, 0)[0]
+
+    offsets = np.empty(num_points, dtype=np.int64)
+    unpack_length = _UINT64.unpack_from
+    length_offset = POINT3D_DTYPE.fields["track_length"][1]
+    elem_size = TRACK_ELEM_DTYPE.itemsize
+    offset = 8
+    for p_id in range(num_points):
+        offsets[p_id] = offset
+        offset += POINT3D_DTYPE.itemsize + elem_size * unpack_length(data, offset + length_offset)[0]
+    assert offset == len(data), f"{path_to_model_file} is truncated or not a points3D.bin"
 
+    points = _gather_records(data, offsets, POINT3D_DTYPE)
+    xyzs = points["xyz"].astype(np.float64)
+    rgbs = points["rgb"].astype(np.float64)
+    errors = points["error"].astype(np.float64).reshape(-1, 1)
+    if not tracks:
+        return xyzs, rgbs, errors
 
-    with open(path_to_model_file, "rb") as fid:
-        num_points = read_next_bytes(fid, 8, "Q")[0]
-
-        xyzs = np.empty((num_points, 3))
-        rgbs = np.empty((num_points, 3))
-        errors = np.empty((num_points, 1))
-
-        for p_id in range(num_points):
-            binary_point_line_properties = read_next_bytes(
-                fid, num_bytes=43, format_char_sequence="QdddBBBd")
-            xyz = np.array(binary_point_line_properties[1:4])
-            rgb = np.array(binary_point_line_properties[4:7])
-            error = np.array(binary_point_line_properties[7])
-            track_length = read_next_bytes(
-                fid, num_bytes=8, format_char_sequence="Q")[0]
-            track_elems = read_next_bytes(
-                fid, num_bytes=8*track_length,
-                format_char_sequence="ii"*track_length)
-            xyzs[p_id] = xyz
-            rgbs[p_id] = rgb
-            errors[p_id] = error
-    return xyzs, rgbs, errors
+    lengths = points["track_length"].astype(np.int64)
+    elems = _gather_ranges(data, offsets + POINT3D_DTYPE.itemsize, lengths, TRACK_ELEM_DTYPE)
+    track_data = {"ids": points["id"].astype(np.int64),
+                  "track_offsets": np.concatenate(([0], np.cumsum(lengths))),
+                  "image_ids": elems["image_id"].astype(np.int32),
+                  "point2D_idxs": elems["point2D_idx"].astype(np.int32)}
+    return xyzs, rgbs, errors, track_data
 
 def read_intrinsics_text(path):
     """
@@ -168,7 +223,7 @@ def read_intrinsics_text(path):
                 elems = line.split()
                 camera_id = int(elems[0])
                 model = elems[1]
-                assert model == "PINHOLE", "While the loader support other types, the rest of the code assumes PINHOLE"
+                assert model in CAMERA_MODEL_NAMES, f"Unknown camera model {model}"
                 width = int(elems[2])
                 height = int(elems[3])
                 params = np.array(tuple(map(float, elems[4:])))
@@ -177,38 +232,38 @@ def read_intrinsics_text(path):
                                             params=params)
     return cameras
 
-def read_extrinsics_binary(path_to_model_file):
+def read_extrinsics_binary(path_to_model_file, skip_points2D=False):
     """
     see: src/base/reconstruction.cc
         void Reconstruction::ReadImagesBinary(const std::string& path)
         void Reconstruction::WriteImagesBinary(const std::string& path)
+
+    :param skip_points2D: leave xys / point3D_ids empty, the cameras do not need them
     """
+    data = _read_file(path_to_model_file)
+    num_reg_images = _UINT64.unpack_from(data, 0)[0]
     images = {}
-    with open(path_to_model_file, "rb") as fid:
-        num_reg_images = read_next_bytes(fid, 8, "Q")[0]
-        for _ in range(num_reg_images):
-            binary_image_properties = read_next_bytes(
-                fid, num_bytes=64, format_char_sequence="idddddddi")
-            image_id = binary_image_properties[0]
-            qvec = np.array(binary_image_properties[1:5])
-            tvec = np.array(binary_image_properties[5:8])
-            camera_id = binary_image_properties[8]
-            image_name = ""
-            current_char = read_next_bytes(fid, 1, "c")[0]
-            while current_char != b"\x00":   # look for the ASCII 0 entry
-                image_name += current_char.decode("utf-8")
-                current_char = read_next_bytes(fid, 1, "c")[0]
-            num_points2D = read_next_bytes(fid, num_bytes=8,
-                                           format_char_sequence="Q")[0]
-            x_y_id_s = read_next_bytes(fid, num_bytes=24*num_points2D,
-                                       format_char_sequence="ddq"*num_points2D)
-            xys = np.column_stack([tuple(map(float, x_y_id_s[0::3])),
-                                   tuple(map(float, x_y_id_s[1::3]))])
-            point3D_ids = np.array(tuple(map(int, x_y_id_s[2::3])))
-            images[image_id] = Image(
-                id=image_id, qvec=qvec, tvec=tvec,
-                camera_id=camera_id, name=image_name,
-                xys=xys, point3D_ids=point3D_ids)
+    offset = 8
+    for _ in range(num_reg_images):
+        properties = np.frombuffer(data, dtype=IMAGE_DTYPE, count=1, offset=offset)[0]
+        name_end = data.index(b"\x00", offset + IMAGE_DTYPE.itemsize)  # look for the ASCII 0 entry
+        image_name = data[offset + IMAGE_DTYPE.itemsize:name_end].decode("utf-8")
+        num_points2D = _UINT64.unpack_from(data, name_end + 1)[0]
+        offset = name_end + 9
+        if skip_points2D:
+            xys = np.empty((0, 2))
+            point3D_ids = np.empty((0,), dtype=np.int64)
+        else:
+            points2D = np.frombuffer(data, dtype=POINT2D_DTYPE, count=num_points2D, offset=offset)
+            xys = points2D["xy"].astype(np.float64)
+            point3D_ids = points2D["point3D_id"].astype(np.int64)
+        offset += POINT2D_DTYPE.itemsize * num_points2D
+        image_id = int(properties["id"])
+        images[image_id] = Image(
+            id=image_id, qvec=properties["qvec"].astype(np.float64), tvec=properties["tvec"].astype(np.float64),
+            camera_id=int(properties["camera_id"]), name=image_name,
+            xys=xys, point3D_ids=point3D_ids)
+    assert offset == len(data), f"{path_to_model_file} is truncated or not an images.bin"
     return images
 
 
@@ -218,55 +273,62 @@ def read_intrinsics_binary(path_to_model_file):
         void Reconstruction::WriteCamerasBinary(const std::string& path)
         void Reconstruction::ReadCamerasBinary(const std::string& path)
     """
+    data = _read_file(path_to_model_file)
+    num_cameras = _UINT64.unpack_from(data, 0)[0]
     cameras = {}
-    with open(path_to_model_file, "rb") as fid:
-        num_cameras = read_next_bytes(fid, 8, "Q")[0]
-        for _ in range(num_cameras):
-            camera_properties = read_next_bytes(
-                fid, num_bytes=24, format_char_sequence="iiQQ")
-            camera_id = camera_properties[0]
-            model_id = camera_properties[1]
-            model_name = CAMERA_MODEL_IDS[camera_properties[1]].model_name
-            width = camera_properties[2]
-            height = camera_properties[3]
-            num_params = CAMERA_MODEL_IDS[model_id].num_params
-            params = read_next_bytes(fid, num_bytes=8*num_params,
-                                     format_char_sequence="d"*num_params)
-            cameras[camera_id] = Camera(id=camera_id,
-                                        model=model_name,
-                                        width=width,
-                                        height=height,
-                                        params=np.array(params))
-        assert len(cameras) == num_cameras
+    offset = 8
+    for _ in range(num_cameras):
+        properties = np.frombuffer(data, dtype=CAMERA_DTYPE, count=1, offset=offset)[0]
+        offset += CAMERA_DTYPE.itemsize
+        camera_id = int(properties["id"])
+        model = CAMERA_MODEL_IDS[int(properties["model_id"])]
+        params = np.frombuffer(data, dtype="<f8", count=model.num_params, offset=offset).astype(np.float64)
+        offset += 8 * model.num_params
+        cameras[camera_id] = Camera(id=camera_id,
+                                    model=model.model_name,
+                                    width=int(properties["width"]),
+                                    height=int(properties["height"]),
+                                    params=params)
+    assert len(cameras) == num_cameras
     return cameras
 
 
-def read_extrinsics_text(path):
+def read_extrinsics_text(path, skip_points2D=False, block_size=TEXT_BLOCK_SIZE):
     """
     Taken from https://github.com/colmap/colmap/blob/dev/scripts/python/read_write_model.py
+
+    Read in blocks like read_points3D_text, every points2D line is parsed by one np.fromstring.
+    :param skip_points2D: leave xys / point3D_ids empty, the cameras do not need them
     """
     images = {}
-    with open(path, "r") as fid:
-        while True:
-            line = fid.readline()
-            if not line:
-                break
-            line = line.strip()
-            if len(line) > 0 and line[0] != "#":
-                elems = line.split()
-                image_id = int(elems[0])
-                qvec = np.array(tuple(map(float, elems[1:5])))
-                tvec = np.array(tuple(map(float, elems[5:8])))
-                camera_id = int(elems[8])
-                image_name = elems[9]
-                elems = fid.readline().split()
-                xys = np.column_stack([tuple(map(float, elems[0::3])),
-                                       tuple(map(float, elems[1::3]))])
-                point3D_ids = np.array(tuple(map(int, elems[2::3])))
+    header = None  # the points2D line follows the line of each image
+    for lines in _iter_text_blocks(path, block_size):
+        for line in lines:
+            if header is not None:
+                image_id, qvec, tvec, camera_id, image_name = header
+                header = None
+                line = line.strip()
+                if skip_points2D or not line:
+                    xys = np.empty((0, 2))
+                    point3D_ids = np.empty((0,), dtype=np.int64)
+                else:
+                    values = _parse_floats(line, 3, path, multiple=True).reshape(-1, 3)
+                    xys = values[:, :2].copy()
+                    point3D_ids = values[:, 2].astype(np.int64)
                 images[image_id] = Image(
                     id=image_id, qvec=qvec, tvec=tvec,
                     camera_id=camera_id, name=image_name,
                     xys=xys, point3D_ids=point3D_ids)
+                continue
+            line = line.strip()
+            if len(line) > 0 and line[0] != "#":
+                elems = line.split()
+                pose = _parse_floats(" ".join(elems[1:8]), 7, path)
+                header = int(elems[0]), pose[:4], pose[4:], int(elems[8]), elems[9]
+    if header is not None:  # last image without a points2D line
+        image_id, qvec, tvec, camera_id, image_name = header
+        images[image_id] = Image(id=image_id, qvec=qvec, tvec=tvec, camera_id=camera_id, name=image_name,
+                                 xys=np.empty((0, 2)), point3D_ids=np.empty((0,), dtype=np.int64))
     return images
 
 
@@ -9,18 +9,22 @@
 # For inquiries contact  george.drettakis@inria.fr
 #
 
+import hashlib
 import os
 import sys
-from PIL import Image
+import time
 from typing import NamedTuple
 from scene.colmap_loader import read_extrinsics_text, read_intrinsics_text, qvec2rotmat, \
-    read_extrinsics_binary, read_intrinsics_binary, read_points3D_binary, read_points3D_text
+    read_extrinsics_binary, read_intrinsics_binary, read_points3D_binary, read_points3D_text, CAMERA_MODEL_NAMES
 from utils.graphics_utils import getWorld2View2, focal2fov, fov2focal
 import numpy as np
 import json
 from pathlib import Path
-from plyfile import PlyData, PlyElement
+from plyfile import PlyData
 from utils.sh_utils import SH2RGB
+from utils.ply_utils import write_vertex_ply, PlyVertexMap
+from utils.image_probe import probe_images
+from utils.undistort_utils import undistorter, DISTORTED_MODELS, UNDISTORT_DIR_NAME
 from scene.gaussian_model import BasicPointCloud
 
 class CameraInfo(NamedTuple):
@@ -34,6 +38,8 @@ class CameraInfo(NamedTuple):
     image_name: str
     width: int
     height: int
+    background: np.array = None  # rgb in [0, 1] to composite a transparent image over when it is decoded
+    undistort: object = None  # utils.undistort_utils.Undistorter remapping a distorted image when it is decoded
 
 class SceneInfo(NamedTuple):
     point_cloud: BasicPointCloud
@@ -65,7 +71,7 @@ def getNerfppNorm(cam_info):
 
     return {"translate": translate, "radius": radius}
 
-def readColmapCameras(cam_extrinsics, cam_intrinsics, images_folder):
+def readColmapCameras(cam_extrinsics, cam_intrinsics, images_folder, undistort_cache=None):
     cam_infos = []
     for idx, key in enumerate(cam_extrinsics):
         sys.stdout.write('\r')
@@ -77,6 +83,7 @@ def readColmapCameras(cam_extrinsics, cam_intrinsics, images_folder):
         intr = cam_intrinsics[extr.camera_id]
         height = intr.height
         width = intr.width
+        undistort = None
 
         uid = intr.id
         R = np.transpose(qvec2rotmat(extr.qvec))
@@ -91,58 +98,62 @@ def readColmapCameras(cam_extrinsics, cam_intrinsics, images_folder):
             focal_length_y = intr.params[1]
             FovY = focal2fov(focal_length_y, height)
             FovX = focal2fov(focal_length_x, width)
+        elif intr.model in DISTORTED_MODELS:
+            # the pinhole camera image_undistorter would output, images are remapped to it when decoded
+            undistort = undistorter(intr.model, width, height, intr.params, undistort_cache)
+            (width, height), (focal_length_x, focal_length_y, _, _) = undistort.pinhole
+            FovY = focal2fov(focal_length_y, height)
+            FovX = focal2fov(focal_length_x, width)
         else:
-            assert False, "Colmap camera model not handled: only undistorted datasets (PINHOLE or SIMPLE_PINHOLE cameras) supported!"
+            assert False, "Colmap camera model not handled: only PINHOLE, SIMPLE_PINHOLE and (undistorted on load) SIMPLE_RADIAL, RADIAL or OPENCV cameras supported!"
 
         image_path = os.path.join(images_folder, os.path.basename(extr.name))
         image_name = os.path.basename(image_path).split(".")[0]
-        image = Image.open(image_path)
-
-        cam_info = CameraInfo(uid=uid, R=R, T=T, FovY=FovY, FovX=FovX, image=image,
-                              image_path=image_path, image_name=image_name, width=width, height=height)
+        # decoded later, only when the camera needs it (see utils.camera_utils.loadCam)
+        cam_info = CameraInfo(uid=uid, R=R, T=T, FovY=FovY, FovX=FovX, image=None,
+                              image_path=image_path, image_name=image_name, width=width, height=height,
+                              undistort=undistort)
         cam_infos.append(cam_info)
     sys.stdout.write('\n')
     return cam_infos
 
 def fetchPly(path):
-    plydata = PlyData.read(path)
-    vertices = plydata['vertex']
-    positions = np.vstack([vertices['x'], vertices['y'], vertices['z']]).T
-    colors = np.vstack([vertices['red'], vertices['green'], vertices['blue']]).T / 255.0
-    normals = np.vstack([vertices['nx'], vertices['ny'], vertices['nz']]).T
+    try:
+        ply = PlyVertexMap(path)
+    except ValueError:
+        # ascii ply files can not be memory-mapped, read them with plyfile as before
+        plydata = PlyData.read(path)
+        vertices = plydata['vertex']
+        positions = np.vstack([vertices['x'], vertices['y'], vertices['z']]).T
+        colors = np.vstack([vertices['red'], vertices['green'], vertices['blue']]).T / 255.0
+        normals = np.vstack([vertices['nx'], vertices['ny'], vertices['nz']]).T
+        return BasicPointCloud(points=positions, colors=colors, normals=normals)
+    with ply:
+        positions = PlyVertexMap.materialize(ply.xyz)
+        colors = PlyVertexMap.materialize(ply.columns(['red', 'green', 'blue']), dtype=np.float64) / 255.0
+        normals = PlyVertexMap.materialize(ply.columns(['nx', 'ny', 'nz']))
     return BasicPointCloud(points=positions, colors=colors, normals=normals)
 
 def storePly(path, xyz, rgb):
-    # Define the dtype for the structured array
-    dtype = [('x', 'f4'), ('y', 'f4'), ('z', 'f4'),
-            ('nx', 'f4'), ('ny', 'f4'), ('nz', 'f4'),
-            ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')]
-    
-    normals = np.zeros_like(xyz)
-
-    elements = np.empty(xyz.shape[0], dtype=dtype)
-    attributes = np.concatenate((xyz, normals, rgb), axis=1)
-    elements[:] = list(map(tuple, attributes))
-
-    # Create the PlyData object and write to file
-    vertex_element = PlyElement.describe(elements, 'vertex')
-    ply_data = PlyData([vertex_element])
-    ply_data.write(path)
+    write_vertex_ply(path, [(['x', 'y', 'z'], xyz, 'f4'),
+                            (['nx', 'ny', 'nz'], None, 'f4'),
+                            (['red', 'green', 'blue'], rgb, 'u1')])
 
 def readColmapSceneInfo(path, images, eval, llffhold=8):
     try:
         cameras_extrinsic_file = os.path.join(path, "sparse/0", "images.bin")
         cameras_intrinsic_file = os.path.join(path, "sparse/0", "cameras.bin")
-        cam_extrinsics = read_extrinsics_binary(cameras_extrinsic_file)
+        cam_extrinsics = read_extrinsics_binary(cameras_extrinsic_file, skip_points2D=True)
         cam_intrinsics = read_intrinsics_binary(cameras_intrinsic_file)
     except:
         cameras_extrinsic_file = os.path.join(path, "sparse/0", "images.txt")
         cameras_intrinsic_file = os.path.join(path, "sparse/0", "cameras.txt")
-        cam_extrinsics = read_extrinsics_text(cameras_extrinsic_file)
+        cam_extrinsics = read_extrinsics_text(cameras_extrinsic_file, skip_points2D=True)
         cam_intrinsics = read_intrinsics_text(cameras_intrinsic_file)
 
     reading_dir = "images" if images == None else images
-    cam_infos_unsorted = readColmapCameras(cam_extrinsics=cam_extrinsics, cam_intrinsics=cam_intrinsics, images_folder=os.path.join(path, reading_dir))
+    cam_infos_unsorted = readColmapCameras(cam_extrinsics=cam_extrinsics, cam_intrinsics=cam_intrinsics, images_folder=os.path.join(path, reading_dir),
+                                           undistort_cache=os.path.join(path, "cache", UNDISTORT_DIR_NAME))
     cam_infos = sorted(cam_infos_unsorted.copy(), key = lambda x : x.image_name)
 
     if eval:
@@ -176,6 +187,125 @@ def readColmapSceneInfo(path, images, eval, llffhold=8):
                            ply_path=ply_path)
     return scene_info
 
+SCENE_CACHE_VERSION = 2  # bump when readColmapSceneInfo or the cached layout changes
+SCENE_CACHE_NAME = "scene_info.npz"
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def sceneCacheKey(path, images, eval, llffhold=8):
+    """
+    hash of the sparse model and the load parameters: the content of the camera / image files
+    (small) and the mtime and size of the point files (large)
+    """
+    sparse = os.path.join(path, "sparse/0")
+    files = {}
+    for name in ("cameras.bin", "images.bin", "cameras.txt", "images.txt"):
+        file_path = os.path.join(sparse, name)
+        if os.path.exists(file_path):
+            files[name] = _file_digest(file_path)
+    for name in ("points3D.bin", "points3D.txt", "points3D.ply"):
+        file_path = os.path.join(sparse, name)
+        if os.path.exists(file_path):
+            stat = os.stat(file_path)
+            files[name] = [stat.st_mtime_ns, stat.st_size]
+    text = json.dumps({"version": SCENE_CACHE_VERSION, "images": images, "eval": bool(eval), "llffhold": llffhold,
+                       "files": files}, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def saveSceneInfoCache(cache_path, key, scene_info, root):
+    """cameras, normalization and point cloud as arrays of one .npz, paths relative to root"""
+    cam_infos = list(scene_info.train_cameras) + list(scene_info.test_cameras)
+    arrays = {
+        "key": np.array(key),
+        "uid": np.array([c.uid for c in cam_infos], dtype=np.int64),
+        "R": np.array([c.R for c in cam_infos], dtype=np.float64).reshape(-1, 3, 3),
+        "T": np.array([c.T for c in cam_infos], dtype=np.float64).reshape(-1, 3),
+        "FovY": np.array([c.FovY for c in cam_infos], dtype=np.float64),
+        "FovX": np.array([c.FovX for c in cam_infos], dtype=np.float64),
+        "width": np.array([c.width for c in cam_infos], dtype=np.int64),
+        "height": np.array([c.height for c in cam_infos], dtype=np.int64),
+        "image_path": np.array([os.path.relpath(c.image_path, root) for c in cam_infos], dtype=np.str_),
+        "image_name": np.array([c.image_name for c in cam_infos], dtype=np.str_),
+        # distorted source cameras, "" for pinhole ones
+        "camera_model": np.array([c.undistort.model if c.undistort else "" for c in cam_infos], dtype=np.str_),
+        "camera_size": np.array([(c.undistort.width, c.undistort.height) if c.undistort else (0, 0)
+                                 for c in cam_infos], dtype=np.int64).reshape(-1, 2),
+        "camera_params": np.array([(c.undistort.params + (0.0,) * 8)[:8] if c.undistort else (0.0,) * 8
+                                   for c in cam_infos], dtype=np.float64).reshape(-1, 8),
+        "is_test": np.arange(len(cam_infos)) >= len(scene_info.train_cameras),
+        "translate": np.asarray(scene_info.nerf_normalization["translate"], dtype=np.float64),
+        "radius": np.asarray(scene_info.nerf_normalization["radius"], dtype=np.float64),
+        "ply_path": np.array(os.path.relpath(scene_info.ply_path, root)),
+    }
+    if scene_info.point_cloud is not None:
+        arrays["points"] = scene_info.point_cloud.points
+        arrays["colors"] = scene_info.point_cloud.colors
+        arrays["normals"] = scene_info.point_cloud.normals
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, cache_path)
+
+def loadSceneInfoCache(cache_path, key, root):
+    """the cached SceneInfo, None if there is none or it was built from other sources"""
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if str(data["key"]) != key:
+                return None
+            data = dict(data)
+    except (OSError, ValueError, KeyError):
+        return None
+    cam_infos = []
+    undistort_cache = os.path.join(root, "cache", UNDISTORT_DIR_NAME)
+    for i in range(data["uid"].shape[0]):
+        model = str(data["camera_model"][i])
+        undistort = None
+        if model:
+            params = data["camera_params"][i][:CAMERA_MODEL_NAMES[model].num_params]
+            undistort = undistorter(model, int(data["camera_size"][i][0]), int(data["camera_size"][i][1]), params,
+                                    undistort_cache)
+        cam_infos.append(CameraInfo(uid=int(data["uid"][i]), R=data["R"][i], T=data["T"][i],
+                                    FovY=float(data["FovY"][i]), FovX=float(data["FovX"][i]), image=None,
+                                    image_path=os.path.join(root, str(data["image_path"][i])),
+                                    image_name=str(data["image_name"][i]),
+                                    width=int(data["width"][i]), height=int(data["height"][i]),
+                                    undistort=undistort))
+    pcd = None
+    if "points" in data:
+        pcd = BasicPointCloud(points=data["points"], colors=data["colors"], normals=data["normals"])
+    is_test = data["is_test"]
+    return SceneInfo(point_cloud=pcd,
+                     train_cameras=[c for c, test in zip(cam_infos, is_test) if not test],
+                     test_cameras=[c for c, test in zip(cam_infos, is_test) if test],
+                     nerf_normalization={"translate": data["translate"], "radius": data["radius"][()]},
+                     ply_path=os.path.join(root, str(data["ply_path"])))
+
+def readColmapSceneInfoCached(path, images, eval, llffhold=8):
+    """
+    readColmapSceneInfo through <path>/cache/scene_info.npz, rebuilt whenever the sparse model,
+    the point cloud or the parameters change (see sceneCacheKey)
+    """
+    cache_path = os.path.join(path, "cache", SCENE_CACHE_NAME)
+    start = time.perf_counter()
+    scene_info = loadSceneInfoCache(cache_path, sceneCacheKey(path, images, eval, llffhold), path)
+    if scene_info is not None:
+        print(f"Loaded scene info from {cache_path} in {time.perf_counter() - start:.2f}s")
+        return scene_info
+    scene_info = readColmapSceneInfo(path, images, eval, llffhold)
+    elapsed = time.perf_counter() - start
+    try:
+        # the key is taken after reading, which may have created points3D.ply
+        saveSceneInfoCache(cache_path, sceneCacheKey(path, images, eval, llffhold), scene_info, path)
+        print(f"Read scene info in {elapsed:.2f}s, cached to {cache_path}")
+    except OSError as e:
+        print(f"[Warning] scene info not cached: {e}")
+    return scene_info
+
 def readCamerasFromTransforms(path, transformsfile, white_background, extension=".png"):
     cam_infos = []
 
@@ -184,6 +314,9 @@ def readCamerasFromTransforms(path, transformsfile, white_background, extension=
         fovx = contents["camera_angle_x"]
 
         frames = contents["frames"]
+        # only the headers, the images are decoded (and composited over bg) when the camera needs them
+        image_infos = probe_images([os.path.join(path, frame["file_path"] + extension) for frame in frames])
+        bg = np.array([1,1,1]) if white_background else np.array([0, 0, 0])
         for idx, frame in enumerate(frames):
             cam_name = os.path.join(path, frame["file_path"] + extension)
 
@@ -199,22 +332,14 @@ def readCamerasFromTransforms(path, transformsfile, white_background, extension=
 
             image_path = os.path.join(path, cam_name)
             image_name = Path(cam_name).stem
-            image = Image.open(image_path)
-
-            im_data = np.array(image.convert("RGBA"))
-
-            bg = np.array([1,1,1]) if white_background else np.array([0, 0, 0])
-
-            norm_data = im_data / 255.0
-            arr = norm_data[:,:,:3] * norm_data[:, :, 3:4] + bg * (1 - norm_data[:, :, 3:4])
-            image = Image.fromarray(np.array(arr*255.0, dtype=np.byte), "RGB")
+            width, height = image_infos[idx].width, image_infos[idx].height
 
-            fovy = focal2fov(fov2focal(fovx, image.size[0]), image.size[1])
+            fovy = focal2fov(fov2focal(fovx, width), height)
             FovY = fovy 
             FovX = fovx
 
-            cam_infos.append(CameraInfo(uid=idx, R=R, T=T, FovY=FovY, FovX=FovX, image=image,
-                            image_path=image_path, image_name=image_name, width=image.size[0], height=image.size[1]))
+            cam_infos.append(CameraInfo(uid=idx, R=R, T=T, FovY=FovY, FovX=FovX, image=None,
+                            image_path=image_path, image_name=image_name, width=width, height=height, background=bg))
             
     return cam_infos
 
@@ -255,6 +380,6 @@ def readNerfSyntheticInfo(path, white_background, eval, extension=".png"):
     return scene_info
 
 sceneLoadTypeCallbacks = {
-    "Colmap": readColmapSceneInfo,
+    "Colmap": readColmapSceneInfoCached,
     "Blender" : readNerfSyntheticInfo
 }
\ No newline at end of file
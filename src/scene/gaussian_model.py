@@ -9,22 +9,44 @@
 # For inquiries contact  george.drettakis@inria.fr
 #
 
+import copy
 import os
 
 import numpy as np
 import torch
-from plyfile import PlyData, PlyElement
-from simple_knn._C import distCUDA2
 from torch import nn
 
+try:
+    from simple_knn._C import distCUDA2
+except ImportError:
+    distCUDA2 = None  # cpu only environment, see _dist2_nearest
+
+from utils.container_utils import write_container, GaussianContainer, sh_band_range
+from utils.container_utils import DEFAULT_CHUNK_SIZE as CONTAINER_CHUNK_SIZE
 from utils.general_utils import inverse_sigmoid, get_expon_lr_func, build_rotation
 from utils.general_utils import strip_symmetric, build_scaling_rotation
 from utils.graphics_utils import BasicPointCloud
+from utils.ply_utils import write_vertex_ply, PlyVertexMap
+from utils.pool_utils import TensorPool, AdamPool
 from utils.sh_utils import RGB2SH
+from utils.spatial_utils import morton_order
 from utils.system_utils import mkdir_p
 
 
+def _dist2_nearest(points: torch.Tensor) -> torch.Tensor:
+    """mean squared distance to the 3 nearest neighbours, same as simple_knn.distCUDA2"""
+    if points.is_cuda and distCUDA2 is not None:
+        return distCUDA2(points)
+    from scipy.spatial import cKDTree
+    xyz = points.detach().cpu().numpy()
+    dist, _ = cKDTree(xyz).query(xyz, k=4)  # the first neighbour is the point itself
+    return torch.from_numpy((dist[:, 1:] ** 2).mean(axis=1)).float().to(points.device)
+
+
 class GaussianModel:
+    # per gaussian tensors, see snapshot
+    TENSOR_NAMES = ("_xyz", "_features_dc", "_features_rest", "_scaling", "_rotation", "_opacity",
+                    "max_radii2D", "xyz_gradient_accum", "denom")
 
     def setup_functions(self):
         def build_covariance_from_scaling_rotation(scaling, scaling_modifier, rotation):
@@ -43,36 +65,75 @@ class GaussianModel:
 
         self.rotation_activation = torch.nn.functional.normalize
 
-    def __init__(self, sh_degree: int):
+    def __init__(self, sh_degree: int, device="cuda"):
+        self.device = torch.device(device)
         self.active_sh_degree = 0
         self.max_sh_degree = sh_degree
-        self._xyz = torch.empty(0, device='cuda')  # [n, 3]
-        self._features_dc = torch.empty(0, device='cuda')  # [n, 1, 3]
-        self._features_rest = torch.empty(0, device='cuda')  # [n, 15, 3]
-        self._scaling = torch.empty(0, device='cuda')  # [n, 3]
-        self._rotation = torch.empty(0, device='cuda')  # [n, 4]
-        self._opacity = torch.empty(0, device='cuda')  # [n, 1]
-        self.max_radii2D = torch.empty(0, device='cuda')  # [n, ]
-        self.xyz_gradient_accum = torch.empty(0, device='cuda') # 0
-        self.denom = torch.empty(0, device='cuda') # 0
+        self._xyz = torch.empty(0, device=self.device)  # [n, 3]
+        self._features_dc = torch.empty(0, device=self.device)  # [n, 1, 3]
+        self._features_rest = torch.empty(0, device=self.device)  # [n, 15, 3]
+        self._scaling = torch.empty(0, device=self.device)  # [n, 3]
+        self._rotation = torch.empty(0, device=self.device)  # [n, 4]
+        self._opacity = torch.empty(0, device=self.device)  # [n, 1]
+        self.max_radii2D = torch.empty(0, device=self.device)  # [n, ]
+        self.xyz_gradient_accum = torch.empty(0, device=self.device) # 0
+        self.denom = torch.empty(0, device=self.device) # 0
         self.optimizer = None
+        self.pool = None  # AdamPool when training with pooled densification, see utils.pool_utils
+        self.stat_pools = {}  # name -> TensorPool for xyz_gradient_accum, denom, max_radii2D
+        self.max_gaussians = None  # densification budget, None for unlimited
+        self.morton_order = False  # keep the gaussians in Z-order after load and densification, save in Z-order
         self.percent_dense = 0
         self.spatial_lr_scale = 0
         self.setup_functions()
 
+    def snapshot(self):
+        """
+        shallow copy sharing every tensor with this model (O(1), nothing is copied).
+        Neither side may modify a shared tensor in place, clone it first (see GaussianManager._writable)
+        """
+        return copy.copy(self)
+
+    def tensor_nbytes(self, names=None):
+        """bytes of the per gaussian tensors, views of the same storage are counted once"""
+        storages = {}
+        for name in self.TENSOR_NAMES if names is None else names:
+            storage = getattr(self, name).untyped_storage()
+            storages[storage.data_ptr()] = storage.nbytes()
+        return sum(storages.values())
+
+    def to(self, device):
+        """move all tensors to device, the optimizer (if any) must be set up again afterwards"""
+        self.device = torch.device(device)
+        for name in ("_xyz", "_features_dc", "_features_rest", "_scaling", "_rotation", "_opacity"):
+            tensor = getattr(self, name)
+            moved = tensor.detach().to(self.device)
+            setattr(self, name, nn.Parameter(moved.requires_grad_(True)) if isinstance(tensor, nn.Parameter) else moved)
+        self.max_radii2D = self.max_radii2D.to(self.device)
+        self.xyz_gradient_accum = self.xyz_gradient_accum.to(self.device)
+        self.denom = self.denom.to(self.device)
+        return self
+
     def capture(self):
+        if self.pool is not None:
+            # pooled tensors are views, saving them as is would also save the spare rows
+            def compact(tensor):
+                return nn.Parameter(tensor.detach().clone()) if isinstance(tensor, nn.Parameter) else tensor.clone()
+        else:
+            def compact(tensor):
+                return tensor
         return (
             self.active_sh_degree,
-            self._xyz,
-            self._features_dc,
-            self._features_rest,
-            self._scaling,
-            self._rotation,
-            self._opacity,
-            self.max_radii2D,
-            self.xyz_gradient_accum,
-            self.denom,
-            self.optimizer.state_dict(),
+            compact(self._xyz),
+            compact(self._features_dc),
+            compact(self._features_rest),
+            compact(self._scaling),
+            compact(self._rotation),
+            compact(self._opacity),
+            compact(self.max_radii2D),
+            compact(self.xyz_gradient_accum),
+            compact(self.denom),
+            self.optimizer.state_dict() if self.pool is None else self.pool.state_dict(),
             self.spatial_lr_scale,
         )
 
@@ -135,20 +196,20 @@ class GaussianModel:
 
     def create_from_pcd(self, pcd: BasicPointCloud, spatial_lr_scale: float):
         self.spatial_lr_scale = spatial_lr_scale
-        fused_point_cloud = torch.tensor(np.asarray(pcd.points)).float().cuda()
-        fused_color = RGB2SH(torch.tensor(np.asarray(pcd.colors)).float().cuda())
-        features = torch.zeros((fused_color.shape[0], 3, (self.max_sh_degree + 1) ** 2)).float().cuda()
+        fused_point_cloud = torch.tensor(np.asarray(pcd.points)).float().to(self.device)
+        fused_color = RGB2SH(torch.tensor(np.asarray(pcd.colors)).float().to(self.device))
+        features = torch.zeros((fused_color.shape[0], 3, (self.max_sh_degree + 1) ** 2)).float().to(self.device)
         features[:, :3, 0] = fused_color
         features[:, 3:, 1:] = 0.0
 
         print("Number of points at initialisation : ", fused_point_cloud.shape[0])
 
-        dist2 = torch.clamp_min(distCUDA2(torch.from_numpy(np.asarray(pcd.points)).float().cuda()), 0.0000001)
+        dist2 = torch.clamp_min(_dist2_nearest(fused_point_cloud), 0.0000001)
         scales = torch.log(torch.sqrt(dist2))[..., None].repeat(1, 3)
-        rots = torch.zeros((fused_point_cloud.shape[0], 4), device="cuda")
+        rots = torch.zeros((fused_point_cloud.shape[0], 4), device=self.device)
         rots[:, 0] = 1
 
-        opacities = inverse_sigmoid(0.1 * torch.ones((fused_point_cloud.shape[0], 1), dtype=torch.float, device="cuda"))
+        opacities = inverse_sigmoid(0.1 * torch.ones((fused_point_cloud.shape[0], 1), dtype=torch.float, device=self.device))
 
         self._xyz = nn.Parameter(fused_point_cloud.requires_grad_(True))
         self._features_dc = nn.Parameter(features[:, :, 0:1].transpose(1, 2).contiguous().requires_grad_(True))
@@ -156,12 +217,12 @@ class GaussianModel:
         self._scaling = nn.Parameter(scales.requires_grad_(True))
         self._rotation = nn.Parameter(rots.requires_grad_(True))
         self._opacity = nn.Parameter(opacities.requires_grad_(True))
-        self.max_radii2D = torch.zeros((self.get_xyz.shape[0]), device="cuda")
+        self.max_radii2D = torch.zeros((self.get_xyz.shape[0]), device=self.device)
 
     def training_setup(self, training_args):
         self.percent_dense = training_args.percent_dense
-        self.xyz_gradient_accum = torch.zeros((self.get_xyz.shape[0], 1), device="cuda")
-        self.denom = torch.zeros((self.get_xyz.shape[0], 1), device="cuda")
+        self.xyz_gradient_accum = torch.zeros((self.get_xyz.shape[0], 1), device=self.device)
+        self.denom = torch.zeros((self.get_xyz.shape[0], 1), device=self.device)
 
         l = [
             {'params': [self._xyz], 'lr': training_args.position_lr_init * self.spatial_lr_scale, "name": "xyz"},
@@ -173,11 +234,33 @@ class GaussianModel:
         ]
 
         self.optimizer = torch.optim.Adam(l, lr=0.0, eps=1e-15)
+        # pooled densification: parameters and adam moments live in over-allocated buffers
+        self.pool = AdamPool(self.optimizer) if getattr(training_args, "pooled_densification", False) else None
+        self.stat_pools = {}
+        self.max_gaussians = self.gaussian_budget(getattr(training_args, "max_gaussians", 0),
+                                                  getattr(training_args, "max_gaussian_mb", 0.0))
+        self.morton_order = self.morton_order or getattr(training_args, "morton_order", False)
         self.xyz_scheduler_args = get_expon_lr_func(lr_init=training_args.position_lr_init * self.spatial_lr_scale,
                                                     lr_final=training_args.position_lr_final * self.spatial_lr_scale,
                                                     lr_delay_mult=training_args.position_lr_delay_mult,
                                                     max_steps=training_args.position_lr_max_steps)
 
+    def bytes_per_gaussian(self, training=True):
+        """float32 bytes of one gaussian, while training with its gradient, both adam moments and the densification stats"""
+        num_floats = 3 + 3 * (self.max_sh_degree + 1) ** 2 + 1 + 3 + 4
+        if training:
+            num_floats = num_floats * 4 + 3
+        return num_floats * 4
+
+    def gaussian_budget(self, max_gaussians=0, max_gaussian_mb=0.0):
+        """the tighter of a hard gaussian count and a training memory budget in MB, None if both are 0"""
+        budgets = []
+        if max_gaussians > 0:
+            budgets.append(int(max_gaussians))
+        if max_gaussian_mb > 0:
+            budgets.append(int(max_gaussian_mb * 2 ** 20 // self.bytes_per_gaussian()))
+        return min(budgets) if budgets else None
+
     def update_learning_rate(self, iteration):
         ''' Learning rate scheduling per step '''
         for param_group in self.optimizer.param_groups:
@@ -200,80 +283,129 @@ class GaussianModel:
             l.append('rot_{}'.format(i))
         return l
 
+    def _save_order(self):
+        """
+        rows of a save, Z-ordered if morton_order. The model itself is not reordered: a save can fall
+        between backward and optimizer.step, where the grads, radii and stats are in the current order
+        """
+        return morton_order(self.get_xyz) if self.morton_order else slice(None)
+
     def save_ply(self, path):
         mkdir_p(os.path.dirname(path))
-
-        xyz = self._xyz.detach().cpu().numpy()
-        normals = np.zeros_like(xyz)
-        f_dc = self._features_dc.detach().transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
-        f_rest = self._features_rest.detach().transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
-        opacities = self._opacity.detach().cpu().numpy()
-        scale = self._scaling.detach().cpu().numpy()
-        rotation = self._rotation.detach().cpu().numpy()
-
-        dtype_full = [(attribute, 'f4') for attribute in self.construct_list_of_attributes()]
-
-        elements = np.empty(xyz.shape[0], dtype=dtype_full)
-        attributes = np.concatenate((xyz, normals, f_dc, f_rest, opacities, scale, rotation), axis=1)
-        elements[:] = list(map(tuple, attributes))
-        el = PlyElement.describe(elements, 'vertex')
-        PlyData([el]).write(path)
+        order = self._save_order()
+
+        xyz = self._xyz.detach()[order].cpu().numpy()
+        f_dc = self._features_dc.detach()[order].transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
+        f_rest = self._features_rest.detach()[order].transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
+        opacities = self._opacity.detach()[order].cpu().numpy()
+        scale = self._scaling.detach()[order].cpu().numpy()
+        rotation = self._rotation.detach()[order].cpu().numpy()
+
+        names = self.construct_list_of_attributes()
+        columns = []
+        offset = 0
+        for array in (xyz, None, f_dc, f_rest, opacities, scale, rotation):
+            width = 3 if array is None else array.shape[1]  # None: zero normals
+            columns.append((names[offset:offset + width], array, 'f4'))
+            offset += width
+        write_vertex_ply(path, columns)
+
+    def save_container(self, path, encodings=None, chunk_size=CONTAINER_CHUNK_SIZE):
+        """save to the compact chunked container, see utils.container_utils"""
+        mkdir_p(os.path.dirname(path))
+        order = self._save_order()  # spatially tight chunk bounds
+
+        f_rest = self._features_rest.detach()[order].cpu().numpy()  # [n, SH - 1, 3]
+        arrays = {
+            "xyz": self._xyz.detach()[order].cpu().numpy(),
+            "opacity": self._opacity.detach()[order].cpu().numpy(),
+            "scale": self._scaling.detach()[order].cpu().numpy(),
+            "rotation": self._rotation.detach()[order].cpu().numpy(),
+            "sh0": self._features_dc.detach()[order].cpu().numpy(),
+        }
+        for band in range(1, self.max_sh_degree + 1):
+            start, end = sh_band_range(band)
+            arrays[f"sh{band}"] = f_rest[:, start:end, :]
+        write_container(path, arrays, self.max_sh_degree, encodings=encodings, chunk_size=chunk_size)
+
+    def load_container(self, path, chunks=None, sh_degree=None, bbox=None):
+        """
+        load from the compact chunked container
+        :param chunks: indices of the chunks to load, None for all
+        :param sh_degree: only decode SH bands up to this degree, None for max_sh_degree
+        :param bbox: (min, max), only load the chunks whose bounds intersect it (whole chunks are loaded)
+        """
+        with GaussianContainer(path) as container:
+            if bbox is not None:
+                in_box = container.chunks_in_box(*bbox)
+                chunks = in_box if chunks is None else [i for i in chunks if i in in_box]
+            degree = min(self.max_sh_degree if sh_degree is None else sh_degree, container.sh_degree)
+            arrays = container.read(chunks=chunks, sh_degree=degree)
+
+        def to_param(array, shape=None):
+            tensor = torch.from_numpy(array if shape is None else array.reshape(shape))
+            return nn.Parameter(tensor.to(self.device).requires_grad_(True))
+
+        n = arrays["xyz"].shape[0]
+        self._xyz = to_param(arrays["xyz"])
+        self._opacity = to_param(arrays["opacity"])
+        self._scaling = to_param(arrays["scale"])
+        self._rotation = to_param(arrays["rotation"])
+        self._features_dc = to_param(arrays["sh0"], (n, 1, 3))
+        f_rest = [arrays[f"sh{band}"].reshape(n, -1, 3) for band in range(1, degree + 1)]
+        self._features_rest = to_param(np.concatenate(f_rest, axis=1) if f_rest else np.zeros((n, 0, 3), np.float32))
+
+        self.max_sh_degree = degree
+        self.active_sh_degree = degree
+        self.max_radii2D = torch.zeros((self.get_xyz.shape[0]), device=self.device)
+        if self.morton_order:
+            self.reorder_morton()
 
     def reset_opacity(self):
         opacities_new = inverse_sigmoid(torch.min(self.get_opacity, torch.ones_like(self.get_opacity) * 0.01))
         optimizable_tensors = self.replace_tensor_to_optimizer(opacities_new, "opacity")
         self._opacity = optimizable_tensors["opacity"]
 
-    def load_ply(self, path):
-        plydata = PlyData.read(path)
-
-        xyz = np.stack((np.asarray(plydata.elements[0]["x"]),
-                        np.asarray(plydata.elements[0]["y"]),
-                        np.asarray(plydata.elements[0]["z"])), axis=1)
-        opacities = np.asarray(plydata.elements[0]["opacity"])[..., np.newaxis]
-
-        features_dc = np.zeros((xyz.shape[0], 3, 1))
-        features_dc[:, 0, 0] = np.asarray(plydata.elements[0]["f_dc_0"])
-        features_dc[:, 1, 0] = np.asarray(plydata.elements[0]["f_dc_1"])
-        features_dc[:, 2, 0] = np.asarray(plydata.elements[0]["f_dc_2"])
-
-        extra_f_names = [p.name for p in plydata.elements[0].properties if p.name.startswith("f_rest_")]
-        extra_f_names = sorted(extra_f_names, key=lambda x: int(x.split('_')[-1]))
-        assert len(extra_f_names) == 3 * (self.max_sh_degree + 1) ** 2 - 3
-        features_extra = np.zeros((xyz.shape[0], len(extra_f_names)))
-        for idx, attr_name in enumerate(extra_f_names):
-            features_extra[:, idx] = np.asarray(plydata.elements[0][attr_name])
-        # Reshape (P,F*SH_coeffs) to (P, F, SH_coeffs except DC)
-        features_extra = features_extra.reshape((features_extra.shape[0], 3, (self.max_sh_degree + 1) ** 2 - 1))
-
-        scale_names = [p.name for p in plydata.elements[0].properties if p.name.startswith("scale_")]
-        scale_names = sorted(scale_names, key=lambda x: int(x.split('_')[-1]))
-        scales = np.zeros((xyz.shape[0], len(scale_names)))
-        for idx, attr_name in enumerate(scale_names):
-            scales[:, idx] = np.asarray(plydata.elements[0][attr_name])
-
-        rot_names = [p.name for p in plydata.elements[0].properties if p.name.startswith("rot")]
-        rot_names = sorted(rot_names, key=lambda x: int(x.split('_')[-1]))
-        rots = np.zeros((xyz.shape[0], len(rot_names)))
-        for idx, attr_name in enumerate(rot_names):
-            rots[:, idx] = np.asarray(plydata.elements[0][attr_name])
-
-        self._xyz = nn.Parameter(torch.tensor(xyz, dtype=torch.float, device="cuda").requires_grad_(True))
-        self._features_dc = nn.Parameter(
-            torch.tensor(features_dc, dtype=torch.float, device="cuda").transpose(1, 2).contiguous().requires_grad_(
-                True))
-        self._features_rest = nn.Parameter(
-            torch.tensor(features_extra, dtype=torch.float, device="cuda").transpose(1, 2).contiguous().requires_grad_(
-                True))
-        self._opacity = nn.Parameter(torch.tensor(opacities, dtype=torch.float, device="cuda").requires_grad_(True))
-        self._scaling = nn.Parameter(torch.tensor(scales, dtype=torch.float, device="cuda").requires_grad_(True))
-        self._rotation = nn.Parameter(torch.tensor(rots, dtype=torch.float, device="cuda").requires_grad_(True))
-
-        self.active_sh_degree = self.max_sh_degree
-
-        self.max_radii2D = torch.zeros((self.get_xyz.shape[0]), device="cuda")  # 新增了这一行
+    def load_ply(self, path, sh_degree=None):
+        """
+        :param sh_degree: only keep SH bands up to this degree, higher bands are dropped before
+                          anything is allocated. None keeps max_sh_degree
+        """
+        with PlyVertexMap(path) as ply:
+            num_rest = len(ply.names_with_prefix("f_rest_"))
+            if sh_degree is None:
+                assert num_rest == 3 * (self.max_sh_degree + 1) ** 2 - 3
+                degree = self.max_sh_degree
+            else:
+                file_degree = round((num_rest / 3 + 1) ** 0.5) - 1
+                assert num_rest == 3 * (file_degree + 1) ** 2 - 3
+                degree = min(sh_degree, file_degree)
+            num_coeffs = (degree + 1) ** 2 - 1
+
+            def to_param(view):
+                array = PlyVertexMap.materialize(view)
+                return nn.Parameter(torch.from_numpy(array).to(self.device).requires_grad_(True))
+
+            n = ply.count
+            # (P, F*SH_coeffs) is stored channel major, [P, F, SH] -> [P, SH, F]
+            self._xyz = to_param(ply.xyz)
+            self._features_dc = to_param(ply.f_dc.reshape(n, 3, 1).transpose(0, 2, 1))
+            self._features_rest = to_param(
+                ply.f_rest.reshape(n, 3, num_rest // 3)[:, :, :num_coeffs].transpose(0, 2, 1))
+            self._opacity = to_param(ply.opacity)
+            self._scaling = to_param(ply.scale)
+            self._rotation = to_param(ply.rot)
+
+        self.max_sh_degree = degree
+        self.active_sh_degree = degree
+
+        self.max_radii2D = torch.zeros((self.get_xyz.shape[0]), device=self.device)  # 新增了这一行
+        if self.morton_order:
+            self.reorder_morton()
 
     def replace_tensor_to_optimizer(self, tensor, name):
+        if self.pool is not None:
+            return self.pool.replace(tensor, name)
         optimizable_tensors = {}
         for group in self.optimizer.param_groups:
             if group["name"] == name:
@@ -289,6 +421,8 @@ class GaussianModel:
         return optimizable_tensors
 
     def _prune_optimizer(self, mask):
+        if self.pool is not None:
+            return self.pool.compact(mask.nonzero(as_tuple=True)[0])
         optimizable_tensors = {}
         for group in self.optimizer.param_groups:
             stored_state = self.optimizer.state.get(group['params'][0], None)
@@ -306,8 +440,34 @@ class GaussianModel:
                 optimizable_tensors[group["name"]] = group["params"][0]
         return optimizable_tensors
 
+    def _stat_pool(self, name):
+        """pool of a densification stat, adopts the tensor again if it was replaced (training_setup, restore)"""
+        tensor = getattr(self, name)
+        pool = self.stat_pools.get(name)
+        if pool is None or not pool.owns(tensor):
+            capacity = self.pool.params["xyz"].capacity if "xyz" in self.pool.params else 0
+            pool = self.stat_pools[name] = TensorPool(tensor, capacity)
+        return pool
+
+    def _prune_points_pooled(self, valid_points_mask):
+        index = valid_points_mask.nonzero(as_tuple=True)[0]
+        optimizable_tensors = self.pool.compact(index)
+
+        self._xyz = optimizable_tensors["xyz"]
+        self._features_dc = optimizable_tensors["f_dc"]
+        self._features_rest = optimizable_tensors["f_rest"]
+        self._opacity = optimizable_tensors["opacity"]
+        self._scaling = optimizable_tensors["scaling"]
+        self._rotation = optimizable_tensors["rotation"]
+
+        for name in ("xyz_gradient_accum", "denom", "max_radii2D"):
+            setattr(self, name, self._stat_pool(name).compact(index))
+
     def prune_points(self, mask):
         valid_points_mask = ~mask
+        if self.pool is not None:
+            self._prune_points_pooled(valid_points_mask)
+            return
         optimizable_tensors = self._prune_optimizer(valid_points_mask)
 
         self._xyz = optimizable_tensors["xyz"]
@@ -322,7 +482,38 @@ class GaussianModel:
         self.denom = self.denom[valid_points_mask]
         self.max_radii2D = self.max_radii2D[valid_points_mask]
 
+    def reorder_points(self, index):
+        """permute the gaussians, their optimizer state and densification stats by index ([n, ] int64)"""
+        n = self.get_xyz.shape[0]
+        names = {"xyz": "_xyz", "f_dc": "_features_dc", "f_rest": "_features_rest",
+                 "opacity": "_opacity", "scaling": "_scaling", "rotation": "_rotation"}
+        if self.pool is not None:
+            optimizable_tensors = self.pool.permute(index)
+        elif self.optimizer is not None:
+            optimizable_tensors = self._prune_optimizer(index)  # indexing works the same with a permutation
+        else:
+            optimizable_tensors = {}
+            for group, name in names.items():
+                tensor = getattr(self, name)
+                moved = tensor.detach()[index]
+                optimizable_tensors[group] = nn.Parameter(moved.requires_grad_(True)) \
+                    if isinstance(tensor, nn.Parameter) else moved
+        for group, name in names.items():
+            setattr(self, name, optimizable_tensors[group])
+
+        for name in ("xyz_gradient_accum", "denom", "max_radii2D"):
+            tensor = getattr(self, name)
+            if tensor.shape[0] != n:
+                continue  # not set up for training
+            setattr(self, name, self._stat_pool(name).permute(index) if self.pool is not None else tensor[index])
+
+    def reorder_morton(self):
+        """sort the gaussians along the Z-order curve of their centers, see utils.spatial_utils"""
+        self.reorder_points(morton_order(self.get_xyz))
+
     def cat_tensors_to_optimizer(self, tensors_dict):
+        if self.pool is not None:
+            return self.pool.append(tensors_dict)
         optimizable_tensors = {}
         for group in self.optimizer.param_groups:
             assert len(group["params"]) == 1
@@ -365,22 +556,45 @@ class GaussianModel:
         self._scaling = optimizable_tensors["scaling"]
         self._rotation = optimizable_tensors["rotation"]
 
-        self.xyz_gradient_accum = torch.zeros((self.get_xyz.shape[0], 1), device="cuda")
-        self.denom = torch.zeros((self.get_xyz.shape[0], 1), device="cuda")
-        self.max_radii2D = torch.zeros((self.get_xyz.shape[0]), device="cuda")
+        if self.pool is not None:
+            n = self.get_xyz.shape[0]
+            for name in ("xyz_gradient_accum", "denom", "max_radii2D"):
+                setattr(self, name, self._stat_pool(name).resize(n).zero_())
+            return
 
-    def densify_and_split(self, grads, grad_threshold, scene_extent, N=2):
+        self.xyz_gradient_accum = torch.zeros((self.get_xyz.shape[0], 1), device=self.device)
+        self.denom = torch.zeros((self.get_xyz.shape[0], 1), device=self.device)
+        self.max_radii2D = torch.zeros((self.get_xyz.shape[0]), device=self.device)
+
+    def _split_mask(self, grads, grad_threshold, scene_extent):
         n_init_points = self.get_xyz.shape[0]
         # Extract points that satisfy the gradient condition
-        padded_grad = torch.zeros((n_init_points), device="cuda")
+        padded_grad = torch.zeros((n_init_points), device=self.device)
         padded_grad[:grads.shape[0]] = grads.squeeze()
         selected_pts_mask = torch.where(padded_grad >= grad_threshold, True, False)
         selected_pts_mask = torch.logical_and(selected_pts_mask,
                                               torch.max(self.get_scaling,
                                                         dim=1).values > self.percent_dense * scene_extent)
+        return selected_pts_mask
+
+    def _clone_mask(self, grads, grad_threshold, scene_extent):
+        # Extract points that satisfy the gradient condition
+        selected_pts_mask = torch.where(torch.norm(grads, dim=-1) >= grad_threshold, True, False)
+        selected_pts_mask = torch.logical_and(selected_pts_mask,
+                                              torch.max(self.get_scaling,
+                                                        dim=1).values <= self.percent_dense * scene_extent)
+        return selected_pts_mask
+
+    def densify_and_split(self, grads, grad_threshold, scene_extent, N=2, selected_pts_mask=None):
+        """:param selected_pts_mask: precomputed candidates (see _budget_masks), padded for points added since"""
+        if selected_pts_mask is None:
+            selected_pts_mask = self._split_mask(grads, grad_threshold, scene_extent)
+        elif selected_pts_mask.shape[0] < self.get_xyz.shape[0]:
+            padding = torch.zeros(self.get_xyz.shape[0] - selected_pts_mask.shape[0], device=self.device, dtype=bool)
+            selected_pts_mask = torch.cat((selected_pts_mask, padding))
 
         stds = self.get_scaling[selected_pts_mask].repeat(N, 1)
-        means = torch.zeros((stds.size(0), 3), device="cuda")
+        means = torch.zeros((stds.size(0), 3), device=self.device)
         samples = torch.normal(mean=means, std=stds)
         rots = build_rotation(self._rotation[selected_pts_mask]).repeat(N, 1, 1)
         new_xyz = torch.bmm(rots, samples.unsqueeze(-1)).squeeze(-1) + self.get_xyz[selected_pts_mask].repeat(N, 1)
@@ -393,15 +607,12 @@ class GaussianModel:
         self.densification_postfix(new_xyz, new_features_dc, new_features_rest, new_opacity, new_scaling, new_rotation)
 
         prune_filter = torch.cat(
-            (selected_pts_mask, torch.zeros(N * selected_pts_mask.sum(), device="cuda", dtype=bool)))
+            (selected_pts_mask, torch.zeros(N * selected_pts_mask.sum(), device=self.device, dtype=bool)))
         self.prune_points(prune_filter)
 
-    def densify_and_clone(self, grads, grad_threshold, scene_extent):
-        # Extract points that satisfy the gradient condition
-        selected_pts_mask = torch.where(torch.norm(grads, dim=-1) >= grad_threshold, True, False)
-        selected_pts_mask = torch.logical_and(selected_pts_mask,
-                                              torch.max(self.get_scaling,
-                                                        dim=1).values <= self.percent_dense * scene_extent)
+    def densify_and_clone(self, grads, grad_threshold, scene_extent, selected_pts_mask=None):
+        if selected_pts_mask is None:
+            selected_pts_mask = self._clone_mask(grads, grad_threshold, scene_extent)
 
         new_xyz = self._xyz[selected_pts_mask]
         new_features_dc = self._features_dc[selected_pts_mask]
@@ -413,21 +624,71 @@ class GaussianModel:
         self.densification_postfix(new_xyz, new_features_dc, new_features_rest, new_opacities, new_scaling,
                                    new_rotation)
 
+    def _budget_masks(self, grads, clone_mask, split_mask, room):
+        """keep the `room` candidates with the highest gradient, clone and split compete for the same room"""
+        candidates = torch.logical_or(clone_mask, split_mask)
+        if candidates.sum().item() <= room:
+            return clone_mask, split_mask
+        keep = torch.zeros_like(candidates)
+        if room > 0:
+            priority = torch.where(candidates, grads.squeeze(-1), torch.full_like(grads.squeeze(-1), -1.0))
+            keep[torch.topk(priority, room).indices] = True
+        return torch.logical_and(clone_mask, keep), torch.logical_and(split_mask, keep)
+
     def densify_and_prune(self, max_grad, min_opacity, extent, max_screen_size):
+        """
+        with a budget (max_gaussians) only the highest gradient candidates are densified and,
+        should the count still exceed it, the lowest opacity points are pruned first.
+        :return: per step counts and memory, for logging
+        """
         grads = self.xyz_gradient_accum / self.denom
         grads[grads.isnan()] = 0.0
-
-        self.densify_and_clone(grads, max_grad, extent)
-        self.densify_and_split(grads, max_grad, extent)
+        num_before = self.get_xyz.shape[0]
+
+        clone_mask = self._clone_mask(grads, max_grad, extent)
+        split_mask = self._split_mask(grads, max_grad, extent)
+        num_candidates = torch.logical_or(clone_mask, split_mask).sum().item()
+        if self.max_gaussians is not None:
+            # clone adds one point, split (N=2) adds two and removes the original
+            clone_mask, split_mask = self._budget_masks(grads, clone_mask, split_mask,
+                                                        self.max_gaussians - num_before)
+        num_cloned = clone_mask.sum().item()
+        num_split = split_mask.sum().item()
+        self.densify_and_clone(grads, max_grad, extent, selected_pts_mask=clone_mask)
+        self.densify_and_split(grads, max_grad, extent, selected_pts_mask=split_mask)
 
         prune_mask = (self.get_opacity < min_opacity).squeeze()
         if max_screen_size:
             big_points_vs = self.max_radii2D > max_screen_size
             big_points_ws = self.get_scaling.max(dim=1).values > 0.1 * extent
             prune_mask = torch.logical_or(torch.logical_or(prune_mask, big_points_vs), big_points_ws)
+        if self.max_gaussians is not None:
+            excess = self.get_xyz.shape[0] - prune_mask.sum().item() - self.max_gaussians
+            if excess > 0:
+                # lowest contribution first: the opacity of the points that survive the regular pruning
+                opacity = torch.where(prune_mask, torch.full_like(prune_mask, 2.0, dtype=torch.float),
+                                      self.get_opacity.squeeze(-1))
+                prune_mask[torch.topk(opacity, excess, largest=False).indices] = True
+        num_pruned = prune_mask.sum().item()
         self.prune_points(prune_mask)
 
-        torch.cuda.empty_cache()
+        if self.device.type == "cuda" and self.pool is None:
+            torch.cuda.empty_cache()  # the pooled buffers are reused instead
+        if self.morton_order:
+            self.reorder_morton()
+
+        num_after = self.get_xyz.shape[0]
+        return {
+            "before": num_before,
+            "candidates": num_candidates,
+            "cloned": num_cloned,
+            "split": num_split,
+            "pruned": num_pruned,
+            "after": num_after,
+            "budget": self.max_gaussians,
+            "gaussian_mb": num_after * self.bytes_per_gaussian() / 2 ** 20,
+            "allocated_mb": torch.cuda.memory_allocated(self.device) / 2 ** 20 if self.device.type == "cuda" else None,
+        }
 
     def add_densification_stats(self, viewspace_point_tensor, update_filter):
         self.xyz_gradient_accum[update_filter] += torch.norm(viewspace_point_tensor.grad[update_filter, :2], dim=-1,
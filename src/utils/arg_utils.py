@@ -17,6 +17,11 @@ def parse_args(args):
     dataset.white_background = args.white_background
     dataset.data_device = args.data_device
     dataset.eval = args.eval
+    dataset.eager_images = getattr(args, "eager_images", False)
+    dataset.image_cache_mb = getattr(args, "image_cache_mb", 0)
+    dataset.image_disk_cache = getattr(args, "image_disk_cache", True)
+    dataset.image_disk_cache_mb = getattr(args, "image_disk_cache_mb", 0)
+    dataset.uint8_images = getattr(args, "uint8_images", True)
 
     opt.iterations = args.iterations
     opt.position_lr_init = args.position_lr_init
@@ -35,6 +40,11 @@ def parse_args(args):
     opt.densify_until_iter = args.densify_until_iter
     opt.densify_grad_threshold = args.densify_grad_threshold
     opt.random_background = args.random_background
+    opt.pooled_densification = getattr(args, "pooled_densification", False)
+    opt.max_gaussians = getattr(args, "max_gaussians", 0)
+    opt.max_gaussian_mb = getattr(args, "max_gaussian_mb", 0.0)
+    opt.morton_order = getattr(args, "morton_order", False)
+    opt.prefetch_depth = getattr(args, "prefetch_depth", 2)
 
     pipe.convert_SHs_python = args.convert_SHs_python
     pipe.compute_cov3D_python = args.compute_cov3D_python
@@ -8,20 +8,95 @@
 #
 # For inquiries contact  george.drettakis@inria.fr
 #
+import os
+from functools import partial
+
 import numpy as np
 import torch
+from PIL import Image
 from scipy.spatial.transform import Rotation as R
 from tqdm import tqdm
 
 from scene.cameras import Camera
-from utils.general_utils import PILtoTorch
+from utils.disk_image_cache import CACHE_DIR_NAME, DiskImageCache, disk_image_cache
+from utils.general_utils import PILtoTorch, PILtoUint8
 from utils.graphics_utils import fov2focal
+from utils.image_probe import probe_image, probe_images
+from utils.undistort_utils import Undistorter, prepare_maps
 
 WARNED = False
 
 
-def loadCam(args, id, cam_info, resolution_scale):
-    orig_w, orig_h = cam_info.image.size
+def image_size(cam_info):
+    if cam_info.image is not None:
+        return cam_info.image.size
+    info = probe_image(cam_info.image_path)  # only the header is read
+    undistort = getattr(cam_info, "undistort", None)
+    if undistort is not None:
+        return undistort.output_size((info.width, info.height))
+    return info.width, info.height
+
+
+def composite_background(image, background):
+    """PIL image with alpha -> rgb PIL image over the background color"""
+    im_data = np.array(image.convert("RGBA"))
+    norm_data = im_data / 255.0
+    arr = norm_data[:, :, :3] * norm_data[:, :, 3:4] + background * (1 - norm_data[:, :, 3:4])
+    return Image.fromarray(np.array(arr * 255.0, dtype=np.byte), "RGB")
+
+
+def split_alpha(resized_image_rgb):
+    """[c, h, w] image -> ([3, h, w] image, [1, h, w] alpha mask or None)"""
+    gt_image = resized_image_rgb[:3, ...]
+    loaded_mask = None
+
+    if resized_image_rgb.shape[1] == 4:
+        loaded_mask = resized_image_rgb[3:4, ...]
+    return gt_image, loaded_mask
+
+
+def decode_image(image, resolution, compact=False):
+    """
+    PIL image -> ([3, h, w] image, [1, h, w] alpha mask or None) at the given (width, height)
+    float in [0, 1], or uint8 if compact
+    """
+    return split_alpha(PILtoUint8(image, resolution) if compact else PILtoTorch(image, resolution))
+
+
+def load_image_file(image_path, resolution, disk_cache: DiskImageCache = None, compact=False, background=None,
+                    undistort: Undistorter = None):
+    """
+    :param background: composite over this rgb color first (blender datasets), bypasses the disk cache
+    :param undistort: remap to the pinhole camera first (distorted COLMAP cameras)
+    """
+    if background is not None:
+        with Image.open(image_path) as image:
+            if undistort is not None:
+                image = undistort(image)
+            return decode_image(composite_background(image, background), resolution, compact)
+    if disk_cache is not None:
+        if compact:
+            image = disk_cache.load_uint8(image_path, resolution, undistort)
+        else:
+            image = disk_cache.load(image_path, resolution, undistort)
+        return split_alpha(image)
+    with Image.open(image_path) as image:
+        if undistort is not None:
+            image = undistort(image)
+        return decode_image(image, resolution, compact)
+
+
+def image_disk_cache(args) -> DiskImageCache:
+    """the resized image cache in <source_path>/cache/images, None if disabled"""
+    if not getattr(args, "image_disk_cache", True) or not getattr(args, "source_path", ""):
+        return None
+    return disk_image_cache(os.path.join(args.source_path, "cache", CACHE_DIR_NAME),
+                            int(getattr(args, "image_disk_cache_mb", 0)) << 20)
+
+
+def camera_resolution(args, cam_info, resolution_scale):
+    """(width, height) of the ground truth image of a camera"""
+    orig_w, orig_h = image_size(cam_info)
 
     if args.resolution in [1, 2, 4, 8]:
         resolution = round(orig_w / (resolution_scale * args.resolution)), round(
@@ -42,28 +117,59 @@ def loadCam(args, id, cam_info, resolution_scale):
 
         scale = float(global_down) * float(resolution_scale)
         resolution = (int(orig_w / scale), int(orig_h / scale))
-
-    resized_image_rgb = PILtoTorch(cam_info.image, resolution)
-
-    gt_image = resized_image_rgb[:3, ...]
-    loaded_mask = None
-
-    if resized_image_rgb.shape[1] == 4:
-        loaded_mask = resized_image_rgb[3:4, ...]
+    return resolution
+
+
+def loadCam(args, id, cam_info, resolution_scale, resolution=None):
+    if resolution is None:
+        resolution = camera_resolution(args, cam_info, resolution_scale)
+    background = getattr(cam_info, "background", None)
+    undistort = getattr(cam_info, "undistort", None)
+    disk_cache = image_disk_cache(args) if cam_info.image is None and background is None else None
+    compact = getattr(args, "uint8_images", True)
+
+    if cam_info.image is None and not getattr(args, "eager_images", False):
+        # decoded on first access, see Camera.original_image
+        return Camera(colmap_id=cam_info.uid, R=cam_info.R, T=cam_info.T,
+                      FoVx=cam_info.FovX, FoVy=cam_info.FovY,
+                      image=None, gt_alpha_mask=None,
+                      image_name=cam_info.image_name, uid=id, data_device=args.data_device,
+                      image_loader=partial(load_image_file, cam_info.image_path, resolution, disk_cache, compact,
+                                           background, undistort),
+                      resolution=resolution, image_key=(cam_info.image_path, resolution), compact_image=compact)
+
+    if cam_info.image is None:
+        gt_image, loaded_mask = load_image_file(cam_info.image_path, resolution, disk_cache, compact, background,
+                                                undistort)
+    else:
+        gt_image, loaded_mask = decode_image(cam_info.image, resolution, compact)
 
     return Camera(colmap_id=cam_info.uid, R=cam_info.R, T=cam_info.T,
                   FoVx=cam_info.FovX, FoVy=cam_info.FovY,
                   image=gt_image, gt_alpha_mask=loaded_mask,
-                  image_name=cam_info.image_name, uid=id, data_device=args.data_device)
+                  image_name=cam_info.image_name, uid=id, data_device=args.data_device, compact_image=compact)
 
 
 def cameraList_from_camInfos(cam_infos, resolution_scale, args):
     from gui.utils import progress_utils as pu
+    probe_images([c.image_path for c in cam_infos if c.image is None])  # headers in parallel, image_size reuses them
+    resolutions = [camera_resolution(args, c, resolution_scale) for c in cam_infos]
+    # remap tables once per intrinsic, before any image is decoded
+    prepare_maps([(c.undistort, probe_image(c.image_path)[:2])
+                  for c in cam_infos if c.image is None and getattr(c, "undistort", None) is not None])
+    disk_cache = image_disk_cache(args)
+    if disk_cache is not None:
+        # decode and resize the images missing from the disk cache in parallel, later runs only map them
+        disk_cache.build([(c.image_path, resolution, getattr(c, "undistort", None))
+                          for c, resolution in zip(cam_infos, resolutions)
+                          if c.image is None and getattr(c, "background", None) is None])
     pu.p_new_progress("load_camera", total=len(cam_infos))
     camera_list = []
     for id, c in tqdm(enumerate(cam_infos)):
-        camera_list.append(loadCam(args, id, c, resolution_scale))
+        camera_list.append(loadCam(args, id, c, resolution_scale, resolutions[id]))
         pu.p_update("load_camera", 1)
+    if disk_cache is not None:
+        disk_cache.save_index()
     return camera_list
 
 
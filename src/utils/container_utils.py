@@ -0,0 +1,206 @@
+"""
+Compact chunked container for gaussian models (.gsc)
+
+layout:
+    magic b'AGSC' | uint32 version | uint64 header offset | uint64 header size | blocks | utf-8 json header
+
+The header is written after the blocks so the writer can stream chunk by chunk.
+It holds the global info and a per-chunk index:
+    {
+        "count": n, "sh_degree": d, "chunk_size": c,
+        "encodings": {"xyz": "f4", "sh1": "u8", ...},
+        "chunks": [{"start": s, "count": k, "bounds": [[x, y, z], [x, y, z]],
+                    "blocks": {"xyz": [offset, nbytes], ...}}, ...]
+    }
+(block offsets are absolute file offsets)
+
+Every attribute is stored per chunk as a [k, width] block, encoded as
+    f4 / f2: raw little endian floats
+    u8:      float32 lo[width] | float32 hi[width] | uint8 [k, width]  (per chunk, per column min/max)
+so a reader can decode any subset of chunks and attributes (e.g. SH bands) without touching the rest.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+CONTAINER_MAGIC = b'AGSC'
+CONTAINER_VERSION = 1
+_PREAMBLE = struct.Struct('<4sIQQ')
+
+ENCODINGS = ('f4', 'f2', 'u8')
+
+DEFAULT_ENCODINGS = {
+    'xyz': 'f4',
+    'opacity': 'f2',
+    'scale': 'f2',
+    'rotation': 'f2',
+    'sh0': 'f2',
+    'sh1': 'u8',
+    'sh2': 'u8',
+    'sh3': 'u8',
+}
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def sh_band_names(sh_degree):
+    return [f'sh{band}' for band in range(sh_degree + 1)]
+
+
+def sh_band_range(band):
+    """index range of the band in features_rest (which does not contain the dc term)"""
+    return band ** 2 - 1, (band + 1) ** 2 - 1
+
+
+def _encode_block(block: np.ndarray, encoding: str) -> bytes:
+    if encoding == 'f4':
+        return np.ascontiguousarray(block, dtype='<f4').tobytes()
+    if encoding == 'f2':
+        return np.ascontiguousarray(block, dtype='<f2').tobytes()
+    if encoding == 'u8':
+        block = np.asarray(block, dtype=np.float32)
+        lo = block.min(axis=0) if block.shape[0] > 0 else np.zeros(block.shape[1], np.float32)
+        hi = block.max(axis=0) if block.shape[0] > 0 else np.zeros(block.shape[1], np.float32)
+        scale = np.where(hi > lo, 255.0 / np.maximum(hi - lo, 1e-12), 0.0).astype(np.float32)
+        quantized = np.rint((block - lo) * scale).astype(np.uint8)
+        return lo.astype('<f4').tobytes() + hi.astype('<f4').tobytes() + quantized.tobytes()
+    raise ValueError(f'unknown encoding {encoding}, expected one of {ENCODINGS}')
+
+
+def _decode_block(raw: np.ndarray, encoding: str, out: np.ndarray):
+    """decode one block into out ([count, width] float32)"""
+    count, width = out.shape
+    if encoding == 'f4':
+        out[:] = raw.view('<f4').reshape(count, width)
+    elif encoding == 'f2':
+        out[:] = raw.view('<f2').reshape(count, width)
+    elif encoding == 'u8':
+        lo = raw[:4 * width].view('<f4')
+        hi = raw[4 * width:8 * width].view('<f4')
+        np.multiply(raw[8 * width:].reshape(count, width), (hi - lo) / 255.0, out=out)
+        out += lo
+    else:
+        raise ValueError(f'unknown encoding {encoding}, expected one of {ENCODINGS}')
+
+
+def write_container(path, arrays: dict, sh_degree: int, encodings: dict = None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    :param arrays: 'xyz' [n, 3], 'opacity' [n, 1], 'scale' [n, 3], 'rotation' [n, 4],
+                   'sh0' [n, 3] and 'sh1'...'sh{sh_degree}' [n, (2 * band + 1) * 3] float arrays
+    :param encodings: per attribute encoding, missing entries fall back to DEFAULT_ENCODINGS
+    """
+    encodings = {**DEFAULT_ENCODINGS, **(encodings or {})}
+    names = ['xyz', 'opacity', 'scale', 'rotation'] + sh_band_names(sh_degree)
+    count = arrays['xyz'].shape[0]
+
+    chunks = []
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(CONTAINER_MAGIC, CONTAINER_VERSION, 0, 0))  # patched once the header is written
+        for start in range(0, count, chunk_size):
+            end = min(start + chunk_size, count)
+            xyz = np.asarray(arrays['xyz'][start:end], dtype=np.float32)
+            chunk = {'start': start, 'count': end - start,
+                     'bounds': [xyz.min(axis=0).tolist(), xyz.max(axis=0).tolist()], 'blocks': {}}
+            for name in names:
+                data = _encode_block(arrays[name][start:end].reshape(end - start, -1), encodings[name])
+                chunk['blocks'][name] = [f.tell(), len(data)]
+                f.write(data)
+            chunks.append(chunk)
+
+        header = {
+            'count': count,
+            'sh_degree': sh_degree,
+            'chunk_size': chunk_size,
+            'widths': {name: int(np.prod(arrays[name].shape[1:])) for name in names},
+            'encodings': {name: encodings[name] for name in names},
+            'chunks': chunks,
+        }
+        header_bytes = json.dumps(header).encode('utf-8')
+        header_offset = f.tell()
+        f.write(header_bytes)
+        f.seek(0)
+        f.write(_PREAMBLE.pack(CONTAINER_MAGIC, CONTAINER_VERSION, header_offset, len(header_bytes)))
+
+
+class GaussianContainer:
+    """
+    Reader for the .gsc container. The file is memory-mapped, only the requested
+    chunks and attributes are decoded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, header_offset, header_size = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != CONTAINER_MAGIC:
+                raise ValueError(f'{path} is not a gaussian container')
+            if version > CONTAINER_VERSION:
+                raise ValueError(f'{path}: unsupported container version {version}')
+            f.seek(header_offset)
+            self.header = json.loads(f.read(header_size).decode('utf-8'))
+        self._mm = np.memmap(path, dtype=np.uint8, mode='r')
+
+    @property
+    def count(self) -> int:
+        return self.header['count']
+
+    @property
+    def sh_degree(self) -> int:
+        return self.header['sh_degree']
+
+    @property
+    def num_chunks(self) -> int:
+        return len(self.header['chunks'])
+
+    def chunk_bounds(self) -> np.ndarray:
+        """[num_chunks, 2, 3] bounding box of the gaussian centers of every chunk"""
+        return np.array([c['bounds'] for c in self.header['chunks']], dtype=np.float32).reshape(-1, 2, 3)
+
+    def chunks_in_box(self, lo, hi) -> list:
+        """indices of the chunks whose bounds intersect the box [lo, hi]"""
+        bounds = self.chunk_bounds()
+        lo = np.asarray(lo, dtype=np.float32)
+        hi = np.asarray(hi, dtype=np.float32)
+        hit = np.all((bounds[:, 0] <= hi) & (bounds[:, 1] >= lo), axis=1)
+        return np.nonzero(hit)[0].tolist()
+
+    def read(self, names=None, chunks=None, sh_degree=None) -> dict:
+        """
+        :param names: attributes to decode, defaults to everything up to sh_degree
+        :param chunks: indices of the chunks to decode, defaults to all chunks
+        :param sh_degree: drop the SH bands above this degree (only when names is None)
+        :return: dict name -> float32 [k, width] array
+        """
+        if sh_degree is None:
+            sh_degree = self.sh_degree
+        sh_degree = min(sh_degree, self.sh_degree)
+        if names is None:
+            names = ['xyz', 'opacity', 'scale', 'rotation'] + sh_band_names(sh_degree)
+        if chunks is None:
+            chunks = range(self.num_chunks)
+        chunk_infos = [self.header['chunks'][i] for i in chunks]
+        total = sum(c['count'] for c in chunk_infos)
+
+        result = {}
+        for name in names:
+            width = self.header['widths'][name]
+            encoding = self.header['encodings'][name]
+            out = np.empty((total, width), dtype=np.float32)
+            row = 0
+            for chunk in chunk_infos:
+                offset, nbytes = chunk['blocks'][name]
+                _decode_block(self._mm[offset:offset + nbytes], encoding, out[row:row + chunk['count']])
+                row += chunk['count']
+            result[name] = out
+        return result
+
+    def close(self):
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
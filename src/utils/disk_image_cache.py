@@ -0,0 +1,280 @@
+"""
+Persistent cache of decoded and resized training images next to the dataset
+
+Every run used to open and resize every source image again for each resolution scale.
+DiskImageCache keeps the resized uint8 pixels as .npy files in <source_path>/cache/images,
+later runs memory-map them instead of decoding. An entry is keyed by the source path, its mtime
+and size and the resize parameters, so an edited or replaced image simply misses and its old
+entries are pruned. Entries beyond the byte budget are evicted least recently used first, except
+the ones the current run just asked build() for.
+A transform applied before the resize (the undistortion of utils.undistort_utils) is part of
+the key through its own key attribute.
+
+    cache = disk_image_cache(os.path.join(source_path, "cache", CACHE_DIR_NAME))
+    cache.build([(path, (w, h)), ...])  # decodes the missing ones in parallel
+    image = cache.load(path, (w, h))  # [c, h, w] float, as PILtoTorch
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import torch
+from PIL import Image
+from tqdm import tqdm
+
+CACHE_DIR_NAME = "images"  # under <source_path>/cache, next to the other dataset caches
+INDEX_NAME = "index.json"
+CACHE_VERSION = 1  # bump when the stored format or the resize changes
+RESAMPLE = "pil-default"  # Image.resize without an explicit filter, as PILtoTorch
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _source_stat(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def entry_key(path, resolution, stat=None, transform=None) -> str:
+    """hash of everything the cached pixels depend on"""
+    mtime_ns, size = stat if stat is not None else _source_stat(path)
+    text = f"{CACHE_VERSION}|{os.path.abspath(path)}|{mtime_ns}|{size}|{resolution[0]}x{resolution[1]}|{RESAMPLE}"
+    if transform is not None:
+        text += f"|{transform.key}"
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def resize_to_array(path, resolution, transform=None) -> np.ndarray:
+    """[h, w] or [h, w, c] uint8, the pixels PILtoTorch divides by 255"""
+    with Image.open(path) as image:
+        if transform is not None:
+            image = transform(image)
+        return np.array(image.resize(resolution))
+
+
+def array_to_uint8(array: np.ndarray) -> torch.Tensor:
+    """same layout as PILtoUint8"""
+    image = torch.from_numpy(np.array(array))  # copy out of the read only memory map
+    if image.dim() == 3:
+        return image.permute(2, 0, 1)
+    return image.unsqueeze(dim=-1).permute(2, 0, 1)
+
+
+def array_to_torch(array: np.ndarray) -> torch.Tensor:
+    """same layout and values as PILtoTorch"""
+    return array_to_uint8(array) / 255.0
+
+
+class DiskImageCache:
+    def __init__(self, root, max_bytes=0):
+        """
+        :param root: directory of the cache, created on first write
+        :param max_bytes: budget of the .npy files, 0 for unlimited
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries: dict[str, dict] = {}  # key -> {source, mtime_ns, size, resolution, bytes, last_used}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.writable = True
+        self.hits = 0
+        self.misses = 0
+        self._read_index()
+
+    # region index
+    @property
+    def index_path(self):
+        return os.path.join(self.root, INDEX_NAME)
+
+    def _file(self, key):
+        return os.path.join(self.root, f"{key}.npy")
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != CACHE_VERSION:
+            return  # files of another version are pruned as orphans on the next save
+        self.entries = data.get("entries", {})
+
+    def save_index(self):
+        with self._lock:
+            if not self._dirty or not self.writable:
+                return
+            data = {"version": CACHE_VERSION, "entries": dict(self.entries)}
+            self._dirty = False
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as file:
+                json.dump(data, file)
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            print(f"[Warning] image cache index not saved: {e}")
+
+    @property
+    def bytes(self):
+        return sum(entry["bytes"] for entry in self.entries.values())
+
+    # endregion
+
+    # region entries
+    def _valid(self, key) -> bool:
+        return key in self.entries and os.path.exists(self._file(key))
+
+    def _write(self, key, path, resolution, stat, transform=None):
+        """decode, resize and store one image, atomically"""
+        array = resize_to_array(path, resolution, transform)
+        tmp = f"{self._file(key)}.{threading.get_ident()}.tmp.npy"
+        np.save(tmp, array)
+        os.replace(tmp, self._file(key))
+        with self._lock:
+            self.entries[key] = {"source": os.path.abspath(path), "mtime_ns": stat[0], "size": stat[1],
+                                 "resolution": list(resolution), "bytes": int(array.nbytes),
+                                 "last_used": time.time()}
+            self._dirty = True
+        return array
+
+    def _disable(self, error):
+        if self.writable:
+            print(f"[Warning] image cache {self.root} is not writable, images are decoded every run: {error}")
+        self.writable = False
+
+    def get_array(self, path, resolution, transform=None) -> np.ndarray:
+        """
+        memory-mapped [h, w(, c)] uint8 pixels, decoded and stored first on a miss
+        :param transform: PIL image -> PIL image applied before the resize, with a key attribute
+        """
+        stat = _source_stat(path)
+        key = entry_key(path, resolution, stat, transform)
+        if self._valid(key):
+            try:
+                array = np.load(self._file(key), mmap_mode="r")
+                with self._lock:
+                    self.entries[key]["last_used"] = time.time()
+                    self._dirty = True
+                    self.hits += 1
+                return array
+            except (OSError, ValueError):
+                pass  # truncated or foreign file, written again below
+        with self._lock:
+            self.misses += 1
+        if self.writable:
+            try:
+                os.makedirs(self.root, exist_ok=True)
+                return self._write(key, path, resolution, stat, transform)
+            except OSError as e:
+                self._disable(e)
+        return resize_to_array(path, resolution, transform)
+
+    def load(self, path, resolution, transform=None) -> torch.Tensor:
+        """[c, h, w] float image in [0, 1], identical to PILtoTorch(Image.open(path), resolution)"""
+        return array_to_torch(self.get_array(path, resolution, transform))
+
+    def load_uint8(self, path, resolution, transform=None) -> torch.Tensor:
+        """[c, h, w] uint8, identical to PILtoUint8(Image.open(path), resolution)"""
+        return array_to_uint8(self.get_array(path, resolution, transform))
+
+    def build(self, requests, workers=DEFAULT_WORKERS, desc="Caching images"):
+        """
+        store every missing (path, resolution[, transform]) with a pool of decoders, then prune and save the index.
+        The requested entries are not evicted by the prune, otherwise a budget smaller than the dataset
+        would drop what was just built and every run would decode it again
+        :return: number of images decoded
+        """
+        missing = []
+        requested = set()
+        for path, resolution, transform in dict.fromkeys((path, tuple(resolution), transform[0] if transform else None)
+                                                         for path, resolution, *transform in requests):
+            key = entry_key(path, resolution, transform=transform)
+            requested.add(key)
+            if not self._valid(key):
+                missing.append((path, resolution, transform))
+        if missing and self.writable:
+            try:
+                os.makedirs(self.root, exist_ok=True)
+            except OSError as e:
+                self._disable(e)
+        if missing and self.writable:
+            def task(item):
+                path, resolution, transform = item
+                stat = _source_stat(path)
+                self._write(entry_key(path, resolution, stat, transform), path, resolution, stat, transform)
+
+            with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="image_cache") as executor:
+                try:
+                    for _ in tqdm(executor.map(task, missing), total=len(missing), desc=desc):
+                        pass
+                except OSError as e:
+                    self._disable(e)
+        self.prune(keep=requested)
+        return len(missing) if self.writable else 0
+
+    def prune(self, keep=()):
+        """
+        drop entries whose source changed or disappeared, orphan files, and the oldest ones over budget
+        :param keep: keys never evicted for the budget, they still go when their source changed
+        """
+        with self._lock:
+            stale = []
+            for key, entry in self.entries.items():
+                try:
+                    stat = _source_stat(entry["source"])
+                except OSError:
+                    stale.append(key)
+                    continue
+                if (entry["mtime_ns"], entry["size"]) != stat or not os.path.exists(self._file(key)):
+                    stale.append(key)
+            if self.max_bytes > 0:
+                used = sum(entry["bytes"] for key, entry in self.entries.items() if key not in stale)
+                for key in sorted(self.entries, key=lambda key: self.entries[key]["last_used"]):
+                    if used <= self.max_bytes:
+                        break
+                    if key not in stale and key not in keep:
+                        stale.append(key)
+                        used -= self.entries[key]["bytes"]
+            for key in stale:
+                del self.entries[key]
+            self._dirty = self._dirty or bool(stale)
+            known = set(self.entries)
+        if not self.writable or not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if name.endswith(".npy") and name[:-len(".npy")] not in known and ".tmp" not in name:
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+        self.save_index()
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+            self._dirty = True
+        self.prune()
+
+    def stats(self) -> dict:
+        return {"images": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+    # endregion
+
+
+_caches: dict[str, DiskImageCache] = {}
+
+
+def disk_image_cache(root, max_bytes: Optional[int] = None) -> DiskImageCache:
+    """one instance per directory, max_bytes None keeps the current budget"""
+    root = os.path.abspath(root)
+    cache = _caches.get(root)
+    if cache is None:
+        cache = _caches[root] = DiskImageCache(root, max_bytes or 0)
+    elif max_bytes is not None:
+        cache.max_bytes = max_bytes
+    return cache
@@ -26,6 +26,37 @@ def PILtoTorch(pil_image, resolution):
     else:
         return resized_image.unsqueeze(dim=-1).permute(2, 0, 1)
 
+def PILtoUint8(pil_image, resolution):
+    """PILtoTorch without the division, [c, h, w] uint8"""
+    resized_image = torch.from_numpy(np.array(pil_image.resize(resolution)))
+    if len(resized_image.shape) == 3:
+        return resized_image.permute(2, 0, 1)
+    else:
+        return resized_image.unsqueeze(dim=-1).permute(2, 0, 1)
+
+def pack_image(image, alpha=None):
+    """
+    ground truth image (and alpha mask) -> [c, h, w] uint8, the alpha is a 4th channel of rgb images
+    float inputs in [0, 1] are rounded to the nearest of the 256 levels they were decoded from
+    """
+    def to_uint8(x):
+        return x if x.dtype == torch.uint8 else (x.clamp(0.0, 1.0) * 255).round_().to(torch.uint8)
+
+    if alpha is None:
+        return to_uint8(image)
+    if image.shape[0] != 3:
+        return to_uint8(unpack_image(to_uint8(image)) * unpack_image(to_uint8(alpha)))
+    return torch.cat((to_uint8(image), to_uint8(alpha)))
+
+def unpack_image(packed):
+    """pack_image -> the float image in [0, 1] with the alpha applied, float images are returned as they are"""
+    if packed.dtype != torch.uint8:
+        return packed
+    image = packed[:3].float().div_(255.0)
+    if packed.shape[0] == 4:
+        image *= packed[3:4].float().div_(255.0)
+    return image
+
 def get_expon_lr_func(
     lr_init, lr_final, lr_delay_steps=0, lr_delay_mult=1.0, max_steps=1000000
 ):
@@ -62,7 +93,7 @@ def get_expon_lr_func(
     return helper
 
 def strip_lowerdiag(L):
-    uncertainty = torch.zeros((L.shape[0], 6), dtype=torch.float, device="cuda")
+    uncertainty = torch.zeros((L.shape[0], 6), dtype=torch.float, device=L.device)
 
     uncertainty[:, 0] = L[:, 0, 0]
     uncertainty[:, 1] = L[:, 0, 1]
@@ -80,7 +111,7 @@ def build_rotation(r):
 
     q = r / norm[:, None]
 
-    R = torch.zeros((q.size(0), 3, 3), device='cuda')
+    R = torch.zeros((q.size(0), 3, 3), device=r.device)
 
     r = q[:, 0]
     x = q[:, 1]
@@ -99,7 +130,7 @@ def build_rotation(r):
     return R
 
 def build_scaling_rotation(s, r):
-    L = torch.zeros((s.shape[0], 3, 3), dtype=torch.float, device="cuda")
+    L = torch.zeros((s.shape[0], 3, 3), dtype=torch.float, device=s.device)
     R = build_rotation(r)
 
     L[:,0,0] = s[:,0]
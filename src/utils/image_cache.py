@@ -0,0 +1,96 @@
+"""
+Byte budgeted LRU cache of decoded ground truth images, one per device
+
+Cameras created with lazy images only keep the path and the target resolution, the image is
+decoded on first access of Camera.original_image and kept here until the budget of its device
+is exceeded, then the least recently used images are dropped (and decoded again when needed).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+import torch
+
+DEFAULT_BUDGETS = {"cpu": 8 << 30, "cuda": 4 << 30}
+
+
+class ImageCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._images: OrderedDict[Hashable, torch.Tensor] = OrderedDict()
+        self._lock = threading.Lock()  # cameras may be loaded from worker threads
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, key):
+        return key in self._images
+
+    def get(self, key, load: Callable[[], torch.Tensor]) -> torch.Tensor:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+        image = load()  # decode outside of the lock
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = image
+                self.bytes += image.numel() * image.element_size()
+                self._evict()
+        return image
+
+    def _evict(self):
+        # the newest image stays even if it alone exceeds the budget
+        while self.bytes > self.max_bytes and len(self._images) > 1:
+            _, image = self._images.popitem(last=False)
+            self.bytes -= image.numel() * image.element_size()
+            self.evictions += 1
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        return {"images": len(self._images), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+_caches: dict[str, ImageCache] = {}
+
+
+def _cache_key(device) -> str:
+    device = torch.device(device)
+    if device.type == "cuda" and device.index is None:
+        device = torch.device("cuda", torch.cuda.current_device())
+    return str(device)
+
+
+def image_cache(device) -> ImageCache:
+    key = _cache_key(device)
+    cache = _caches.get(key)
+    if cache is None:
+        cache = _caches[key] = ImageCache(DEFAULT_BUDGETS.get(torch.device(device).type, DEFAULT_BUDGETS["cpu"]))
+    return cache
+
+
+def set_image_cache_budget(device, max_bytes):
+    image_cache(device).set_budget(max_bytes)
+
+
+def clear_image_caches():
+    for cache in _caches.values():
+        cache.clear()
@@ -0,0 +1,117 @@
+"""
+Image dimensions from the file header only
+
+The camera readers need the size of every image long before (and often without) its pixels.
+probe_image reads the PNG IHDR chunk or walks the JPEG markers up to the first SOF segment,
+at most a few small reads per file and no decoder state; other formats fall back to a
+PIL open that is closed right away. Results are kept per (path, mtime, size), and
+probe_images probes a whole dataset with a thread pool.
+"""
+
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from PIL import Image
+
+DEFAULT_WORKERS = min(16, 4 * (os.cpu_count() or 1))  # io bound
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+# start of frame markers, all but DHT (C4), JPG (C8) and DAC (CC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+class ImageInfo(NamedTuple):
+    width: int
+    height: int
+    mode: str
+
+
+def _probe_png(file):
+    header = file.read(8 + 8 + 13)
+    if len(header) < 29 or header[12:16] != b"IHDR":
+        return None
+    width, height, _, color_type = struct.unpack(">IIBB", header[16:26])
+    return ImageInfo(width, height, PNG_MODES.get(color_type, "RGB"))
+
+
+def _probe_jpeg(file):
+    file.seek(2)
+    while True:
+        byte = file.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue  # not at a marker, resynchronize
+        marker = file.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = file.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in JPEG_STANDALONE_MARKERS:
+            continue
+        if code == 0xD9 or code == 0xDA:  # end of image / start of scan before any frame header
+            return None
+        length_bytes = file.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if code in JPEG_SOF_MARKERS:
+            segment = file.read(6)
+            if len(segment) < 6:
+                return None
+            _, height, width, components = struct.unpack(">BHHB", segment)
+            return ImageInfo(width, height, JPEG_MODES.get(components, "RGB"))
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def _probe_pil(path):
+    with Image.open(path) as image:  # lazy, only the header is parsed
+        return ImageInfo(image.size[0], image.size[1], image.mode)
+
+
+def probe_image_uncached(path) -> ImageInfo:
+    with open(path, "rb") as file:
+        signature = file.read(8)
+        info = None
+        if signature == PNG_SIGNATURE:
+            file.seek(0)
+            info = _probe_png(file)
+        elif signature[:2] == b"\xff\xd8":
+            info = _probe_jpeg(file)
+    return info if info is not None else _probe_pil(path)
+
+
+_cache: dict[tuple, ImageInfo] = {}
+_lock = threading.Lock()
+
+
+def probe_image(path) -> ImageInfo:
+    """(width, height, mode) of an image file, as PIL reports them, without decoding it"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    info = _cache.get(key)
+    if info is None:
+        info = probe_image_uncached(path)
+        with _lock:
+            _cache[key] = info
+    return info
+
+
+def probe_images(paths, workers=DEFAULT_WORKERS) -> list[ImageInfo]:
+    paths = list(paths)
+    if workers <= 1 or len(paths) <= 1:
+        return [probe_image(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_probe") as executor:
+        return list(executor.map(probe_image, paths))
+
+
+def clear_probe_cache():
+    with _lock:
+        _cache.clear()
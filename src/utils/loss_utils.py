@@ -30,7 +30,87 @@ def create_window(window_size, channel):
     window = Variable(_2D_window.expand(channel, 1, window_size, window_size).contiguous())
     return window
 
-def ssim(img1, img2, window_size=11, size_average=True):
+_windows = {}  # (window_size, channel, device, dtype, separable) -> window(s), see get_window
+
+def get_window(window_size, channel, device, dtype=torch.float32, separable=False):
+    """
+    the gaussian window of create_window on device, built once per key
+    separable: ([channel, 1, 1, window_size], [channel, 1, window_size, 1]), the 1D factors of the 2D window
+    """
+    device = torch.device(device)
+    key = (window_size, channel, device, dtype, separable)
+    window = _windows.get(key)
+    if window is None:
+        if separable:
+            _1D_window = gaussian(window_size, 1.5).to(device=device, dtype=dtype)
+            window = (_1D_window.view(1, 1, 1, window_size).expand(channel, 1, 1, window_size).contiguous(),
+                      _1D_window.view(1, 1, window_size, 1).expand(channel, 1, window_size, 1).contiguous())
+        else:
+            window = create_window(window_size, channel).to(device=device, dtype=dtype)
+        _windows[key] = window
+    return window
+
+def ssim(img1, img2, window_size=11, size_average=True, separable=True):
+    """
+    :param img1: [c, h, w] or a batch [n, c, h, w]
+    :param separable: two 1D convolutions instead of one 2D convolution, equal up to float rounding
+    :return: mean ssim, or per image ([n, ]) for a batch if not size_average
+    """
+    channel = img1.size(-3)
+    window = get_window(window_size, channel * 5, img1.device, img1.dtype, separable)
+    return _ssim_fused(img1, img2, window, window_size, channel, size_average)
+
+def ssim_batched(imgs1, imgs2, window_size=11, chunk_size=16, separable=True):
+    """
+    per image ssim of two lists of images ([c, h, w] or [1, c, h, w]), consecutive images of the
+    same shape are evaluated together, at most chunk_size at a time
+    :return: [n, ]
+    """
+    results = []
+    start = 0
+    while start < len(imgs1):
+        end = start + 1
+        while end < len(imgs1) and end - start < chunk_size and imgs1[end].shape == imgs1[start].shape:
+            end += 1
+        batch1 = torch.stack([img.reshape(img.shape[-3:]) for img in imgs1[start:end]])
+        batch2 = torch.stack([img.reshape(img.shape[-3:]) for img in imgs2[start:end]])
+        results.append(ssim(batch1, batch2, window_size, size_average=False, separable=separable))
+        start = end
+    return torch.cat(results) if results else torch.empty(0)
+
+def _filter(x, window, window_size):
+    """depthwise gaussian blur with zero padding, window from get_window"""
+    channels = x.shape[-3]
+    if isinstance(window, tuple):
+        x = F.conv2d(x, window[0], padding=(0, window_size // 2), groups=channels)
+        return F.conv2d(x, window[1], padding=(window_size // 2, 0), groups=channels)
+    return F.conv2d(x, window, padding=window_size // 2, groups=channels)
+
+def _ssim_fused(img1, img2, window, window_size, channel, size_average=True):
+    """_ssim with the five blurs of img1, img2, img1^2, img2^2 and img1*img2 in one grouped convolution"""
+    stacked = torch.cat((img1, img2, img1 * img1, img2 * img2, img1 * img2), dim=-3)
+    mu1, mu2, img1_sq, img2_sq, img12 = _filter(stacked, window, window_size).split(channel, dim=-3)
+
+    mu1_sq = mu1.pow(2)
+    mu2_sq = mu2.pow(2)
+    mu1_mu2 = mu1 * mu2
+
+    sigma1_sq = img1_sq - mu1_sq
+    sigma2_sq = img2_sq - mu2_sq
+    sigma12 = img12 - mu1_mu2
+
+    C1 = 0.01 ** 2
+    C2 = 0.03 ** 2
+
+    ssim_map = ((2 * mu1_mu2 + C1) * (2 * sigma12 + C2)) / ((mu1_sq + mu2_sq + C1) * (sigma1_sq + sigma2_sq + C2))
+
+    if size_average:
+        return ssim_map.mean()
+    else:
+        return ssim_map.mean(1).mean(1).mean(1)
+
+def ssim_reference(img1, img2, window_size=11, size_average=True):
+    """the original implementation, a new 2D window and five convolutions per call"""
     channel = img1.size(-3)
     window = create_window(window_size, channel)
 
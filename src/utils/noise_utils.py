@@ -0,0 +1,66 @@
+"""
+Seeded noise drawn directly on the device of the gaussians
+
+np.random draws float64 noise on the host, which then has to be copied to the device and cast,
+and depends on the global numpy state. NoiseGenerator keeps its own torch.Generator on the
+target device and draws float32 noise there, only for the rows that receive it.
+The same seed gives the same noise on the same device type (cpu and cuda streams differ).
+"""
+
+from typing import Optional
+
+import torch
+
+from utils.sh_utils import C0
+
+# kind -> (GaussianModel attribute, std converted to the space of the attribute)
+NOISE_KINDS = {
+    "position": ("_xyz", lambda std: std),  # world units
+    "color": ("_features_dc", lambda std: abs(std) / C0),  # rgb -> SH DC
+    "opacity": ("_opacity", lambda std: std),  # logit
+    "scale": ("_scaling", lambda std: std),  # log-scale
+}
+
+
+class NoiseGenerator:
+    def __init__(self, device, seed: Optional[int] = None):
+        self.device = torch.device(device)
+        self.generator = torch.Generator(device=self.device)
+        self.seed(seed)
+
+    def seed(self, seed: Optional[int] = None):
+        """restart the stream, None picks a random seed"""
+        if seed is None:
+            self.generator.seed()
+        else:
+            self.generator.manual_seed(seed)
+        return self
+
+    @property
+    def initial_seed(self):
+        return self.generator.initial_seed()
+
+    def get_state(self):
+        return self.generator.get_state()
+
+    def set_state(self, state):
+        self.generator.set_state(state)
+
+    def normal(self, shape, std=1.0, dtype=torch.float32) -> torch.Tensor:
+        noise = torch.randn(shape, generator=self.generator, device=self.device, dtype=dtype)
+        return noise.mul_(std) if std != 1.0 else noise
+
+    def uniform(self, shape, low=0.0, high=1.0, dtype=torch.float32) -> torch.Tensor:
+        """low / high may be tensors broadcasting against shape (e.g. per axis bounds)"""
+        noise = torch.rand(shape, generator=self.generator, device=self.device, dtype=dtype)
+        return noise * (high - low) + low
+
+    def add_normal_(self, tensor: torch.Tensor, std, mask=None):
+        """tensor[mask] += N(0, std), noise is only drawn for the masked rows"""
+        with torch.no_grad():
+            if mask is None:
+                tensor += self.normal(tensor.shape, std, dtype=tensor.dtype)
+                return tensor
+            rows = mask.nonzero().squeeze(1) if mask.dtype == torch.bool else mask
+            tensor.index_add_(0, rows, self.normal((rows.shape[0], *tensor.shape[1:]), std, dtype=tensor.dtype))
+        return tensor
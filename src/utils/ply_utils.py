@@ -0,0 +1,233 @@
+import sys
+
+import numpy as np
+
+# same names plyfile uses when it writes a header
+_PLY_TYPE_NAMES = {
+    'i1': 'char',
+    'u1': 'uchar',
+    'i2': 'short',
+    'u2': 'ushort',
+    'i4': 'int',
+    'u4': 'uint',
+    'f4': 'float',
+    'f8': 'double',
+}
+
+DEFAULT_CHUNK_SIZE = 1 << 18  # vertices per chunk
+
+
+def _ply_format_line():
+    if sys.byteorder == 'little':
+        return 'format binary_little_endian 1.0'
+    return 'format binary_big_endian 1.0'
+
+
+def build_vertex_header(count, dtype):
+    """
+    Build the ascii header of a binary ply file with a single 'vertex' element.
+    The layout is identical to the one written by plyfile.
+    """
+    lines = ['ply', _ply_format_line(), f'element vertex {count}']
+    for name in dtype.names:
+        lines.append(f'property {_PLY_TYPE_NAMES[dtype[name].str[1:]]} {name}')
+    lines.append('end_header')
+    return ('\n'.join(lines) + '\n').encode('ascii')
+
+
+def write_vertex_ply(path, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write a binary ply file with a single 'vertex' element.
+
+    Instead of building a python tuple per vertex, a structured array of at most `chunk_size` rows is
+    preallocated, filled column by column and streamed to disk, so peak host memory stays bounded.
+
+    :param path: output path
+    :param columns: list of (property_names, array, dtype).
+                    array is [n, len(property_names)] (or [n, ] for a single property),
+                    None means the properties are written as zeros (e.g. normals)
+    :param chunk_size: number of vertices written per chunk
+    """
+    count = None
+    for names, array, _ in columns:
+        if array is None:
+            continue
+        assert array.shape[0] == count or count is None, 'all columns must have the same length'
+        count = array.shape[0]
+    assert count is not None, 'at least one column must carry data'
+
+    dtype = np.dtype([(name, fmt) for names, _, fmt in columns for name in names])
+    same_dtype = len({dtype[name] for name in dtype.names}) == 1
+    chunk = np.empty(min(chunk_size, max(count, 1)), dtype=dtype)
+    # a [chunk, num_properties] view on the structured chunk, used when all properties share one dtype
+    flat_chunk = chunk.view(dtype[0]).reshape(chunk.shape[0], -1) if same_dtype else None
+
+    with open(path, 'wb') as f:
+        f.write(build_vertex_header(count, dtype))
+        for start in range(0, count, chunk_size):
+            end = min(start + chunk_size, count)
+            n = end - start
+            col = 0
+            for names, array, fmt in columns:
+                width = len(names)
+                if flat_chunk is not None:
+                    if array is None:
+                        flat_chunk[:n, col:col + width] = 0
+                    else:
+                        flat_chunk[:n, col:col + width] = array[start:end].reshape(n, width)
+                else:
+                    for j, name in enumerate(names):
+                        if array is None:
+                            chunk[name][:n] = 0
+                        else:
+                            chunk[name][:n] = array[start:end].reshape(n, width)[:, j]
+                col += width
+            chunk[:n].tofile(f)
+
+
+_PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+_PLY_BYTE_ORDERS = {
+    'binary_little_endian': '<',
+    'binary_big_endian': '>',
+}
+
+
+def read_vertex_header(path):
+    """
+    Parse the header of a binary ply file whose first element is 'vertex'.
+
+    :return: (header_size, vertex_count, dtype of one vertex)
+    """
+    byte_order = None
+    count = None
+    fields = []
+    in_vertex = False
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f'{path} is not a ply file')
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f'{path}: unexpected end of ply header')
+            words = line.decode('ascii').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'end_header':
+                header_size = f.tell()
+                break
+            if words[0] == 'format':
+                if words[1] not in _PLY_BYTE_ORDERS:
+                    raise ValueError(f'{path}: only binary ply files can be memory-mapped, got {words[1]}')
+                byte_order = _PLY_BYTE_ORDERS[words[1]]
+            elif words[0] == 'element':
+                if count is None and words[1] != 'vertex':
+                    raise ValueError(f'{path}: the first ply element must be vertex, got {words[1]}')
+                in_vertex = words[1] == 'vertex'
+                if in_vertex:
+                    count = int(words[2])
+            elif words[0] == 'property' and in_vertex:
+                if words[1] == 'list':
+                    raise ValueError(f'{path}: list properties are not supported in the vertex element')
+                fields.append((words[2], byte_order + _PLY_TYPES[words[1]]))
+    if byte_order is None or count is None:
+        raise ValueError(f'{path}: incomplete ply header')
+    return header_size, count, np.dtype(fields)
+
+
+def _sort_by_index(names):
+    return sorted(names, key=lambda x: int(x.split('_')[-1]))
+
+
+class PlyVertexMap:
+    """
+    Memory-mapped view on the vertex element of a binary ply file.
+
+    Nothing is read until a column is accessed. Groups of consecutive properties with the same type
+    (x/y/z, f_rest_*, ...) are exposed as zero-copy [n, k] strided views on the mapped file,
+    so only the columns actually used are paged in.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header_size, self.count, self.dtype = read_vertex_header(path)
+        if self.count > 0:
+            self._mm = np.memmap(path, dtype=self.dtype, mode='r', offset=self.header_size, shape=(self.count,))
+        else:
+            self._mm = np.empty(0, dtype=self.dtype)
+
+    @property
+    def property_names(self) -> list[str]:
+        return list(self.dtype.names)
+
+    def names_with_prefix(self, prefix) -> list[str]:
+        return _sort_by_index([name for name in self.dtype.names if name.startswith(prefix)])
+
+    def columns(self, names) -> np.ndarray:
+        """
+        [n, len(names)] array of the given properties.
+        A zero-copy view when the properties are adjacent in the file and share one type, a copy otherwise.
+        """
+        if len(names) == 0:
+            return np.empty((self.count, 0), dtype=np.float32)
+        fields = [self.dtype.fields[name] for name in names]
+        field_dtype, first_offset = fields[0]
+        contiguous = all(dt == field_dtype and off == first_offset + i * field_dtype.itemsize
+                         for i, (dt, off) in enumerate(fields))
+        if not contiguous or self.count == 0:
+            return np.stack([self._mm[name] for name in names], axis=1)
+        return np.ndarray(shape=(self.count, len(names)), dtype=field_dtype, buffer=self._mm,
+                          offset=first_offset, strides=(self.dtype.itemsize, field_dtype.itemsize))
+
+    # region gaussian columns
+    @property
+    def xyz(self):
+        return self.columns(['x', 'y', 'z'])
+
+    @property
+    def f_dc(self):
+        """[n, 3]"""
+        return self.columns(self.names_with_prefix('f_dc_'))
+
+    @property
+    def f_rest(self):
+        """[n, 3 * (num_sh_coeffs - 1)], channel major as stored by GaussianModel.save_ply"""
+        return self.columns(self.names_with_prefix('f_rest_'))
+
+    @property
+    def opacity(self):
+        return self.columns(['opacity'])
+
+    @property
+    def scale(self):
+        return self.columns(self.names_with_prefix('scale_'))
+
+    @property
+    def rot(self):
+        return self.columns(self.names_with_prefix('rot'))
+
+    # endregion
+
+    @staticmethod
+    def materialize(view, dtype=np.float32) -> np.ndarray:
+        """Copy a (possibly strided, memory-mapped) view into a contiguous native array"""
+        return np.ascontiguousarray(view, dtype=dtype)
+
+    def close(self):
+        # drop the mapping so the file can be overwritten (windows keeps mapped files locked)
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
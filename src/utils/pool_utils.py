@@ -0,0 +1,200 @@
+"""
+Over-allocated storage for per-gaussian tensors
+
+Densification appends and prunes rows of every gaussian attribute and of both Adam moments.
+Rebuilding all of them with torch.cat / boolean indexing on every call churns the allocator,
+so here every tensor lives in a buffer with spare rows:
+
+    buffer: [capacity, ...]   the first `count` rows are in use, the parameter is a view of them
+
+appends write into the spare rows (the capacity doubles when it runs out) and pruning
+compacts the kept rows to the front, both in place: compact moves the rows in chunks through a
+small scratch buffer, and the parameter stays the same nn.Parameter whose data is re-pointed at
+the rows in use, so the optimizer state never moves.
+"""
+
+import torch
+from torch import nn
+
+GROWTH = 2.0
+MIN_CAPACITY = 1024
+COMPACT_CHUNK = 1 << 16  # rows moved per step by compact, the size of its scratch buffer
+
+
+class TensorPool:
+    """a [capacity, ...] buffer whose first `count` rows are in use"""
+
+    def __init__(self, tensor: torch.Tensor, capacity=0):
+        tensor = tensor.detach()
+        self.count = tensor.shape[0]
+        capacity = max(capacity, self.count, MIN_CAPACITY)
+        self.buffer = tensor.new_empty((capacity, *tensor.shape[1:]))
+        self.buffer[:self.count] = tensor
+        self.tensor = self.buffer[:self.count]  # the view handed out last time
+        self._scratch = None
+
+    @property
+    def capacity(self):
+        return self.buffer.shape[0]
+
+    def owns(self, tensor):
+        """tensor views the rows in use (a parameter whose data was re-pointed at them included)"""
+        return (tensor.device == self.buffer.device and tensor.data_ptr() == self.buffer.data_ptr()
+                and tensor.shape == self.tensor.shape)
+
+    def _view(self):
+        self.tensor = self.buffer[:self.count]
+        return self.tensor
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, int(self.capacity * GROWTH))
+        buffer = self.buffer.new_empty((capacity, *self.buffer.shape[1:]))
+        buffer[:self.count] = self.buffer[:self.count]
+        self.buffer = buffer
+
+    def resize(self, count):
+        """change the number of rows in use, the content of new rows is undefined"""
+        self.reserve(count)
+        self.count = count
+        return self._view()
+
+    def append(self, tensor):
+        start = self.count
+        self.resize(start + tensor.shape[0])
+        self.buffer[start:self.count] = tensor
+        return self.tensor
+
+    def append_zeros(self, num):
+        start = self.count
+        self.resize(start + num)
+        self.buffer[start:self.count].zero_()
+        return self.tensor
+
+    def _chunk_scratch(self, rows):
+        if self._scratch is None or self._scratch.dtype != self.buffer.dtype:
+            self._scratch = self.buffer.new_empty((COMPACT_CHUNK, *self.buffer.shape[1:]))
+        return self._scratch[:rows]
+
+    def compact(self, index):
+        """
+        keep the rows at `index` (sorted, int64), moved to the front of the buffer in place
+        index[i] >= i, so chunk [s, s + c) only reads rows >= s that no earlier chunk overwrote
+        """
+        count = index.shape[0]
+        for start in range(0, count, COMPACT_CHUNK):
+            rows = index[start:start + COMPACT_CHUNK]
+            scratch = self._chunk_scratch(rows.shape[0])
+            torch.index_select(self.buffer, 0, rows, out=scratch)
+            self.buffer[start:start + rows.shape[0]] = scratch
+        self.count = count
+        return self._view()
+
+    def permute(self, index):
+        """reorder the rows in use by `index` (a permutation), through the spare rows when there are enough"""
+        count = self.count
+        if self.capacity >= 2 * count:
+            torch.index_select(self.buffer[:count], 0, index, out=self.buffer[count:2 * count])
+            self.buffer[:count] = self.buffer[count:2 * count]
+        else:
+            self.buffer[:count] = self.buffer[:count].index_select(0, index)
+        return self._view()
+
+
+class AdamPool:
+    """
+    Pooled parameters and exp_avg / exp_avg_sq of an Adam optimizer with one named parameter per group
+    (the layout of GaussianModel.training_setup).
+    Tensors that were replaced from outside (restore, reset, editing) are adopted again on the next call.
+    """
+
+    STATE_KEYS = ("exp_avg", "exp_avg_sq")
+
+    def __init__(self, optimizer: torch.optim.Optimizer):
+        self.optimizer = optimizer
+        self.params = {}  # name -> TensorPool
+        self.states = {}  # (name, key) -> TensorPool
+
+    def _sync(self, group):
+        name = group["name"]
+        param = group["params"][0]
+        pool = self.params.get(name)
+        if pool is None or not pool.owns(param):
+            pool = self.params[name] = TensorPool(param, capacity=pool.capacity if pool is not None else 0)
+            self._bind(group, pool.tensor)
+        state = self.optimizer.state.get(group["params"][0], None)
+        if state is not None:
+            # Adam creates its state lazily on the first step
+            for key in self.STATE_KEYS:
+                state_pool = self.states.get((name, key))
+                if state_pool is None or not state_pool.owns(state[key]):
+                    state_pool = self.states[(name, key)] = TensorPool(state[key], capacity=pool.capacity)
+                    state[key] = state_pool.tensor
+        return pool, state
+
+    def _bind(self, group, tensor):
+        """point the parameter of the group at the current view, it stays the key of its optimizer state"""
+        param = group["params"][0]
+        param.data = tensor
+        param.grad = None  # like the fresh parameters of the unpooled path, stale shapes must not accumulate
+        return param
+
+    def append(self, tensors_dict):
+        """pooled cat_tensors_to_optimizer"""
+        optimizable_tensors = {}
+        for group in self.optimizer.param_groups:
+            assert len(group["params"]) == 1
+            name = group["name"]
+            extension_tensor = tensors_dict[name]
+            pool, state = self._sync(group)
+            view = pool.append(extension_tensor.detach())
+            if state is not None:
+                for key in self.STATE_KEYS:
+                    state[key] = self.states[(name, key)].append_zeros(extension_tensor.shape[0])
+            optimizable_tensors[name] = self._bind(group, view)
+        return optimizable_tensors
+
+    def _move_rows(self, index, method):
+        optimizable_tensors = {}
+        for group in self.optimizer.param_groups:
+            name = group["name"]
+            pool, state = self._sync(group)
+            view = getattr(pool, method)(index)
+            if state is not None:
+                for key in self.STATE_KEYS:
+                    state[key] = getattr(self.states[(name, key)], method)(index)
+            optimizable_tensors[name] = self._bind(group, view)
+        return optimizable_tensors
+
+    def compact(self, index):
+        """pooled _prune_optimizer, `index` ([k, ] int64, sorted) lists the rows to keep"""
+        return self._move_rows(index, "compact")
+
+    def permute(self, index):
+        """reorder the parameters and their moments by a permutation ([n, ] int64)"""
+        return self._move_rows(index, "permute")
+
+    def replace(self, tensor, name):
+        """pooled replace_tensor_to_optimizer, overwrites the parameter in place and resets its moments"""
+        optimizable_tensors = {}
+        for group in self.optimizer.param_groups:
+            if group["name"] == name:
+                pool, state = self._sync(group)
+                with torch.no_grad():
+                    group["params"][0].copy_(tensor)
+                if state is not None:
+                    for key in self.STATE_KEYS:
+                        state[key].zero_()
+                optimizable_tensors[name] = group["params"][0]
+        return optimizable_tensors
+
+    def state_dict(self):
+        """optimizer state dict without the spare rows (saving a view would save the whole buffer)"""
+        state_dict = self.optimizer.state_dict()
+        # the per-param dicts are shared with the live optimizer, copy them before touching
+        state_dict["state"] = {
+            index: {key: value.clone() if key in self.STATE_KEYS else value for key, value in state.items()}
+            for index, state in state_dict["state"].items()
+        }
+        return state_dict
@@ -0,0 +1,124 @@
+"""
+Background loading of the ground truth images of the next training viewpoints
+
+The training loop used to pop a random camera from viewpoint_stack and then read
+original_image.cuda() on the critical path, which for lazy cameras means decoding and resizing
+the image and copying it to the device. CameraPrefetcher draws the next `depth` viewpoints ahead
+with exactly the same viewpoint_stack / random.randint calls (so the order of cameras is unchanged
+as long as nothing else draws from `random` in between), loads their images in worker threads,
+pins them and copies them on a side stream. next() only waits when the image is not there yet,
+this wait is recorded as the loader stall.
+"""
+
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import torch
+
+from utils.general_utils import unpack_image
+
+DEFAULT_WORKERS = 4
+
+
+class CameraPrefetcher:
+    def __init__(self, cameras: list, depth=2, device="cuda", workers=DEFAULT_WORKERS, load_images=True,
+                 rng=random):
+        """
+        :param cameras: the viewpoints, drawn without replacement and refilled when exhausted
+        :param depth: viewpoints drawn and loaded ahead, 0 loads synchronously in next()
+        :param load_images: False only draws the viewpoints (e.g. the ground truth comes from a gt_socket)
+        :param rng: anything with randint, the random module by default like the training loop
+        """
+        self.cameras = cameras
+        self.depth = max(int(depth), 0)
+        self.device = torch.device(device)
+        self.load_images = load_images
+        self.rng = rng
+        self._stack: Optional[list] = None
+        self._queue = deque()  # (camera, future or None)
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="camera_prefetch") \
+            if self.depth > 0 and load_images else None
+        self._stream = torch.cuda.Stream(device=self.device) \
+            if self._executor is not None and self.device.type == "cuda" else None
+        self.last_stall = 0.0  # seconds waited by the last next()
+        self.total_stall = 0.0
+        self.steps = 0
+
+    def _draw(self):
+        """same draw as the training loop"""
+        if not self._stack:
+            self._stack = self.cameras.copy()
+        return self._stack.pop(self.rng.randint(0, len(self._stack) - 1))
+
+    def _load(self, camera):
+        """worker thread: decode (lazy cameras), pin and start the copy to the device, uint8 images stay uint8"""
+        image = camera.stored_image
+        if self._stream is None or image.device.type == "cuda":
+            return image.to(self.device), None
+        if not image.is_pinned():
+            image = image.pin_memory()
+        with torch.cuda.stream(self._stream):
+            image = image.to(self.device, non_blocking=True)
+            event = torch.cuda.Event()
+            event.record(self._stream)
+        return image, event
+
+    def _fill(self):
+        while len(self._queue) < self.depth:
+            camera = self._draw()
+            future = self._executor.submit(self._load, camera) if self._executor is not None else None
+            self._queue.append((camera, future))
+
+    def next(self):
+        """
+        :return: the next viewpoint and its ground truth image on the device (None if load_images is False)
+        """
+        start = time.perf_counter()
+        if self.depth == 0:
+            camera = self._draw()
+            image = unpack_image(camera.stored_image.to(self.device)) if self.load_images else None
+        else:
+            self._fill()
+            camera, future = self._queue.popleft()
+            self._fill()  # start the next loads before waiting for this one
+            image = None
+            if future is not None:
+                image, event = future.result()
+                if event is not None:
+                    stream = torch.cuda.current_stream(self.device)
+                    stream.wait_event(event)
+                    image.record_stream(stream)  # allocated on the side stream, used on this one
+                image = unpack_image(image)  # to float on the device, only for the drawn view
+        self.last_stall = time.perf_counter() - start
+        self.total_stall += self.last_stall
+        self.steps += 1
+        return camera, image
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    @property
+    def mean_stall(self):
+        return self.total_stall / self.steps if self.steps else 0.0
+
+    def stats(self) -> dict:
+        return {"steps": self.steps, "depth": self.depth, "last_stall_ms": self.last_stall * 1000,
+                "mean_stall_ms": self.mean_stall * 1000, "total_stall_s": self.total_stall}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._queue.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
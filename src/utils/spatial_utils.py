@@ -0,0 +1,285 @@
+"""
+Spatial ordering of gaussian centers
+
+morton_codes interleaves the bits of the quantized x, y, z coordinates (Z-order curve),
+sorting by the code puts gaussians that are close in space close in memory, so chunks
+and row ranges get tight bounding boxes.
+
+SpatialIndex buckets the centers into a uniform voxel grid for region queries,
+boxes_mask tests many boxes at once.
+"""
+
+import copy
+import weakref
+
+import numpy as np
+import torch
+
+MORTON_BITS = 21  # per axis, 3 * 21 = 63 bits fit in int64
+
+
+def _spread_bits(v: torch.Tensor) -> torch.Tensor:
+    """insert two zero bits between each of the lower 21 bits of v (int64)"""
+    v = v & 0x1fffff
+    v = (v | (v << 32)) & 0x1f00000000ffff
+    v = (v | (v << 16)) & 0x1f0000ff0000ff
+    v = (v | (v << 8)) & 0x100f00f00f00f00f
+    v = (v | (v << 4)) & 0x10c30c30c30c30c3
+    v = (v | (v << 2)) & 0x1249249249249249
+    return v
+
+
+def morton_codes(xyz: torch.Tensor, bits=MORTON_BITS) -> torch.Tensor:
+    """
+    :param xyz: [n, 3] float positions
+    :return: [n, ] int64 morton codes, quantized inside the bounding box of xyz
+    """
+    xyz = xyz.detach()
+    lo = xyz.min(dim=0).values
+    extent = torch.clamp_min((xyz.max(dim=0).values - lo).max(), 1e-12)  # cubic cells keep the curve isotropic
+    quantized = ((xyz - lo) / extent * ((1 << bits) - 1)).long()
+    return _spread_bits(quantized[:, 0]) | (_spread_bits(quantized[:, 1]) << 1) | (_spread_bits(quantized[:, 2]) << 2)
+
+
+def morton_order(xyz: torch.Tensor) -> torch.Tensor:
+    """[n, ] int64 permutation that sorts xyz along the Z-order curve"""
+    if xyz.shape[0] == 0:
+        return torch.zeros(0, dtype=torch.long, device=xyz.device)
+    return torch.argsort(morton_codes(xyz))
+
+
+POINTS_PER_CELL = 32
+MAX_RESOLUTION = 1024  # per axis
+
+
+def points_in_polygon(xy: torch.Tensor, polygon: torch.Tensor) -> torch.Tensor:
+    """
+    even-odd test of [n, 2] points against a [k, 2] polygon (closed or not, any winding)
+    :return: [n, ] bool
+    """
+    inside = torch.zeros(xy.shape[0], dtype=torch.bool, device=xy.device)
+    x, y = xy[:, 0], xy[:, 1]
+    polygon = torch.as_tensor(polygon).tolist()
+    for i in range(len(polygon)):
+        x0, y0 = polygon[i - 1][:2]
+        x1, y1 = polygon[i][:2]
+        if x0 == x1 and y0 == y1:
+            continue  # closing point of a closed polygon
+        crosses = (y0 > y) != (y1 > y)
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0 if y1 != y0 else 1e-12)
+        inside ^= crosses & (x < x_cross)
+    return inside
+
+
+def points_in_frustum(xyz: torch.Tensor, full_proj_transform: torch.Tensor) -> torch.Tensor:
+    """[n, ] bool, full_proj_transform is the row-vector world -> clip matrix of scene.cameras (ndc z in [0, 1])"""
+    clip = torch.cat((xyz, torch.ones_like(xyz[:, :1])), dim=1) @ full_proj_transform.to(xyz)
+    w = clip[:, 3]
+    return (clip[:, 0].abs() <= w) & (clip[:, 1].abs() <= w) & (clip[:, 2] >= 0) & (clip[:, 2] <= w)
+
+
+class SpatialIndex:
+    """
+    Uniform voxel grid over the gaussian centers, points are bucketed by cell:
+
+        cells:  [n, ] int64 linear cell id of every point
+        order:  [n, ] int64 point indices sorted by cell
+        starts: [num_cells + 1] int64, the points of cell c are order[starts[c]:starts[c + 1]]
+
+    queries return the candidate ranges of order (the cells overlapping the query region),
+    the exact test then only runs on the candidates. The index is bound to the xyz tensor it
+    was built from, it is stale once that tensor is replaced or modified in place (see is_valid_for).
+    Deleting points and translating all points patch the index instead of rebuilding it.
+    """
+
+    def __init__(self, xyz: torch.Tensor, points_per_cell=POINTS_PER_CELL, max_resolution=MAX_RESOLUTION):
+        xyz = xyz.detach()
+        self.device = xyz.device
+        n = xyz.shape[0]
+        if n > 0:
+            self.lo = xyz.min(dim=0).values
+            extent = xyz.max(dim=0).values - self.lo
+        else:
+            self.lo = torch.zeros(3, device=self.device)
+            extent = torch.ones(3, device=self.device)
+        extent = torch.clamp_min(extent, max(extent.max().item(), 1e-6) * 1e-3)  # flat scenes (aerial captures)
+        # roughly cubic cells, about points_per_cell points per cell on average
+        cell_size = (extent.prod() / max(n // points_per_cell, 1)) ** (1 / 3)
+        self.resolution = torch.clamp(torch.ceil(extent / cell_size), 1, max_resolution).long()
+        self.cell_size = extent / self.resolution
+        self.num_cells = int(self.resolution.prod().item())
+        self.cells = self._cell_ids(self._cell_coords(xyz))
+        self.order = torch.argsort(self.cells, stable=True)
+        self._update_starts()
+        self.bind(xyz)
+
+    # region build and patch
+    def _cell_coords(self, xyz):
+        coords = torch.floor((xyz - self.lo) / self.cell_size)
+        # clamp before the cast (unbounded queries), points outside the grid go to the border cells
+        return torch.minimum(torch.clamp_min(coords, 0), (self.resolution - 1).to(coords)).long()
+
+    def _cell_ids(self, coords):
+        rx, ry = self.resolution[0], self.resolution[1]
+        return coords[..., 0] + rx * (coords[..., 1] + ry * coords[..., 2])
+
+    def _update_starts(self):
+        counts = torch.bincount(self.cells, minlength=self.num_cells)
+        self.starts = torch.cat((torch.zeros(1, dtype=torch.long, device=self.device), torch.cumsum(counts, dim=0)))
+
+    def bind(self, xyz: torch.Tensor):
+        """mark the index as up to date with xyz"""
+        self._source = weakref.ref(xyz)
+        self._version = xyz._version
+        return self
+
+    def is_valid_for(self, xyz: torch.Tensor):
+        return (self._source() is xyz and xyz._version == self._version
+                and xyz.shape[0] == self.cells.shape[0] and xyz.device == self.device)
+
+    def rebound(self, xyz: torch.Tensor):
+        """shallow copy bound to xyz (a copy of the indexed points), the index tensors are shared"""
+        index = copy.copy(self)
+        return index.bind(xyz)
+
+    def remove(self, keep_mask: torch.Tensor):
+        """patch for xyz = xyz[keep_mask], O(n) without sorting again"""
+        new_index = torch.cumsum(keep_mask, dim=0) - 1
+        self.order = new_index[self.order[keep_mask[self.order]]]
+        self.cells = self.cells[keep_mask]
+        self._update_starts()
+
+    def append(self, xyz: torch.Tensor):
+        """patch for xyz = cat(xyz, new points), the grid is kept (points outside go to the border cells)"""
+        self.cells = torch.cat((self.cells, self._cell_ids(self._cell_coords(xyz.detach().to(self.device)))))
+        self.order = torch.argsort(self.cells, stable=True)
+        self._update_starts()
+
+    def translate(self, offset: torch.Tensor):
+        """patch for xyz = xyz + offset, only the grid moves"""
+        self.lo = self.lo + offset.to(self.lo)
+
+    # endregion
+
+    # region queries
+    def _box_cells(self, lo, hi):
+        """linear ids of the cells overlapping [lo, hi]"""
+        lo = torch.as_tensor(lo, dtype=torch.float32, device=self.device)
+        hi = torch.as_tensor(hi, dtype=torch.float32, device=self.device)
+        if bool((lo > hi).any()):
+            return torch.zeros(0, dtype=torch.long, device=self.device)
+        c_lo = self._cell_coords(lo)
+        c_hi = self._cell_coords(hi)
+        axes = [torch.arange(c_lo[i].item(), c_hi[i].item() + 1, device=self.device) for i in range(3)]
+        coords = torch.stack(torch.meshgrid(*axes, indexing='ij'), dim=-1).reshape(-1, 3)
+        return self._cell_ids(coords)
+
+    def _cell_bounds(self, cells):
+        """[m, 3] min and max corner of the cells"""
+        rx, ry = self.resolution[0], self.resolution[1]
+        coords = torch.stack((cells % rx, (cells // rx) % ry, cells // (rx * ry)), dim=1)
+        lo = self.lo + coords * self.cell_size
+        return lo, lo + self.cell_size
+
+    def cell_ranges(self, cells):
+        """(starts, ends) ranges of order holding the points of the cells, empty cells dropped"""
+        starts, ends = self.starts[cells], self.starts[cells + 1]
+        non_empty = ends > starts
+        return starts[non_empty], ends[non_empty]
+
+    def candidates(self, starts, ends):
+        """point indices of the ranges of order"""
+        lengths = ends - starts
+        total = int(lengths.sum().item())
+        if total == 0:
+            return torch.zeros(0, dtype=torch.long, device=self.device)
+        offsets = torch.cumsum(lengths, dim=0) - lengths
+        positions = torch.arange(total, device=self.device) + torch.repeat_interleave(starts - offsets, lengths)
+        return self.order[positions]
+
+    def query_box(self, lo, hi):
+        return self.cell_ranges(self._box_cells(lo, hi))
+
+    def query_sphere(self, center, radius):
+        center = torch.as_tensor(center, dtype=torch.float32, device=self.device)
+        cells = self._box_cells(center - radius, center + radius)
+        lo, hi = self._cell_bounds(cells)
+        nearest = torch.minimum(torch.maximum(center, lo), hi)
+        cells = cells[((nearest - center) ** 2).sum(dim=1) <= radius ** 2]
+        return self.cell_ranges(cells)
+
+    def query_prism(self, polygon_xy, z_min, z_max):
+        """polygon in the xy plane extruded from z_min to z_max, only its bounding box is used for the cells"""
+        polygon_xy = torch.as_tensor(polygon_xy, dtype=torch.float32, device=self.device)
+        lo = torch.cat((polygon_xy.min(dim=0).values, polygon_xy.new_tensor([z_min])))
+        hi = torch.cat((polygon_xy.max(dim=0).values, polygon_xy.new_tensor([z_max])))
+        return self.query_box(lo, hi)
+
+    def query_frustum(self, full_proj_transform):
+        """cells not entirely outside one of the clip planes"""
+        cells = torch.arange(self.num_cells, device=self.device)
+        cells = cells[self.starts[1:] > self.starts[:-1]]  # only non-empty cells
+        lo, hi = self._cell_bounds(cells)
+        corners = torch.stack([torch.stack((hi[:, 0] if i & 1 else lo[:, 0],
+                                            hi[:, 1] if i & 2 else lo[:, 1],
+                                            hi[:, 2] if i & 4 else lo[:, 2]), dim=1) for i in range(8)], dim=1)
+        clip = torch.cat((corners, torch.ones_like(corners[..., :1])), dim=-1) @ full_proj_transform.to(corners)
+        x, y, z, w = clip.unbind(dim=-1)  # [m, 8]
+        outside = ((x < -w).all(dim=1) | (x > w).all(dim=1) | (y < -w).all(dim=1) | (y > w).all(dim=1)
+                   | (z < 0).all(dim=1) | (z > w).all(dim=1))
+        return self.cell_ranges(cells[~outside])
+
+    # endregion
+
+
+BOX_CHUNK_BYTES = 256 << 20  # temporary memory of one chunk in boxes_mask
+
+
+def boxes_mask(xyz: torch.Tensor, lo, hi, groups=None, num_groups=None, labels=False, max_bytes=BOX_CHUNK_BYTES):
+    """
+    test all boxes against chunks of points in one broadcast, instead of one full pass per box
+    :param lo, hi: [b, 3] box corners (inclusive)
+    :param groups: [b, ] int group (e.g. region) of every box, None for one group per box
+    :param num_groups: defaults to max(groups) + 1, pass it when trailing groups may have no box
+    :param labels: return the group of the first box containing each point instead of masks
+    :param max_bytes: bound of the [chunk, b] temporaries, sets the chunk size
+    :return: labels=False: [n, ] bool union when groups is None, else [num_groups, n] bool
+             labels=True: [n, ] int64, -1 outside every box
+    """
+    device = xyz.device
+    lo = torch.as_tensor(np.asarray(lo), dtype=xyz.dtype, device=device).reshape(-1, 3)
+    hi = torch.as_tensor(np.asarray(hi), dtype=xyz.dtype, device=device).reshape(-1, 3)
+    num_boxes = lo.shape[0]
+    n = xyz.shape[0]
+    if groups is not None:
+        groups = torch.as_tensor(np.asarray(groups), dtype=torch.long, device=device)
+        if num_groups is None:
+            num_groups = int(groups.max().item()) + 1 if num_boxes else 0
+        # [b, g] box -> group, a point is in a group if it is in any of its boxes
+        membership = torch.zeros((num_boxes, num_groups), dtype=xyz.dtype, device=device)
+        membership[torch.arange(num_boxes, device=device), groups] = 1
+
+    if labels:
+        result = torch.full((n,), -1, dtype=torch.long, device=device)
+    elif groups is not None:
+        result = torch.zeros((num_groups, n), dtype=torch.bool, device=device)
+    else:
+        result = torch.zeros(n, dtype=torch.bool, device=device)
+    if num_boxes == 0:
+        return result
+
+    # two [c, b, 3] comparisons and the [c, b] result per point
+    chunk = max(1, max_bytes // (num_boxes * 8))
+    with torch.no_grad():
+        for start in range(0, n, chunk):
+            points = xyz[start:start + chunk, None, :]
+            inside = ((points >= lo) & (points <= hi)).all(dim=-1)  # [c, b]
+            if labels:
+                first = torch.argmax(inside.to(torch.uint8), dim=1)  # first box containing the point
+                box = torch.where(inside.any(dim=1), first, -1)
+                result[start:start + chunk] = box if groups is None else torch.where(box >= 0, groups[box], -1)
+            elif groups is not None:
+                result[:, start:start + chunk] = (inside.to(xyz.dtype) @ membership).t() > 0
+            else:
+                result[start:start + chunk] = inside.any(dim=1)
+    return result
@@ -0,0 +1,131 @@
+"""
+Similarity transforms (uniform scale, rotation, translation) of gaussians and cameras
+
+Matrices are 4x4 in the column vector convention (like getWorld2View2): p' = M @ [p, 1] = s * R @ p + t.
+For a gaussian this moves the center, turns the rotation quaternion by R, adds log(s) to the
+log-scales and rotates the view dependent color: SH band l is mixed by a (2l+1)x(2l+1) matrix
+(the Wigner D-matrix of R in the real SH basis of eval_sh), obtained once per transform by
+fitting the rotated basis at a few fixed directions.
+"""
+
+import numpy as np
+import torch
+from scipy.spatial.transform import Rotation
+
+from utils.sh_utils import eval_sh
+
+TRANSFORM_CHUNK_SIZE = 1 << 20  # gaussians per chunk, bounds the temporaries
+MAX_SH_DEGREE = 3
+
+
+def decompose_similarity(matrix) -> tuple[float, np.ndarray, np.ndarray]:
+    """
+    :param matrix: [4, 4] similarity transform
+    :return: scale s, [3, 3] rotation R, [3, ] translation t
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    assert matrix.shape == (4, 4), "expected a 4x4 matrix"
+    linear = matrix[:3, :3]
+    det = np.linalg.det(linear)
+    if det <= 0:
+        raise ValueError("reflections and degenerate matrices are not supported")
+    scale = float(np.cbrt(det))
+    rotation = linear / scale
+    if not np.allclose(rotation @ rotation.T, np.eye(3), atol=1e-5):
+        raise ValueError("only uniform scale can be applied to gaussians")
+    return scale, rotation, matrix[:3, 3].copy()
+
+
+def rotation_to_quaternion(rotation) -> np.ndarray:
+    """[3, 3] rotation -> (w, x, y, z), the order of GaussianModel._rotation"""
+    x, y, z, w = Rotation.from_matrix(rotation).as_quat()
+    return np.array([w, x, y, z])
+
+
+def quaternion_multiply(q1: torch.Tensor, q2: torch.Tensor) -> torch.Tensor:
+    """hamilton product of [..., 4] (w, x, y, z) quaternions, rotating by q1 q2 is q2 then q1"""
+    w1, x1, y1, z1 = q1.unbind(-1)
+    w2, x2, y2, z2 = q2.unbind(-1)
+    return torch.stack((w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+                        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+                        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+                        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2), dim=-1)
+
+
+def sh_basis(deg, dirs: torch.Tensor) -> torch.Tensor:
+    """[n, 3] unit directions -> [n, (deg + 1) ** 2] values of the SH basis used by eval_sh"""
+    coeff = (deg + 1) ** 2
+    return eval_sh(deg, torch.eye(coeff, dtype=dirs.dtype, device=dirs.device), dirs[:, None, :]).squeeze(1)
+
+
+def sh_rotation(rotation, deg) -> torch.Tensor:
+    """
+    [(deg + 1) ** 2 - 1, ] * 2 block diagonal matrix rotating the SH coefficients of bands 1..deg,
+    rest' = D @ rest such that the rotated color at d equals the old color at R^T d
+    """
+    assert 0 <= deg <= MAX_SH_DEGREE
+    rotation = torch.as_tensor(np.asarray(rotation), dtype=torch.float64)
+    # fixed, well spread directions (golden spiral), more than any band has coefficients
+    i = torch.arange(64, dtype=torch.float64) + 0.5
+    z = 1 - 2 * i / 64
+    phi = i * np.pi * (3 - np.sqrt(5))
+    dirs = torch.stack((torch.sqrt(1 - z * z) * torch.cos(phi), torch.sqrt(1 - z * z) * torch.sin(phi), z), dim=1)
+    basis = sh_basis(deg, dirs)
+    rotated_basis = sh_basis(deg, dirs @ rotation)  # rows are R^T d
+    size = (deg + 1) ** 2 - 1
+    matrix = torch.zeros((size, size), dtype=torch.float64)
+    for band in range(1, deg + 1):
+        b = slice(band * band, (band + 1) ** 2)
+        # basis_b @ D_b = rotated_basis_b, then basis_b @ (D_b @ c) = rotated_basis_b @ c, bands do not mix
+        block = torch.linalg.lstsq(basis[:, b], rotated_basis[:, b]).solution
+        matrix[b.start - 1:b.stop - 1, b.start - 1:b.stop - 1] = block
+    return matrix
+
+
+def transform_gaussians(matrix, xyz: torch.Tensor, rotation: torch.Tensor, scaling: torch.Tensor,
+                        features_rest: torch.Tensor = None, chunk_size=TRANSFORM_CHUNK_SIZE):
+    """
+    apply a similarity transform in place, chunk by chunk
+    :param xyz: [n, 3]
+    :param rotation: [n, 4] (w, x, y, z), not necessarily normalized
+    :param scaling: [n, 3] log-scales
+    :param features_rest: [n, (deg + 1) ** 2 - 1, 3] or None
+    """
+    scale, rot, t = decompose_similarity(matrix)
+    device, dtype = xyz.device, xyz.dtype
+    linear = torch.as_tensor(scale * rot, dtype=dtype, device=device)
+    translation = torch.as_tensor(t, dtype=dtype, device=device)
+    quaternion = torch.as_tensor(rotation_to_quaternion(rot), dtype=rotation.dtype, device=device)
+    log_scale = float(np.log(scale))
+    sh_matrix = None
+    if features_rest is not None and features_rest.shape[1] > 0:
+        deg = int(round(np.sqrt(features_rest.shape[1] + 1))) - 1
+        sh_matrix = sh_rotation(rot, deg).to(dtype=features_rest.dtype, device=device)
+
+    with torch.no_grad():
+        for start in range(0, xyz.shape[0], chunk_size):
+            end = start + chunk_size
+            chunk = xyz[start:end]
+            chunk.copy_(torch.addmm(translation, chunk, linear.t()))
+            rotation[start:end] = quaternion_multiply(quaternion, rotation[start:end])
+            if log_scale != 0.0:
+                scaling[start:end] += log_scale
+            if sh_matrix is not None:
+                features_rest[start:end] = torch.matmul(sh_matrix, features_rest[start:end])
+
+
+def transform_cameras(matrix, R: np.ndarray, T: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    move a stack of cameras with the scene
+    :param R: [m, 3, 3] camera R as in CameraInfo (world to view rotation transposed, i.e. camera to world)
+    :param T: [m, 3] world to view translation
+    :return: new R, T, the scale only moves the camera centers, the view transform stays rigid
+    """
+    scale, rot, t = decompose_similarity(matrix)
+    R = np.asarray(R, dtype=np.float64)
+    T = np.asarray(T, dtype=np.float64)
+    centers = -np.einsum("mij,mj->mi", R, T)  # camera to world translation
+    new_R = rot[None] @ R
+    new_centers = scale * centers @ rot.T + t
+    new_T = -np.einsum("mji,mj->mi", new_R, new_centers)
+    return new_R, new_T
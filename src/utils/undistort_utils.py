@@ -0,0 +1,247 @@
+"""
+In-process undistortion of SIMPLE_RADIAL, RADIAL and OPENCV COLMAP cameras
+
+The loader only handles pinhole cameras, so every scene used to go through COLMAP's
+image_undistorter first, which writes a second copy of every image. An Undistorter instead
+gives the pinhole camera the external undistorter would output (same focal lengths, image
+shrunk until no blank pixels remain) and remaps each image while it is decoded. The remap
+tables are built once per intrinsic and source size, stored as fixed point maps in
+<source_path>/cache/undistort and read back on later runs.
+
+    undistort = undistorter("OPENCV", width, height, params, cache_dir)
+    fx, fy, cx, cy = undistort.pinhole_params
+    image = undistort(Image.open(path))  # PIL image of undistort.output_size(image.size)
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+UNDISTORT_VERSION = 2  # bump when the output camera or the maps change
+UNDISTORT_DIR_NAME = "undistort"
+PINHOLE_MODELS = {"SIMPLE_PINHOLE", "PINHOLE"}
+DISTORTED_MODELS = {"SIMPLE_RADIAL", "RADIAL", "OPENCV"}
+# image_undistorter defaults: no blank pixels, output scale clamped to [0.2, 2]
+MIN_SCALE = 0.2
+MAX_SCALE = 2.0
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def opencv_params(model, params):
+    """COLMAP camera params -> (fx, fy, cx, cy), (k1, k2, p1, p2)"""
+    params = [float(p) for p in params]
+    if model == "SIMPLE_RADIAL":
+        f, cx, cy, k = params
+        return (f, f, cx, cy), (k, 0.0, 0.0, 0.0)
+    if model == "RADIAL":
+        f, cx, cy, k1, k2 = params
+        return (f, f, cx, cy), (k1, k2, 0.0, 0.0)
+    if model == "OPENCV":
+        fx, fy, cx, cy, k1, k2, p1, p2 = params
+        return (fx, fy, cx, cy), (k1, k2, p1, p2)
+    raise ValueError(f"camera model {model} can not be undistorted, supported: {sorted(DISTORTED_MODELS)}")
+
+
+def distort_points(x, y, coeffs):
+    """normalized image coordinates -> distorted normalized coordinates, as COLMAP's OPENCV model"""
+    k1, k2, p1, p2 = coeffs
+    x2, y2, xy = x * x, y * y, x * y
+    r2 = x2 + y2
+    radial = k1 * r2 + k2 * r2 * r2
+    return (x + x * radial + 2 * p1 * xy + p2 * (r2 + 2 * x2),
+            y + y * radial + 2 * p2 * xy + p1 * (r2 + 2 * y2))
+
+
+def undistort_points(xd, yd, coeffs, iterations=20):
+    """inverse of distort_points by fixed point iteration"""
+    k1, k2, p1, p2 = coeffs
+    x, y = xd.copy(), yd.copy()
+    for _ in range(iterations):
+        x2, y2, xy = x * x, y * y, x * y
+        r2 = x2 + y2
+        inv_radial = 1.0 / (1 + k1 * r2 + k2 * r2 * r2)
+        x = (xd - 2 * p1 * xy - p2 * (r2 + 2 * x2)) * inv_radial
+        y = (yd - 2 * p2 * xy - p1 * (r2 + 2 * y2)) * inv_radial
+    return x, y
+
+
+def undistorted_camera(width, height, intrinsics, coeffs):
+    """
+    the pinhole camera of COLMAP's image_undistorter (blank_pixels 0): same focal lengths,
+    width / height scaled until the undistorted image borders enclose no blank pixels
+    :return: (width, height), (fx, fy, cx, cy)
+    """
+    fx, fy, cx, cy = intrinsics
+
+    def to_undistorted(u, v):
+        x, y = undistort_points((u - cx) / fx, (v - cy) / fy, coeffs)
+        return fx * x + cx, fy * y + cy
+
+    rows = np.arange(height) + 0.5
+    cols = np.arange(width) + 0.5
+    left_x, _ = to_undistorted(np.full_like(rows, 0.5), rows)
+    right_x, _ = to_undistorted(np.full_like(rows, width - 0.5), rows)
+    _, top_y = to_undistorted(cols, np.full_like(cols, 0.5))
+    _, bottom_y = to_undistorted(cols, np.full_like(cols, height - 0.5))
+
+    # the innermost point of each border bounds the region without blank pixels
+    max_scale_x = max(cx / (cx - left_x.max()), (width - 0.5 - cx) / (right_x.min() - cx))
+    max_scale_y = max(cy / (cy - top_y.max()), (height - 0.5 - cy) / (bottom_y.min() - cy))
+    scale_x = float(np.clip(1.0 / max_scale_x, MIN_SCALE, MAX_SCALE))
+    scale_y = float(np.clip(1.0 / max_scale_y, MIN_SCALE, MAX_SCALE))
+
+    new_width = max(1, int(scale_x * width))  # truncated as UndistortCamera
+    new_height = max(1, int(scale_y * height))
+    return (new_width, new_height), (fx, fy, cx * new_width / width, cy * new_height / height)
+
+
+def build_maps(width, height, intrinsics, coeffs):
+    """
+    remap tables of one camera, for cv2.remap
+    :return: (width, height), pinhole (fx, fy, cx, cy), [h, w, 2] int16 and [h, w] uint16 fixed point maps
+    """
+    size, pinhole = undistorted_camera(width, height, intrinsics, coeffs)
+    fx, fy, cx, cy = intrinsics
+    new_fx, new_fy, new_cx, new_cy = pinhole
+    x = (np.arange(size[0], dtype=np.float64) + 0.5 - new_cx) / new_fx
+    y = (np.arange(size[1], dtype=np.float64) + 0.5 - new_cy) / new_fy
+    xd, yd = distort_points(*np.meshgrid(x, y), coeffs)
+    # COLMAP pixel centers are at +0.5, cv2.remap samples pixel centers at integers
+    map_x = (fx * xd + cx - 0.5).astype(np.float32)
+    map_y = (fy * yd + cy - 0.5).astype(np.float32)
+    map_xy, map_frac = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+    return size, pinhole, map_xy, map_frac
+
+
+class Undistorter:
+    def __init__(self, model, width, height, params, cache_dir=None):
+        """
+        :param model, width, height, params: the COLMAP camera
+        :param cache_dir: where the remap tables are stored, None to keep them in memory only
+        """
+        self.model = model
+        self.width = int(width)
+        self.height = int(height)
+        self.params = tuple(float(p) for p in params)
+        self.cache_dir = cache_dir
+        self.intrinsics, self.coeffs = opencv_params(model, self.params)
+        self.key = hashlib.sha1(f"{UNDISTORT_VERSION}|{model}|{self.width}x{self.height}|"
+                                f"{','.join(repr(p) for p in self.params)}".encode()).hexdigest()
+        self._maps: dict[tuple, tuple] = {}
+        self._sizes: dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._pinhole = None
+
+    @property
+    def pinhole_size(self):
+        """(width, height) of the undistorted camera at the model resolution"""
+        return self.pinhole[0]
+
+    @property
+    def pinhole_params(self):
+        """(fx, fy, cx, cy) of the undistorted camera at the model resolution"""
+        return self.pinhole[1]
+
+    @property
+    def pinhole(self):
+        if self._pinhole is None:
+            self._pinhole = undistorted_camera(self.width, self.height, self.intrinsics, self.coeffs)
+        return self._pinhole
+
+    def _scaled(self, size):
+        """the camera for images stored at another resolution than the model (images_2, ...)"""
+        sx, sy = size[0] / self.width, size[1] / self.height
+        fx, fy, cx, cy = self.intrinsics
+        return (fx * sx, fy * sy, cx * sx, cy * sy)
+
+    def output_size(self, size=None):
+        """(width, height) of an undistorted image decoded at size, the model resolution if None"""
+        if size is None or tuple(size) == (self.width, self.height):
+            return self.pinhole_size
+        size = tuple(size)
+        if size not in self._sizes:
+            self._sizes[size] = undistorted_camera(size[0], size[1], self._scaled(size), self.coeffs)[0]
+        return self._sizes[size]
+
+    def _file(self, size):
+        return os.path.join(self.cache_dir, f"{self.key}_{size[0]}x{size[1]}.npz")
+
+    def _load_maps(self, size):
+        try:
+            with np.load(self._file(size), allow_pickle=False) as data:
+                return tuple(int(v) for v in data["size"]), data["map_xy"], data["map_frac"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_maps(self, size, maps):
+        out_size, map_xy, map_frac = maps
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{self._file(size)}.{threading.get_ident()}.tmp.npz"
+            np.savez(tmp, size=np.array(out_size), map_xy=map_xy, map_frac=map_frac)
+            os.replace(tmp, self._file(size))
+        except OSError as e:
+            print(f"[Warning] undistortion maps not cached: {e}")
+
+    def maps(self, size=None):
+        """(output size, map_xy, map_frac) for images decoded at size, built or read once"""
+        size = (self.width, self.height) if size is None else tuple(int(v) for v in size)
+        maps = self._maps.get(size)
+        if maps is not None:
+            return maps
+        with self._lock:
+            maps = self._maps.get(size)
+            if maps is None:
+                maps = self._load_maps(size) if self.cache_dir is not None else None
+                if maps is None:
+                    out_size, _, map_xy, map_frac = build_maps(size[0], size[1], self._scaled(size), self.coeffs)
+                    maps = (out_size, map_xy, map_frac)
+                    if self.cache_dir is not None:
+                        self._save_maps(size, maps)
+                self._maps[size] = maps
+        return maps
+
+    def undistort_array(self, array: np.ndarray) -> np.ndarray:
+        """[h, w(, c)] uint8 -> undistorted [h', w'(, c)] uint8, bilinear as image_undistorter"""
+        _, map_xy, map_frac = self.maps((array.shape[1], array.shape[0]))
+        return cv2.remap(array, map_xy, map_frac, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+    def __call__(self, image: Image.Image) -> Image.Image:
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.mode or "transparency" in image.info else "RGB")
+        return Image.fromarray(self.undistort_array(np.asarray(image)))
+
+    def __repr__(self):
+        return f"Undistorter({self.model}, {self.width}x{self.height}, {self.params})"
+
+
+_undistorters: dict[tuple, Undistorter] = {}
+_registry_lock = threading.Lock()
+
+
+def undistorter(model, width, height, params, cache_dir=None) -> Optional[Undistorter]:
+    """one Undistorter per intrinsic and cache directory, None for pinhole cameras"""
+    if model in PINHOLE_MODELS:
+        return None
+    key = (model, int(width), int(height), tuple(float(p) for p in params),
+           None if cache_dir is None else os.path.abspath(cache_dir))
+    with _registry_lock:
+        instance = _undistorters.get(key)
+        if instance is None:
+            instance = _undistorters[key] = Undistorter(model, width, height, params, key[-1])
+    return instance
+
+
+def prepare_maps(requests, workers=DEFAULT_WORKERS):
+    """build or read the maps of every distinct (undistorter, source size) in parallel"""
+    requests = list(dict.fromkeys((undistort, tuple(size)) for undistort, size in requests))
+    if not requests:
+        return
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="undistort") as executor:
+        list(executor.map(lambda item: item[0].maps(item[1]), requests))